@@ -11,6 +11,8 @@ CORS(app)
 
 from model.nlp_processor import HeartDiseaseNLPExtractor
 from api.services import generate_missing_info_message
+from model.api.utils.text_cache import TextCache, normalize_text, text_key
+from model.explanation_metadata import load_explanation
 
 model_path = os.path.join(os.path.dirname(__file__), 'heart_disease_model.pkl')
 
@@ -18,18 +20,38 @@ try:
    model_data = joblib.load(model_path)
    model = model_data['model']
    feature_names = model_data['feature_names']
+   # Nhóm feature và importance tính sẵn lúc train (file model cũ: tính một lần ở đây)
+   explanation = load_explanation(model_data)
    print(f"Mô hình đã được tải thành công từ {model_path}!")
 except FileNotFoundError:
    print(f"Không tìm thấy mô hình tại {model_path}. Vui lòng chạy train_model.py trước.")
    model = None
+   explanation = None
 
 # Khởi tạo NLP extractor
 nlp_extractor = HeartDiseaseNLPExtractor()
 
+# Nhớ lại kết quả NLP theo văn bản đã chuẩn hóa; trả về bản sao vì predict() sửa dict features
+feature_cache = TextCache(
+   max_entries=2048,
+   max_bytes=16 * 1024 * 1024,
+   ttl=15 * 60,
+   copy_value=lambda result: (dict(result[0]), list(result[1]))
+)
+
 def convert_symptoms_to_features_nlp(symptoms_text, age = None, gender=None, symptom_duration=None):
    """
    Chuyển đổi triệu chứng thành features bằng NLP
    """
+   symptoms_text = normalize_text(symptoms_text)
+   key = text_key(symptoms_text, age, gender, symptom_duration)
+
+   return feature_cache.get_or_compute(
+      key,
+      lambda: _convert_symptoms_to_features_nlp(symptoms_text, age, gender, symptom_duration)
+   )
+
+def _convert_symptoms_to_features_nlp(symptoms_text, age, gender, symptom_duration):
    # Tạo context text từ các tham số
    context_parts = []
 
@@ -153,59 +175,8 @@ def predict():
       prediction = model.predict(input_data)[0]
       prediction_proba = model.predict_proba(input_data)[0]
 
-      # Tính feature importance (nếu có)
-      try:
-         if hasattr(model, 'named_steps'):
-            importances = model.named_steps['classifier'].feature_importances_
-
-            # Lấy tên features sau preprocessing
-            preprocessor = model.named_steps['preprocessor']
-            feature_names_after = []
-
-            for name, transformer, cols in preprocessor.transformers_:
-               if hasattr(transformer, 'get_feature_names_out'):
-                  if name == 'cat':
-                     cat_features = transformer.named_steps['onehot'].get_feature_names_out(cols)
-                     feature_names_after.extend(cat_features)
-                  else:
-                     feature_names_after.extend(cols)
-               else:
-                  feature_names_after.extend(cols)
-
-            # Tạo dictionary importance
-            feature_importance_dict = dict(zip(feature_names_after[:len(importances)], importances))
-
-            # Lấy 5 features quan trọng nhất
-            top_features = sorted(
-               feature_importance_dict.items(),
-               key=lambda x: x[1],
-               reverse=True
-            )[:5]
-
-            # Chuyển đổi tên features về dạng dễ đọc
-            readable_features = []
-            for feat, imp in top_features:
-               # Chuyển one-hot encoded features về dạng gốc
-               if '_' in feat:
-                  base_feature = feat.split('_')[0]
-                  readable_features.append({
-                     'feature': base_feature,
-                     'importance': round(imp, 4),
-                     'detail': feat
-                  })
-               else:
-                  readable_features.append({
-                     'feature': feat,
-                     'importance': round(imp, 4)
-                  })
-
-            top_features_readable = readable_features
-         else:
-               top_features_readable = []
-
-      except Exception as e:
-         print(f"Error getting feature importance: {e}")
-         top_features_readable = []
+      # Các yếu tố quan trọng nhất: tính sẵn, không phụ thuộc request
+      top_features_readable = explanation['top_features'] if explanation else []
 
       # Tạo response
       result = {
@@ -357,8 +328,8 @@ def complete_features():
                 partial_features, user_response, feature_to_update
             )
 
-            # Kiểm tra lại xem còn missing không
-            _, still_missing = nlp_extractor.extract_all_features("")
+            # Kiểm tra lại xem còn missing không (trên features đã cập nhật, không trích xuất lại)
+            still_missing = nlp_extractor._check_missing_features(updated_features, user_response.lower())
 
             # Tính phần trăm hoàn thành
             total_features = 11
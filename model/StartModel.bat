@@ -4,5 +4,7 @@ call "E:\My Project\TriTueNhanTao\.venv\Scripts\activate.bat"
 cd /d "E:\My Project\TriTueNhanTao\model"
 
 @REM python api.py
+@REM Dung san artifact cua NLP extractor (tu dung lai neu tu dien thay doi)
+python ./api/extractor_artifact.py
 python ./api/app.py
 pause
@@ -0,0 +1,88 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, Pattern
+
+
+def _build_fold_table() -> Dict[int, str]:
+   """Bảng str.translate: chữ Latin có dấu -> chữ không dấu ('ặ' -> 'a', 'đ' -> 'd')"""
+   table = {ord('đ'): 'd', ord('Đ'): 'D'}
+   # Latin-1, Latin Extended-A/B và Latin Extended Additional (chứa phần lớn chữ tiếng Việt)
+   for code in list(range(0xC0, 0x250)) + list(range(0x1E00, 0x1F00)):
+      char = chr(code)
+      base = ''.join(c for c in unicodedata.normalize('NFD', char) if not unicodedata.combining(c))
+      if base != char and len(base) == 1 and base.isascii():
+         table[code] = base
+   return table
+
+
+# Tính một lần khi import
+FOLD_TABLE = _build_fold_table()
+
+# Từ ngắn hơn khi bỏ dấu dễ trùng với từ khác hoặc nằm trong từ tiếng Anh
+# ('mỡ' -> 'mo' trong 'mmol', 'ông' -> 'ong' trong 'long', 'năm' -> 'nam'):
+# chỉ khớp khi gõ đúng dấu
+MIN_FOLDED_LENGTH = 4
+# Từ chỉ mức độ: dạng bỏ dấu là một từ khác hay gặp ('nặng' -> 'nang' như
+# 'chuc nang' = chức năng) mà khớp nhầm sẽ đổi hẳn kết quả, nên cũng chỉ khớp
+# khi gõ đúng dấu
+STRICT_WORDS = frozenset(['nặng', 'dữ dội'])
+
+
+def fold(text: str) -> str:
+   """Bỏ dấu: 'đau ngực' -> 'dau nguc'"""
+   return text.translate(FOLD_TABLE)
+
+
+def char_variants(char: str) -> str:
+   """Các ký tự khớp với char: chính nó và chữ không dấu tương ứng (nếu có)"""
+   base = FOLD_TABLE.get(ord(char))
+   return char + base if base else char
+
+
+def char_class(chars: Iterable[str]) -> str:
+   chars = ''.join(sorted(set(chars)))
+   return re.escape(chars) if len(chars) == 1 else '[' + ''.join(re.escape(c) for c in chars) + ']'
+
+
+def accepts_unaccented(word: str) -> bool:
+   """word có dấu, đủ dài và không thuộc STRICT_WORDS để được khớp cả khi gõ bỏ dấu"""
+   return len(word) >= MIN_FOLDED_LENGTH and fold(word) != word and word not in STRICT_WORDS
+
+
+def tolerant_pattern(word: str) -> str:
+   """
+   Regex khớp word khi người dùng gõ đủ dấu hoặc bỏ dấu ở bất kỳ chữ nào:
+   'nặng' -> 'n[aặ]ng' khớp 'nặng', 'nang' nhưng không khớp 'năng'
+   """
+   if not accepts_unaccented(word):
+      return re.escape(word)
+   return ''.join(char_class(char_variants(char)) for char in word)
+
+
+@lru_cache(maxsize=None)
+def words_pattern(words) -> Pattern:
+   """Regex (đã compile) khớp một trong các từ, mỗi từ theo tolerant_pattern"""
+   if isinstance(words, str):
+      words = (words,)
+   return re.compile('|'.join(tolerant_pattern(word) for word in words))
+
+
+@lru_cache(maxsize=None)
+def _searcher(word: str):
+   """Hàm search của regex cho word, None nếu chỉ cần str.find"""
+   return words_pattern(word).search if accepts_unaccented(word) else None
+
+
+def find(text: str, word: str, start: int = 0) -> int:
+   """Như text.find(word, start) nhưng chấp nhận chữ bỏ dấu"""
+   search = _searcher(word)
+   if search is None:
+      return text.find(word, start)
+   match = search(text, start)
+   return match.start() if match else -1
+
+
+def contains(text: str, word: str) -> bool:
+   """Như `word in text` nhưng chấp nhận chữ bỏ dấu"""
+   return find(text, word) != -1
@@ -1,3 +1,5 @@
+import os
+
 from flask import Flask
 from flask_cors import CORS
 
@@ -5,6 +7,9 @@ from routes import register_routes
 
 app = Flask(__name__)
 CORS(app)
+# Body lớn hơn thì Flask trả về 413 trước khi đọc JSON; độ dài văn bản triệu
+# chứng còn được giới hạn riêng (NLP_MAX_TEXT_CHARS)
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_REQUEST_BYTES", str(1024 * 1024)))
 
 register_routes(app)
 
@@ -0,0 +1,73 @@
+"""
+Cascade lúc dự đoán: model chưng cất (hồi quy logistic fit theo xác suất của
+forest, xem model/distillation.py) chấm mọi hàng trước, chỉ các hàng có xác
+suất nằm trong dải bất định [low, high] đã hiệu chỉnh lúc train mới được
+forest chấm lại. Model chưng cất chỉ là một tích vô hướng trên đầu ra của bước
+tiền xử lý.
+
+Khác forest: hàng đi đường nhanh nhận xác suất của model chưng cất (cùng lớp
+dự đoán và mức nguy cơ với forest ở khoảng tỉ lệ target_agreement, xem report) và
+không có important_factors (explainer giải thích forest). Bật bằng
+PREDICT_CASCADE=1; request gửi "full_forest": true luôn được forest chấm.
+"""
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Cùng giá trị với model/distillation.py
+CASCADE_VERSION = 1
+
+
+class Cascade:
+   """Model chưng cất và dải bất định của nó"""
+
+   def __init__(self, coef, intercept: float, low: float, high: float, report: Optional[Dict[str, Any]] = None):
+      """
+      Args:
+         coef, intercept: hồi quy logistic trên đầu ra của bước tiền xử lý
+         low, high: hàng có xác suất chưng cất trong [low, high] do forest chấm
+         report: số liệu lúc train (tỉ lệ khớp, tỉ lệ đi đường nhanh)
+      """
+      self.coef = np.asarray(coef, dtype=np.float64)
+      self.intercept = float(intercept)
+      self.low = float(low)
+      self.high = float(high)
+      self.report = dict(report or {})
+      self._lock = threading.Lock()
+      self._fast = 0
+      self._full = 0
+
+   def predict_proba(self, X) -> np.ndarray:
+      """Xác suất hai lớp (n, 2) cho mảng đầu ra của bước tiền xử lý"""
+      p = 1.0 / (1.0 + np.exp(-(np.asarray(X, dtype=np.float64) @ self.coef + self.intercept)))
+      return np.column_stack([1.0 - p, p])
+
+   def uncertain(self, proba: np.ndarray) -> np.ndarray:
+      """Mask các hàng (theo kết quả predict_proba) cần forest chấm lại"""
+      mask = (proba[:, 1] >= self.low) & (proba[:, 1] <= self.high)
+      with self._lock:
+         full = int(np.count_nonzero(mask))
+         self._full += full
+         self._fast += len(mask) - full
+      return mask
+
+   def stats(self) -> Dict[str, Any]:
+      with self._lock:
+         fast, full = self._fast, self._full
+      return {
+         "band": [self.low, self.high],
+         "fast": fast,
+         "full": full,
+         "fast_fraction": round(fast / (fast + full), 4) if fast + full else None,
+         "train": self.report
+      }
+
+
+def load_cascade(model_data: Dict[str, Any]) -> Optional[Cascade]:
+   """Cascade lưu lúc train; None nếu file model chưa có (xem distillation.py) hoặc khác phiên bản"""
+   stored = model_data.get('cascade')
+   if stored is None or stored.get('version') != CASCADE_VERSION:
+      print("Cascade not available: retrain or run distillation.py")
+      return None
+   return Cascade(stored['coef'], stored['intercept'], stored['low'], stored['high'], stored.get('report'))
@@ -0,0 +1,206 @@
+import re
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import accent_fold
+from entity_scanner import UNREADABLE, NumberScan
+
+# Lề ngữ cảnh hai bên mỗi đoạn. Mọi pattern chỉ nhìn ra ngoài vị trí bắt đầu
+# của nó tối đa: 30 ký tự (cửa sổ đau ngực quanh từ khóa gắng sức), 20 ký tự
+# (ngữ cảnh của số), hoặc các từ cố định ngắn hơn (từ khóa dài nhất 28 ký tự,
+# 'blood pressure', 'years old', ...) nối với nhau bằng dãy khoảng trắng / chữ số
+_MARGIN = 64
+# Ký tự không thuộc dãy khoảng trắng / chữ số / dấu chấm: pattern chỉ đi qua
+# được một số ít các ký tự này (phần chữ cố định của nó)
+_FIXED_CHAR = re.compile(r'[^\s\d.]')
+_SENTENCE_END = re.compile(r'[.!?;\n]\s')
+_DIGITS = re.compile(r'\d+')
+# Thứ tự của cách tìm số đứng riêng theo ngữ cảnh (cách cuối) của huyết áp và cholesterol
+_CONTEXT_STAGE = 4
+
+# (tên feature, tên hàm sinh các cách tìm trên HeartDiseaseNLPExtractor)
+_NUMERIC_CANDIDATES = (
+   ('Age', '_age_candidates'),
+   ('RestingBP', '_blood_pressure_candidates'),
+   ('Cholesterol', '_cholesterol_candidates'),
+   ('FastingBS', '_fasting_bs_candidates'),
+   ('MaxHR', '_max_hr_candidates'),
+   ('Oldpeak', '_oldpeak_candidates'),
+)
+
+
+def _iter_chunks(source: Union[str, Iterable[str], Any], read_size: int) -> Iterator[str]:
+   """Đọc văn bản từ file-like (có .read) hoặc iterator các đoạn chuỗi"""
+   if isinstance(source, str):
+      yield source
+   elif hasattr(source, 'read'):
+      while True:
+         chunk = source.read(read_size)
+         if not chunk:
+            return
+         yield chunk
+   else:
+      yield from source
+
+
+class ChunkedExtraction:
+   """
+   Trích xuất features từ văn bản dài theo từng đoạn, cho kết quả giống hệt
+   extract_all_features trên toàn văn bản.
+
+   Mỗi đoạn (cắt ở cuối câu) được quét kèm một lề _MARGIN ký tự hai bên, nhưng
+   chỉ nhận các kết quả bắt đầu trong phần của đoạn, nên pattern nằm vắt qua
+   chỗ cắt vẫn được tìm thấy đúng một lần. Giữa các đoạn chỉ giữ lại:
+   - với mỗi cách tìm của mỗi feature số: giá trị đầu tiên tìm thấy
+   - các nhóm từ khóa đã gặp, kết quả từ khóa gắng sức đã xét
+   - ngữ cảnh ±20 ký tự của lần xuất hiện đầu tiên của các số có thể là huyết áp
+     / cholesterol (vài trăm chuỗi số cố định)
+   nên bộ nhớ không tăng theo độ dài văn bản.
+   """
+
+   def __init__(self, extractor, chunk_size: int = 16384):
+      self.extractor = extractor
+      self.chunk_size = max(chunk_size, 4 * _MARGIN)
+      # feature -> {thứ tự cách tìm: giá trị đầu tiên}
+      self.stages: Dict[str, Dict[int, Any]] = {feature: {} for feature, _ in _NUMERIC_CANDIDATES}
+      self.groups: Set[str] = set()
+      # từ khóa gắng sức -> có đau ngực quanh lần xuất hiện đầu tiên
+      self.angina: Dict[str, bool] = {}
+      self.angina_keywords: List[str] = (
+         extractor.medical_vocab['angina_yes']['vi'] + extractor.medical_vocab['angina_yes']['en']
+      )
+      self.contexts: Dict[str, str] = {}
+      self.context_numbers = frozenset(
+         number for number in (str(n) for n in range(10, 1000))
+         if extractor._is_context_number(number)
+      )
+
+   def run(self, source, read_size: Optional[int] = None) -> Tuple[Dict[str, Any], List[str]]:
+      chunks = _iter_chunks(source, read_size or self.chunk_size)
+      buffer = ''   # văn bản (đã lowercase) từ vị trí toàn cục base trở đi
+      base = 0
+      owned = 0     # đoạn tiếp theo bắt đầu từ vị trí toàn cục này
+      exhausted = False
+
+      while True:
+         start = owned - base
+         if not exhausted and len(buffer) - start < self.chunk_size + 2 * _MARGIN:
+            chunk = next(chunks, None)
+            if chunk is None:
+               exhausted = True
+            else:
+               buffer += chunk.lower()
+            continue
+
+         if exhausted and len(buffer) - start <= self.chunk_size:
+            # Đoạn cuối: không cần lề phải
+            self._scan_window(buffer, start, len(buffer))
+            break
+
+         cut = self._cut_point(buffer, start)
+         end = self._window_end(buffer, cut)
+         if end is None and not exhausted:
+            # Dãy khoảng trắng / chữ số dài bất thường ngay sau chỗ cắt: đọc thêm
+            chunk = next(chunks, None)
+            if chunk is None:
+               exhausted = True
+            else:
+               buffer += chunk.lower()
+            continue
+
+         self._scan_window(buffer[:end] if end is not None else buffer, start, cut)
+
+         # Chỉ giữ lại lề trái cho đoạn sau
+         owned = base + cut
+         keep_from = max(base, owned - _MARGIN)
+         buffer = buffer[keep_from - base:]
+         base = keep_from
+
+      return self._result()
+
+   def _cut_point(self, buffer: str, start: int) -> int:
+      """Vị trí cắt đoạn: cuối câu cuối cùng trong nửa sau của đoạn, nếu có"""
+      limit = start + self.chunk_size
+      best = None
+      for match in _SENTENCE_END.finditer(buffer, start + self.chunk_size // 2, limit):
+         best = match.end()
+      return best if best is not None else limit
+
+   def _window_end(self, buffer: str, cut: int) -> Optional[int]:
+      """
+      Cuối lề phải: ít nhất _MARGIN ký tự và chứa _MARGIN ký tự chữ cố định,
+      để pattern bắt đầu trước cut chắc chắn kết thúc trong lề
+      """
+      count = 0
+      for match in _FIXED_CHAR.finditer(buffer, cut):
+         count += 1
+         if count >= _MARGIN:
+            return max(match.end(), cut + _MARGIN)
+      return None
+
+   def _scan_window(self, window: str, start: int, end: int) -> None:
+      """Quét window nhưng chỉ nhận kết quả bắt đầu trong [start, end)"""
+      extractor = self.extractor
+      if self._needs_contexts():
+         self._record_contexts(window, start, end)
+
+      scan = NumberScan(window, start, end, self.contexts)
+      for feature, candidates in _NUMERIC_CANDIDATES:
+         # Chỉ lần khớp đầu tiên của mỗi cách tìm được tính, kể cả khi không đọc được.
+         # Khi cách k đã có giá trị thì các cách sau k không còn ý nghĩa
+         stages = self.stages[feature]
+         limit = self._stage_limit(stages)
+         if limit == 0:
+            continue
+         for stage, value in enumerate(getattr(extractor, candidates)(window, scan)):
+            if stage >= limit:
+               break
+            if value is not None and stage not in stages:
+               stages[stage] = value
+               if value is not UNREADABLE:
+                  limit = stage
+
+      hits = extractor.keyword_index.scan(window)
+      self.groups.update(group for group in extractor.keyword_index.members if hits.has(group))
+
+      for keyword in self.angina_keywords:
+         if keyword in self.angina:
+            continue
+         idx = accent_fold.find(window, keyword, start)
+         if idx != -1 and idx < end:
+            context = window[max(0, idx - 30):idx + 30]
+            self.angina[keyword] = extractor.keyword_index.scan(context).has('symptom_chest_pain')
+
+   @staticmethod
+   def _stage_limit(stages: Dict[int, Any]) -> int:
+      """Chỉ còn cần xét các cách tìm có thứ tự nhỏ hơn giá trị này"""
+      readable = [stage for stage, value in stages.items() if value is not UNREADABLE]
+      return min(readable) if readable else sys.maxsize
+
+   def _needs_contexts(self) -> bool:
+      """Ngữ cảnh số chỉ dùng ở cách tìm cuối cùng của huyết áp / cholesterol"""
+      return any(self._stage_limit(self.stages[feature]) > _CONTEXT_STAGE
+                 for feature in ('RestingBP', 'Cholesterol'))
+
+   def _record_contexts(self, window: str, start: int, end: int) -> None:
+      """Ngữ cảnh của lần xuất hiện đầu tiên (tương đương text.find) của các chuỗi số"""
+      contexts = self.contexts
+      # Chuỗi số chỉ nằm trong các dãy chữ số: liệt kê các dãy khác nhau (trong C)
+      # rồi tìm vị trí đầu tiên của từng chuỗi con bằng str.find
+      for run in set(_DIGITS.findall(window, max(0, start - 2), end + 2)):
+         for i in range(len(run) - 1):
+            for number in (run[i:i + 2], run[i:i + 3]):
+               if number in contexts or number not in self.context_numbers:
+                  continue
+               idx = window.find(number, start)
+               if idx != -1 and idx < end:
+                  contexts[number] = window[max(0, idx - 20):idx + 20]
+
+   def _result(self) -> Tuple[Dict[str, Any], List[str]]:
+      found = {}
+      for feature, stages in self.stages.items():
+         # Cách tìm có ưu tiên cao nhất mà lần khớp đầu tiên đọc được giá trị
+         readable = [stage for stage, value in stages.items() if value is not UNREADABLE]
+         if readable:
+            found[feature] = stages[min(readable)]
+      return self.extractor._features_from_parts(found, self.groups, any(self.angina.values()))
@@ -0,0 +1,424 @@
+"""
+Bản numpy phẳng của RandomForestClassifier trong pipeline đã train.
+
+GridSearch có thể chọn tới 200 cây không giới hạn độ sâu; với một hàng (hay
+vài chục hàng) thời gian của forest.predict_proba chủ yếu là chi phí gọi từng
+cây, không phải so sánh. Bản compile nối các cây thành các mảng liền nhau
+(đánh số node chung cho cả rừng, theo chiều rộng trong từng cây để hai node
+con nằm cạnh nhau):
+- feature, threshold: node trong đi sang phải khi x[feature] > threshold;
+- left: node con trái (con phải là left + 1; lá trỏ về chính nó);
+- missing_left: giá trị thiếu (NaN) đi sang trái (như tree_.missing_go_to_left);
+- leaf_value: xác suất các lớp tại lá, đã chuẩn hóa như tree.predict_proba;
+- roots: node gốc của từng cây.
+predict_proba đi xuống mọi cặp (hàng, cây) cùng lúc, mỗi lượt một tầng, bỏ
+dần các cặp đã tới lá; rồi cộng xác suất tại lá theo thứ tự cây và chia cho
+số cây, giống hệt forest.predict_proba từng bit. Như sklearn, x được làm tròn
+về float32; threshold (float64) được làm tròn xuống float32 nên phép so sánh
+float32 cho cùng kết quả.
+
+Mỗi lượt là vài phép gather của numpy trên mọi cặp còn lại: nhanh hơn sklearn
+nhiều lần với batch nhỏ (/predict gửi một hàng), nhưng chậm hơn vòng lặp
+Cython của sklearn với batch vài trăm hàng trở lên (xem
+benchmarks/bench_forest.py), nên prediction_service chỉ dùng bản compile tới
+FOREST_MAX_BATCH hàng.
+
+predict_proba_early đi qua các cây theo từng đoạn và dừng sớm từng hàng khi
+các cây còn lại không thể đưa xác suất qua một ngưỡng cho trước (các mức nguy
+cơ của /predict). Chỉ dùng để đo số cây cần đi (benchmarks/bench_early_exit.py):
+với một hàng, các lượt kiểm tra tốn hơn phần cây tiết kiệm được nên server
+không dùng.
+
+Xuất artifact (npz nén, ghi kèm hash của file model, tự compile lại khi model
+đổi) và kiểm tra từng bit trên dữ liệu train, chạy từ thư mục model/:
+   python api/compiled_forest.py [model.pkl] [artifact.npz]
+"""
+import os
+import sys
+import tempfile
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from compiled_preprocessor import DEFAULT_MODEL_PATH, model_hash
+
+# Tăng khi cấu trúc artifact thay đổi
+ARTIFACT_VERSION = 1
+
+BASE_DIR = os.path.dirname(__file__)
+DEFAULT_ARTIFACT_PATH = os.environ.get(
+   "FOREST_ARTIFACT_PATH", os.path.join(BASE_DIR, "..", "heart_disease_forest.npz")
+)
+
+# Batch lớn hơn thì vòng lặp Cython của sklearn nhanh hơn (xem benchmarks/bench_forest.py)
+FOREST_MAX_BATCH = int(os.environ.get("FOREST_MAX_BATCH", "128"))
+
+# Số cặp (hàng, cây) tối đa đi xuống cùng lúc, giới hạn bộ nhớ với batch lớn
+CHUNK_PAIRS = 1 << 20
+
+# Khoảng cách tối thiểu tới ngưỡng khi dừng sớm, bù sai số làm tròn của tổng
+EARLY_EXIT_MARGIN = 1e-9
+# Số cây tối thiểu giữa hai lần kiểm tra dừng sớm: mỗi lần là một lượt đi qua
+# các cây, lượt nhỏ quá thì chi phí gọi numpy lớn hơn phần cây tiết kiệm được
+EARLY_EXIT_MIN_STEP = 8
+
+# Tên các mảng trong artifact (cùng tên thuộc tính của CompiledForest)
+_ARRAYS = ('classes', 'roots', 'feature', 'threshold', 'left', 'missing_left', 'leaf_value')
+
+# Một node đọc bằng một lần gather (16 byte) thay vì một lần cho mỗi mảng
+_NODE_DTYPE = np.dtype([('left', '<i4'), ('feature', '<i4'), ('threshold', '<f4'),
+                        ('leaf', '?'), ('missing_right', '?')], align=True)
+
+
+def _float32_floor(values: np.ndarray) -> np.ndarray:
+   """Số float32 lớn nhất <= từng giá trị: với x float32, x <= t khi và chỉ khi x <= floor(t)"""
+   rounded = values.astype(np.float32)
+   above = rounded > values
+   rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+   return rounded
+
+
+class CompiledForest:
+   """Các cây của RandomForestClassifier đã fit ở dạng mảng phẳng"""
+
+   def __init__(self, classes, n_features: int, roots, feature, threshold, left, missing_left, leaf_value):
+      """
+      Args:
+         classes: nhãn các lớp (model.classes_)
+         n_features: số cột đầu vào (đầu ra của bước tiền xử lý)
+         roots: node gốc của từng cây, theo thứ tự estimators_
+         feature, threshold, left, missing_left: mỗi phần tử một node (lá: left
+            trỏ về chính nó, threshold = +inf)
+         leaf_value: mảng (số node, số lớp), xác suất tại lá (node trong: 0)
+      """
+      self.classes = np.asarray(classes)
+      self.n_features = int(n_features)
+      self.roots = np.asarray(roots, dtype=np.int32)
+      self.feature = np.asarray(feature, dtype=np.int32)
+      self.threshold = np.asarray(threshold, dtype=np.float64)
+      self.left = np.asarray(left, dtype=np.int32)
+      self.missing_left = np.asarray(missing_left, dtype=bool)
+      self.leaf_value = np.asarray(leaf_value, dtype=np.float64)
+      self.n_trees = len(self.roots)
+
+      leaf = self.left == np.arange(len(self.left))
+      self._nodes = np.empty(len(self.left), dtype=_NODE_DTYPE)
+      self._nodes['left'] = self.left
+      self._nodes['feature'] = self.feature
+      self._nodes['threshold'] = _float32_floor(self.threshold)
+      self._nodes['leaf'] = leaf
+      # NaN > threshold luôn sai (đi trái), chỉ cần đánh dấu node đưa NaN sang phải
+      self._nodes['missing_right'] = ~self.missing_left & ~leaf
+
+      # Xác suất lớp cuối nhỏ / lớn nhất tại lá của từng cây, cộng dồn theo thứ tự
+      # cây (phần tử k: tổng của k cây đầu) cho predict_proba_early
+      last = self.leaf_value[:, -1]
+      starts = np.sort(self.roots)
+      order = np.argsort(self.roots)
+      lowest = np.empty(self.n_trees)
+      highest = np.empty(self.n_trees)
+      lowest[order] = np.minimum.reduceat(np.where(leaf, last, np.inf), starts)
+      highest[order] = np.maximum.reduceat(np.where(leaf, last, -np.inf), starts)
+      self._lowest_sum = np.r_[0.0, np.cumsum(lowest)]
+      self._highest_sum = np.r_[0.0, np.cumsum(highest)]
+
+   def apply(self, X) -> np.ndarray:
+      """Mảng (n, số cây): lá mà mỗi hàng rơi vào ở từng cây"""
+      X = self._check(X)
+      leaves = np.empty((X.shape[0], self.n_trees), dtype=np.int32)
+      step = max(1, CHUNK_PAIRS // self.n_trees)
+      for start in range(0, X.shape[0], step):
+         leaves[start:start + step] = self._descend(X[start:start + step])
+      return leaves
+
+   def predict_proba(self, X) -> np.ndarray:
+      """
+      Args:
+         X: mảng float (n, n_features) sau bước tiền xử lý
+
+      Returns:
+         mảng (n, số lớp), giống forest.predict_proba
+      """
+      X = self._check(X)
+      proba = np.empty((X.shape[0], len(self.classes)))
+      step = max(1, CHUNK_PAIRS // self.n_trees)
+      for start in range(0, X.shape[0], step):
+         values = self.leaf_value[self._descend(X[start:start + step])]
+         # cumsum cộng lần lượt từng cây như vòng += của sklearn (sum dùng pairwise)
+         proba[start:start + step] = np.cumsum(values, axis=1)[:, -1]
+      proba /= self.n_trees
+      return proba
+
+   def predict_proba_early(self, X, thresholds: Sequence[float],
+                           min_step: int = EARLY_EXIT_MIN_STEP) -> Tuple[np.ndarray, np.ndarray]:
+      """
+      Xác suất hai lớp, dừng sớm từng hàng: đi qua các cây theo thứ tự, cộng dồn
+      xác suất lớp cuối, và dừng khi kể cả các cây còn lại cho giá trị nhỏ / lớn
+      nhất tại lá của chúng thì xác suất cuối cùng cũng không vượt qua ngưỡng nào
+      trong thresholds (vd các mức nguy cơ). Kiểm tra ở lúc sớm nhất một hàng có
+      thể dừng nhưng cách lần trước ít nhất min_step cây.
+
+      Returns:
+         (proba, n_trees): số cây đã đi của từng hàng; hàng đi hết các cây có proba
+         giống predict_proba từng bit, hàng dừng sớm có proba (tổng các cây đã đi,
+         ước lượng cho phần còn lại) nằm giữa cùng hai ngưỡng với xác suất đầy đủ
+      """
+      if len(self.classes) != 2:
+         raise ValueError("early exit needs a binary classifier")
+      X = self._check(X)
+      thresholds = np.sort(np.asarray(thresholds, dtype=np.float64))
+      proba = np.empty((X.shape[0], 2))
+      used = np.empty(X.shape[0], dtype=np.intp)
+      step = max(1, CHUNK_PAIRS // self.n_trees)
+      for start in range(0, X.shape[0], step):
+         proba[start:start + step], used[start:start + step] = self._early_exit(
+            X[start:start + step], thresholds, max(1, min_step))
+      return proba, used
+
+   def _early_exit(self, X: np.ndarray, thresholds: np.ndarray, min_step: int) -> Tuple[np.ndarray, np.ndarray]:
+      n_trees = self.n_trees
+      lowest, highest = self._lowest_sum, self._highest_sum
+      # Sau k cây: tổng cuối cùng nằm trong [total + low_rest[k], total + high_rest[k]]
+      low_rest = lowest[-1] - lowest
+      high_rest = highest[-1] - highest
+      # Chênh lệch lớn nhất giữa hai cách đi của k cây đầu, tăng dần theo k
+      spread = highest - lowest
+      edges = np.r_[-np.inf, thresholds, np.inf] * n_trees
+      margin = EARLY_EXIT_MARGIN * n_trees
+
+      proba = np.empty((len(X), 2))
+      used = np.full(len(X), n_trees, dtype=np.intp)
+      # Tổng xác suất hai lớp qua các cây đã đi
+      totals = np.zeros((len(X), 2))
+      active = np.arange(len(X))
+      done_at = 0
+      while active.size:
+         # Lần kiểm tra tiếp theo: sớm nhất mà một hàng còn lại có thể dừng, nếu
+         # mọi cây tới đó đều cho giá trị đẩy tổng về cùng một phía
+         s = totals[active, 1][:, None]
+         a, b = edges[:-1], edges[1:]
+         low, high = s + low_rest[done_at], s + high_rest[done_at]
+         need = np.maximum(s - lowest[done_at] + highest[-1] - b, a - s + highest[done_at] - lowest[-1]) - margin
+         reachable = (a < high + margin) & (b > low - margin)
+         candidates = np.where(reachable, np.searchsorted(spread, need, side='right'), n_trees)
+         end = int(np.clip(candidates.min(), done_at + min_step, n_trees))
+
+         leaves = self._descend(X[active], self.roots[done_at:end])
+         # Cộng lần lượt từng cây như predict_proba, nối tiếp tổng của các lượt trước
+         values = np.concatenate([totals[active][:, None], self.leaf_value[leaves]], axis=1)
+         totals[active] = np.cumsum(values, axis=1)[:, -1]
+         done_at = end
+         if done_at == n_trees:
+            proba[active] = totals[active] / n_trees
+            break
+         total = totals[active, 1]
+         low, high = total + low_rest[done_at], total + high_rest[done_at]
+         crossing = ((thresholds * n_trees >= low[:, None] - margin)
+                     & (thresholds * n_trees <= high[:, None] + margin)).any(axis=1)
+         stop = active[~crossing]
+         # Ước lượng: trung bình của các cây đã đi, giới hạn trong khoảng chắc chắn
+         estimate = np.clip(total[~crossing] / done_at, low[~crossing] / n_trees, high[~crossing] / n_trees)
+         proba[stop, 0] = 1.0 - estimate
+         proba[stop, 1] = estimate
+         used[stop] = done_at
+         active = active[crossing]
+      return proba, used
+
+   def predict(self, X) -> np.ndarray:
+      return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+   def _check(self, X) -> np.ndarray:
+      X = np.asarray(X)
+      if X.ndim != 2 or X.shape[1] != self.n_features:
+         raise ValueError(f"expected an array of shape (n, {self.n_features}), got {X.shape}")
+      # Cây của sklearn so x dạng float32
+      return np.ascontiguousarray(X, dtype=np.float32)
+
+   def _descend(self, X: np.ndarray, roots: Optional[np.ndarray] = None) -> np.ndarray:
+      """Đi từ gốc xuống lá cho mọi cặp (hàng, cây) của X (các cây có gốc trong roots), mỗi lượt một tầng"""
+      if roots is None:
+         roots = self.roots
+      n_rows = X.shape[0]
+      n_trees = len(roots)
+      values = X.ravel()
+      has_missing = bool(np.isnan(values).any())
+      current = np.tile(roots, n_rows)
+      # Vị trí của x[hàng, 0] trong values cho từng cặp
+      offsets = np.repeat(np.arange(n_rows, dtype=np.int32) * np.int32(self.n_features), n_trees)
+      # Vị trí của các cặp còn đang đi (None: tất cả), bỏ bớt khi quá nửa đã tới lá
+      pairs = None
+      leaves = np.empty(n_rows * n_trees, dtype=np.int32)
+      while True:
+         nodes = self._nodes[current]
+         done = nodes['leaf']
+         n_done = np.count_nonzero(done)
+         if n_done == len(current):
+            if pairs is None:
+               leaves[:] = current
+            else:
+               leaves[pairs] = current
+            break
+         if n_done * 2 > len(current):
+            if pairs is None:
+               pairs = np.arange(len(current), dtype=np.int32)
+            leaves[pairs[done]] = current[done]
+            keep = ~done
+            current, offsets, pairs, nodes = current[keep], offsets[keep], pairs[keep], nodes[keep]
+         x = values[offsets + nodes['feature']]
+         go_right = x > nodes['threshold']
+         if has_missing:
+            go_right |= np.isnan(x) & nodes['missing_right']
+         current = nodes['left'] + go_right
+      return leaves.reshape(n_rows, n_trees)
+
+   def to_arrays(self) -> Dict[str, np.ndarray]:
+      arrays = {name: getattr(self, name) for name in _ARRAYS}
+      arrays['n_features'] = np.asarray(self.n_features)
+      return arrays
+
+   @classmethod
+   def from_arrays(cls, arrays) -> "CompiledForest":
+      return cls(n_features=int(arrays['n_features']), **{name: arrays[name] for name in _ARRAYS})
+
+
+def _breadth_first(tree) -> np.ndarray:
+   """Thứ tự node theo chiều rộng, hai con của một node đứng liền nhau (trái trước)"""
+   order = [np.zeros(1, dtype=np.intp)]
+   level = order[0]
+   while level.size:
+      internal = level[tree.children_left[level] != -1]
+      level = np.empty(2 * internal.size, dtype=np.intp)
+      level[0::2] = tree.children_left[internal]
+      level[1::2] = tree.children_right[internal]
+      order.append(level)
+   return np.concatenate(order)
+
+
+def compile_forest(forest) -> CompiledForest:
+   """
+   Compile RandomForestClassifier (hoặc ExtraTreesClassifier) đã fit, một output
+
+   Raises:
+      ValueError: model không phải rừng cây phân loại một output
+   """
+   estimators = getattr(forest, 'estimators_', None)
+   if not estimators or not hasattr(forest, 'classes_') or getattr(forest, 'n_outputs_', 1) != 1:
+      raise ValueError(f"unsupported classifier {type(forest).__name__}")
+
+   n_classes = len(forest.classes_)
+   roots, feature, threshold, left, missing_left, leaf_value = [], [], [], [], [], []
+   offset = 0
+   for estimator in estimators:
+      tree = estimator.tree_
+      order = _breadth_first(tree)
+      position = np.empty_like(order)
+      position[order] = np.arange(len(order))
+      leaf = tree.children_left[order] == -1
+      roots.append(offset)
+      feature.append(np.where(leaf, 0, tree.feature[order]))
+      threshold.append(np.where(leaf, np.inf, tree.threshold[order]))
+      left.append(np.where(leaf, np.arange(len(order)), position[tree.children_left[order]]) + offset)
+      missing = getattr(tree, 'missing_go_to_left', None)
+      missing_left.append(np.zeros(len(order), dtype=bool) if missing is None else missing[order].astype(bool))
+      # Chuẩn hóa như DecisionTreeClassifier.predict_proba
+      value = tree.value[order, 0, :n_classes].astype(np.float64)
+      normalizer = value.sum(axis=1)
+      normalizer[normalizer == 0.0] = 1.0
+      value = value / normalizer[:, None]
+      value[~leaf] = 0.0
+      leaf_value.append(value)
+      offset += len(order)
+
+   return CompiledForest(forest.classes_, forest.n_features_in_, roots, np.concatenate(feature),
+                         np.concatenate(threshold), np.concatenate(left),
+                         np.concatenate(missing_left), np.concatenate(leaf_value))
+
+
+def save_artifact(compiled: CompiledForest, model_digest: str, path: str = DEFAULT_ARTIFACT_PATH) -> None:
+   # Ghi ra file tạm rồi đổi tên: worker khác đang đọc không bao giờ thấy file dở
+   directory = os.path.dirname(os.path.abspath(path))
+   fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".forest.", suffix=".npz")
+   try:
+      with os.fdopen(fd, "wb") as f:
+         np.savez_compressed(f, version=np.asarray(ARTIFACT_VERSION), model_hash=np.asarray(model_digest),
+                             **compiled.to_arrays())
+      os.replace(tmp_path, path)
+   except BaseException:
+      os.unlink(tmp_path)
+      raise
+
+
+def _read_artifact(path: str, model_digest: str) -> Optional[CompiledForest]:
+   try:
+      with np.load(path, allow_pickle=False) as arrays:
+         if int(arrays['version']) != ARTIFACT_VERSION or str(arrays['model_hash']) != model_digest:
+            return None
+         return CompiledForest.from_arrays(arrays)
+   except (OSError, KeyError, ValueError):
+      return None
+
+
+def load_forest(model, model_path: str = DEFAULT_MODEL_PATH, path: str = DEFAULT_ARTIFACT_PATH,
+                rebuild: bool = True) -> Optional[CompiledForest]:
+   """
+   Nạp bản compile của model.named_steps['classifier']
+
+   Nếu artifact không có, hỏng hoặc của model khác thì compile từ model đã nạp,
+   và ghi lại artifact khi rebuild=True. Trả về None nếu classifier không phải
+   rừng cây (khi đó dùng predict_proba của sklearn).
+   """
+   try:
+      digest = model_hash(model_path)
+   except OSError:
+      digest = None
+   if digest is not None:
+      compiled = _read_artifact(path, digest)
+      if compiled is not None:
+         return compiled
+
+   try:
+      compiled = compile_forest(model.named_steps['classifier'])
+   except ValueError as e:
+      print("Cannot compile classifier:", e)
+      return None
+   if rebuild and digest is not None:
+      try:
+         save_artifact(compiled, digest, path)
+      except OSError as e:
+         print("Cannot write forest artifact:", e)
+   return compiled
+
+
+def verify(forest, compiled: CompiledForest, X) -> int:
+   """Số phần tử khác bit giữa forest.predict_proba(X) và compiled.predict_proba(X)"""
+   expected = forest.predict_proba(X)
+   actual = compiled.predict_proba(X)
+   return int(np.count_nonzero(expected.view(np.uint64) != actual.view(np.uint64)))
+
+
+if __name__ == "__main__":
+   import joblib
+
+   model_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MODEL_PATH
+   target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_ARTIFACT_PATH
+   model = joblib.load(model_path)["model"]
+   forest = model.named_steps['classifier']
+   compiled = compile_forest(forest)
+   save_artifact(compiled, model_hash(model_path), target)
+   print(f"Wrote {os.path.abspath(target)} ({compiled.n_trees} trees, {len(compiled.feature)} nodes, "
+         f"{os.path.getsize(target) / 1024:.0f} KB)")
+
+   # Kiểm tra trên dữ liệu train (chuỗi như lúc train và mã số như /predict gửi)
+   # cùng các hàng nhiễu quanh đó
+   sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+   from nlp_processor import HeartDiseaseNLPExtractor
+   from train_model import load_and_preprocess_data
+   data = load_and_preprocess_data()[0]
+   frame = data[list(model.named_steps['preprocessor'].feature_names_in_)]
+   coded = frame.replace(HeartDiseaseNLPExtractor().value_mapping).infer_objects()
+   X = np.vstack([model.named_steps['preprocessor'].transform(frame),
+                  model.named_steps['preprocessor'].transform(coded)])
+   X = np.vstack([X, X + np.random.default_rng(0).normal(scale=0.5, size=X.shape)])
+   mismatches = verify(forest, compiled, X)
+   print(f"Checked {len(X)} rows: {mismatches} mismatches")
+   sys.exit(1 if mismatches else 0)
@@ -0,0 +1,325 @@
+"""
+Bản numpy phẳng của bước tiền xử lý (ColumnTransformer) trong pipeline đã train.
+
+Mỗi lần /predict, pipeline sklearn dựng DataFrame rồi cho một hàng đi qua
+SimpleImputer, StandardScaler, OneHotEncoder và phép chọn cột của pandas chỉ
+để biến đổi 11 con số. Bản compile giữ lại các hằng số đã fit:
+- cột số / nhị phân: giá trị điền khi thiếu, mean và scale (cột không
+  scale: mean 0, scale 1, trừ / chia không đổi bit nào);
+- cột phân loại: bảng (cột đầu vào, giá trị category, cột đầu ra); giá trị
+  thiếu (NaN) bật cột của category mà imputer điền vào.
+transform nhận mảng float (n, 11) theo thứ tự feature_names_in và ghi vào
+mảng đầu ra có sẵn, cho kết quả giống hệt preprocessor.transform từng bit (cùng
+các phép trừ / chia float64 theo cùng thứ tự).
+
+Model hiện tại được train với category dạng chuỗi ('M', 'ATA', 'Normal'...),
+còn extractor trả về mã số (Sex = 1, ChestPainType = 1...): số không bao giờ
+bằng chuỗi nên, giống sklearn (handle_unknown='ignore'), các cột one-hot luôn
+bằng 0 với đầu vào dạng số. Category dạng chuỗi được giữ trong bảng với giá
+trị NaN (không khớp số nào) để bản compile vẫn giống hệt sklearn.
+
+Xuất artifact (ghi kèm hash của file model, tự compile lại khi model đổi) và
+kiểm tra từng bit trên dữ liệu train, chạy từ thư mục model/:
+   python api/compiled_preprocessor.py [model.pkl] [artifact.npz]
+"""
+import hashlib
+import os
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Tăng khi cấu trúc artifact thay đổi
+ARTIFACT_VERSION = 1
+
+BASE_DIR = os.path.dirname(__file__)
+DEFAULT_MODEL_PATH = os.path.join(BASE_DIR, "..", "heart_disease_model.pkl")
+DEFAULT_ARTIFACT_PATH = os.environ.get(
+   "PREPROCESSOR_ARTIFACT_PATH", os.path.join(BASE_DIR, "..", "heart_disease_preprocessor.npz")
+)
+
+# Tên các mảng trong artifact (cùng tên thuộc tính của CompiledPreprocessor)
+_ARRAYS = ('feature_names_in', 'num_in', 'num_out', 'num_fill', 'num_mean', 'num_scale',
+           'cat_in', 'cat_out', 'cat_values', 'cat_missing', 'cat_strict')
+
+
+class CompiledPreprocessor:
+   """Các hằng số của ColumnTransformer đã fit và phép biến đổi tương ứng"""
+
+   def __init__(self, feature_names_in, n_features_out: int, num_in, num_out, num_fill,
+                num_mean, num_scale, cat_in, cat_out, cat_values, cat_missing, cat_strict):
+      """
+      Args:
+         feature_names_in: tên các cột đầu vào, theo thứ tự
+         n_features_out: số cột đầu ra
+         num_in, num_out: cột đầu vào / đầu ra của các cột số và nhị phân
+         num_fill: giá trị điền khi thiếu (NaN = không có imputer)
+         num_mean, num_scale: đầu ra = (x - mean) / scale
+         cat_in, cat_out, cat_values: mỗi phần tử một category: cột đầu ra
+            cat_out bằng 1 khi cột đầu vào cat_in bằng cat_values (NaN nếu
+            category không phải số)
+         cat_missing: category được bật khi đầu vào thiếu (NaN)
+         cat_strict: category thuộc cột có handle_unknown='error'
+      """
+      self.feature_names_in = np.asarray(feature_names_in, dtype=str)
+      self.n_features_in = len(self.feature_names_in)
+      self.n_features_out = int(n_features_out)
+      self.num_in = np.asarray(num_in, dtype=np.intp)
+      self.num_out = np.asarray(num_out, dtype=np.intp)
+      self.num_fill = np.asarray(num_fill, dtype=np.float64)
+      self.num_mean = np.asarray(num_mean, dtype=np.float64)
+      self.num_scale = np.asarray(num_scale, dtype=np.float64)
+      self.cat_in = np.asarray(cat_in, dtype=np.intp)
+      self.cat_out = np.asarray(cat_out, dtype=np.intp)
+      self.cat_values = np.asarray(cat_values, dtype=np.float64)
+      self.cat_missing = np.asarray(cat_missing, dtype=bool)
+      self.cat_strict = np.asarray(cat_strict, dtype=bool)
+      self._has_fill = bool(np.any(~np.isnan(self.num_fill)))
+      self._has_missing_category = bool(self.cat_missing.any())
+      # Cột đầu vào phân loại không chấp nhận giá trị lạ -> vị trí các category của nó
+      self._strict_columns = {
+         int(column): np.flatnonzero(self.cat_strict & (self.cat_in == column))
+         for column in np.unique(self.cat_in[self.cat_strict])
+      }
+
+   def transform(self, X, out: Optional[np.ndarray] = None) -> np.ndarray:
+      """
+      Args:
+         X: mảng float (n, n_features_in), NaN = thiếu
+         out: mảng float64 (n, n_features_out) để ghi kết quả; mặc định tạo mới
+
+      Raises:
+         ValueError: sai kích thước, hoặc giá trị lạ ở cột có handle_unknown='error'
+      """
+      X = np.asarray(X, dtype=np.float64)
+      if X.ndim != 2 or X.shape[1] != self.n_features_in:
+         raise ValueError(f"expected an array of shape (n, {self.n_features_in}), got {X.shape}")
+      if out is None:
+         out = np.empty((X.shape[0], self.n_features_out))
+      elif out.shape != (X.shape[0], self.n_features_out) or out.dtype != np.float64:
+         raise ValueError(f"out must be a float64 array of shape ({X.shape[0]}, {self.n_features_out})")
+
+      # Cột số: điền giá trị thiếu, rồi x - mean, chia scale (như StandardScaler)
+      numbers = X[:, self.num_in]
+      if self._has_fill:
+         missing = np.isnan(numbers)
+         if missing.any():
+            np.copyto(numbers, np.broadcast_to(self.num_fill, numbers.shape), where=missing)
+      numbers -= self.num_mean
+      numbers /= self.num_scale
+      out[:, self.num_out] = numbers
+
+      # Cột one-hot: so mọi category cùng lúc
+      categories = X[:, self.cat_in]
+      hits = categories == self.cat_values
+      if self._has_missing_category:
+         hits |= np.isnan(categories) & self.cat_missing
+      for column, positions in self._strict_columns.items():
+         unknown = ~hits[:, positions].any(axis=1)
+         if unknown.any():
+            raise ValueError(f"Found unknown categories in column {self.feature_names_in[column]}")
+      out[:, self.cat_out] = hits
+      return out
+
+   def to_arrays(self) -> Dict[str, np.ndarray]:
+      arrays = {name: getattr(self, name) for name in _ARRAYS}
+      arrays['n_features_out'] = np.asarray(self.n_features_out)
+      return arrays
+
+   @classmethod
+   def from_arrays(cls, arrays) -> "CompiledPreprocessor":
+      return cls(n_features_out=int(arrays['n_features_out']), **{name: arrays[name] for name in _ARRAYS})
+
+
+def _category_value(category) -> float:
+   """Giá trị float mà đầu vào phải bằng để khớp category (NaN: không số nào khớp)"""
+   if isinstance(category, str) or category is None:
+      return np.nan
+   try:
+      return float(category)
+   except (TypeError, ValueError):
+      return np.nan
+
+
+def _is_missing(value) -> bool:
+   return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _steps(transformer) -> List[Any]:
+   """Các bước của transformer, bỏ các bước giữ nguyên dữ liệu"""
+   if transformer == 'passthrough':
+      return []
+   from sklearn.preprocessing import FunctionTransformer
+
+   steps = [step for _, step in transformer.steps] if hasattr(transformer, 'steps') else [transformer]
+   # remainder='passthrough' được fit thành FunctionTransformer không có func
+   return [step for step in steps if not (isinstance(step, FunctionTransformer) and step.func is None)]
+
+
+def compile_preprocessor(preprocessor) -> CompiledPreprocessor:
+   """
+   Compile ColumnTransformer đã fit gồm các pipeline [SimpleImputer] [StandardScaler]
+   hoặc [SimpleImputer] OneHotEncoder (cột còn lại bị bỏ hoặc giữ nguyên)
+
+   Raises:
+      ValueError: có bước / tùy chọn không hỗ trợ
+   """
+   from sklearn.impute import SimpleImputer
+   from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+   names_in = list(preprocessor.feature_names_in_)
+   num_in, num_out, num_fill, num_mean, num_scale = [], [], [], [], []
+   cat_in, cat_out, cat_values, cat_missing, cat_strict = [], [], [], [], []
+
+   for name, transformer, columns in preprocessor.transformers_:
+      if transformer == 'drop' or name not in preprocessor.output_indices_:
+         continue
+      output = preprocessor.output_indices_[name]
+      columns = [names_in.index(c) if isinstance(c, str) else int(c) for c in np.atleast_1d(columns)]
+      if output.stop == output.start:
+         continue
+      steps = _steps(transformer)
+
+      fill = [np.nan] * len(columns)
+      if steps and isinstance(steps[0], SimpleImputer):
+         imputer = steps.pop(0)
+         if imputer.add_indicator or not _is_missing(imputer.missing_values):
+            raise ValueError(f"unsupported SimpleImputer options in '{name}'")
+         fill = list(imputer.statistics_)
+
+      if steps and isinstance(steps[-1], OneHotEncoder):
+         encoder = steps.pop()
+         if steps or encoder.drop_idx_ is not None or getattr(encoder, '_infrequent_enabled', False):
+            raise ValueError(f"unsupported OneHotEncoder options in '{name}'")
+         position = output.start
+         for column, categories, missing_value in zip(columns, encoder.categories_, fill):
+            for category in categories:
+               cat_in.append(column)
+               cat_out.append(position)
+               cat_values.append(_category_value(category))
+               # Đầu vào NaN: imputer điền missing_value, hoặc chính NaN là một category
+               cat_missing.append(category == missing_value if not _is_missing(missing_value)
+                                  else _is_missing(category))
+               cat_strict.append(encoder.handle_unknown == 'error')
+               position += 1
+         continue
+
+      mean, scale = [0.0] * len(columns), [1.0] * len(columns)
+      if steps and isinstance(steps[0], StandardScaler):
+         scaler = steps.pop(0)
+         if scaler.with_mean:
+            mean = list(scaler.mean_)
+         if scaler.with_std:
+            scale = list(scaler.scale_)
+      if steps:
+         raise ValueError(f"unsupported step {type(steps[0]).__name__} in '{name}'")
+      for offset, column in enumerate(columns):
+         num_in.append(column)
+         num_out.append(output.start + offset)
+      num_fill.extend(_category_value(value) for value in fill)
+      num_mean.extend(mean)
+      num_scale.extend(scale)
+
+   n_features_out = max(index.stop for index in preprocessor.output_indices_.values())
+   return CompiledPreprocessor(names_in, n_features_out, num_in, num_out, num_fill, num_mean,
+                               num_scale, cat_in, cat_out, cat_values, cat_missing, cat_strict)
+
+
+def model_hash(model_path: str) -> str:
+   """Hash nội dung file model (artifact cũ khi train lại model)"""
+   digest = hashlib.blake2b(digest_size=16)
+   digest.update(str(ARTIFACT_VERSION).encode("utf-8"))
+   with open(model_path, "rb") as f:
+      for block in iter(lambda: f.read(1 << 20), b""):
+         digest.update(block)
+   return digest.hexdigest()
+
+
+def save_artifact(compiled: CompiledPreprocessor, model_digest: str,
+                  path: str = DEFAULT_ARTIFACT_PATH) -> None:
+   # Ghi ra file tạm rồi đổi tên: worker khác đang đọc không bao giờ thấy file dở
+   directory = os.path.dirname(os.path.abspath(path))
+   fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".preprocessor.", suffix=".npz")
+   try:
+      with os.fdopen(fd, "wb") as f:
+         np.savez(f, version=np.asarray(ARTIFACT_VERSION), model_hash=np.asarray(model_digest),
+                  **compiled.to_arrays())
+      os.replace(tmp_path, path)
+   except BaseException:
+      os.unlink(tmp_path)
+      raise
+
+
+def _read_artifact(path: str, model_digest: str) -> Optional[CompiledPreprocessor]:
+   try:
+      with np.load(path, allow_pickle=False) as arrays:
+         if int(arrays['version']) != ARTIFACT_VERSION or str(arrays['model_hash']) != model_digest:
+            return None
+         return CompiledPreprocessor.from_arrays(arrays)
+   except (OSError, KeyError, ValueError):
+      return None
+
+
+def load_preprocessor(model, model_path: str = DEFAULT_MODEL_PATH, path: str = DEFAULT_ARTIFACT_PATH,
+                      rebuild: bool = True) -> Optional[CompiledPreprocessor]:
+   """
+   Nạp bản compile của model.named_steps['preprocessor']
+
+   Nếu artifact không có, hỏng hoặc của model khác thì compile từ model đã nạp,
+   và ghi lại artifact khi rebuild=True. Trả về None nếu preprocessor có bước
+   không hỗ trợ (khi đó dùng pipeline sklearn).
+   """
+   try:
+      digest = model_hash(model_path)
+   except OSError:
+      digest = None
+   if digest is not None:
+      compiled = _read_artifact(path, digest)
+      if compiled is not None:
+         return compiled
+
+   try:
+      compiled = compile_preprocessor(model.named_steps['preprocessor'])
+   except ValueError as e:
+      print("Cannot compile preprocessor:", e)
+      return None
+   if rebuild and digest is not None:
+      try:
+         save_artifact(compiled, digest, path)
+      except OSError as e:
+         print("Cannot write preprocessor artifact:", e)
+   return compiled
+
+
+def verify(preprocessor, compiled: CompiledPreprocessor, frame) -> int:
+   """Số phần tử khác bit giữa preprocessor.transform(frame) và compiled.transform"""
+   expected = preprocessor.transform(frame)
+   if hasattr(expected, 'toarray'):
+      expected = expected.toarray()
+   actual = compiled.transform(frame[list(compiled.feature_names_in)].to_numpy(dtype=np.float64))
+   return int(np.count_nonzero(expected.view(np.uint64) != actual.view(np.uint64)))
+
+
+if __name__ == "__main__":
+   import joblib
+   import pandas as pd
+
+   model_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MODEL_PATH
+   target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_ARTIFACT_PATH
+   preprocessor = joblib.load(model_path)["model"].named_steps['preprocessor']
+   compiled = compile_preprocessor(preprocessor)
+   save_artifact(compiled, model_hash(model_path), target)
+   print(f"Wrote {os.path.abspath(target)} ({compiled.n_features_in} -> {compiled.n_features_out} columns)")
+
+   # Kiểm tra trên dữ liệu train, ở dạng số như /predict gửi (mã của extractor)
+   sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+   from nlp_processor import HeartDiseaseNLPExtractor
+   from train_model import load_and_preprocess_data
+   data = load_and_preprocess_data()[0]
+   frame = data[list(compiled.feature_names_in)].replace(HeartDiseaseNLPExtractor().value_mapping)
+   frame = frame.apply(pd.to_numeric)
+   with_missing = frame.astype(np.float64).mask(np.random.default_rng(0).random(frame.shape) < 0.1)
+   mismatches = verify(preprocessor, compiled, frame) + verify(preprocessor, compiled, with_missing)
+   print(f"Checked {2 * len(frame)} training rows (with and without missing values): {mismatches} mismatches")
+   sys.exit(1 if mismatches else 0)
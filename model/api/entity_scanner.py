@@ -0,0 +1,208 @@
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional, Pattern, Tuple
+
+from accent_fold import fold, tolerant_pattern
+
+# Từ khóa đứng ngay trước số (chỉ cách nhau bởi khoảng trắng)
+CUE_WORDS = (
+   'tuổi', 'age',
+   'huyết áp', 'blood pressure', 'bp',
+   'cholesterol', 'mỡ máu', 'lipid',
+   'đường huyết', 'blood sugar', 'glucose',
+   'nhịp tim', 'heart rate', 'hr', 'mạch',
+   'oldpeak', 'st depression'
+)
+
+# Đơn vị đứng ngay sau số; 'mmol/l' phải đứng trước 'mm'
+# ('tuoi' cũng được; 'nam' thì không vì trùng với 'nam' giới tính)
+UNIT_PATTERN = tolerant_pattern('tuổi') + r'\b|years? old\b|năm|bpm|mg/dl|mmol/l|mm|/'
+_UNIT_NAMES = {fold('tuổi'): 'tuổi'}
+
+# "<cue> <số>": từ khóa, khoảng trắng rồi số. Mỗi cue một pattern riêng có tiền tố
+# là chuỗi cố định nên re tìm rất nhanh và dừng ngay ở lần xuất hiện đầu tiên
+# (một pattern gộp "cue1|cue2|..." phải thử mọi vị trí nên chậm hơn nhiều).
+# Từ khóa gõ không dấu cũng khớp ('huyet ap 150')
+_CUED_INTEGER = {word: re.compile(tolerant_pattern(word) + r'\s*(\d+)') for word in CUE_WORDS}
+_CUED_DECIMAL = {word: re.compile(tolerant_pattern(word) + r'\s*([\d.]+)') for word in CUE_WORDS}
+# "<số> <đơn vị>": dãy [\d.]+ tối đa (lookbehind để không bắt đầu giữa dãy),
+# đơn vị nằm trong lookahead để không "ăn" mất số kế tiếp ("120/80")
+_NUMBER_WITH_UNIT = re.compile(r'(?<![\d.])([\d.]+)(?=\s*(' + UNIT_PATTERN + r'))')
+# Số đứng riêng như một từ (\b...\b)
+_STANDALONE_NUMBER = re.compile(r'\b\d+\b')
+_WORD_CHAR = re.compile(r'\w')
+# Giá trị của một cách tìm đã khớp nhưng không đọc được số (vd 'oldpeak 1.2.3'):
+# nơi dùng bỏ qua nó và thử cách tiếp theo, như khi không tìm thấy
+UNREADABLE = object()
+_SPACES = re.compile(r'\s*')
+
+
+class NumberEntity(NamedTuple):
+   """Một số tìm thấy trong văn bản cùng ngữ cảnh xung quanh"""
+   text: str            # chuỗi số gốc, vd '120' hoặc '1.5'
+   start: int           # span của số trong văn bản
+   end: int
+   cue: Optional[str]   # từ khóa đứng ngay trước (bỏ qua khoảng trắng)
+   unit: Optional[str]  # đơn vị đứng ngay sau (bỏ qua khoảng trắng)
+   unit_end: int        # vị trí sau đơn vị, hoặc ngay sau số nếu không có đơn vị
+
+
+class NumberScan:
+   """
+   Kết quả quét số trên văn bản đã lowercase, dùng chung cho các extractor số.
+
+   Mỗi số được neo bởi từ khóa đứng trước (cue) hoặc đơn vị đứng sau (unit):
+   - decimal: dãy [\\d.]+ tối đa (dùng cho oldpeak)
+   - integer: dãy chữ số liền kề từ khóa / đơn vị, vd '1' trong 'oldpeak 1.5'
+     hoặc '5' trong '1.5 năm'
+
+   Mọi tra cứu đều nhớ lại kết quả và chỉ quét tới khi tìm thấy: số có đơn vị
+   được quét dần trong một lượt duy nhất dùng chung cho mọi đơn vị, số đứng riêng
+   được liệt kê một lần cho cả huyết áp lẫn cholesterol.
+   """
+
+   __slots__ = ('text', 'start', 'end', 'with_unit', 'unit_integers', '_unit_matches', '_cued',
+                '_first', '_standalone', '_offsets', '_contexts')
+
+   def __init__(self, text: str, start: int = 0, end: Optional[int] = None,
+                contexts: Optional[Dict[str, str]] = None):
+      """
+      Args:
+         text: văn bản đã lowercase
+         start, end: chỉ nhận các số / từ khóa bắt đầu trong [start, end); phần
+            ngoài khoảng chỉ dùng làm ngữ cảnh (khi quét từng đoạn của văn bản dài)
+         contexts: ngữ cảnh của lần xuất hiện đầu tiên của mỗi chuỗi số trong
+            toàn văn bản, do nơi quét từng đoạn cung cấp; None = tự tìm trong text
+      """
+      self.text = text
+      self.start = start
+      self.end = len(text) if end is None else end
+      self.with_unit: List[NumberEntity] = []
+      self.unit_integers: List[NumberEntity] = []
+      self._unit_matches: Optional[Iterator[re.Match]] = _NUMBER_WITH_UNIT.finditer(text, start)
+      # (loại số, cue) -> entity đầu tiên hoặc None nếu không có
+      self._cued: Dict[Tuple[str, str], Optional[NumberEntity]] = {}
+      # (loại số) -> {đơn vị: entity đầu tiên}
+      self._first: Dict[str, Dict[str, NumberEntity]] = {'decimal': {}, 'integer': {}}
+      self._standalone: Optional[List[str]] = None
+      self._offsets: Dict[str, int] = {}
+      self._contexts = contexts
+
+   def _find_cued(self, kind: str, cue: str) -> Optional[NumberEntity]:
+      """Số đầu tiên đứng sau cue, tìm một lần rồi nhớ lại"""
+      key = (kind, cue)
+      if key not in self._cued:
+         patterns = _CUED_INTEGER if kind == 'integer' else _CUED_DECIMAL
+         match = patterns[cue].search(self.text, self.start)
+         entity = None
+         if match and match.start() < self.end:
+            start, end = match.span(1)
+            entity = NumberEntity(match.group(1), start, end, cue, None, end)
+         self._cued[key] = entity
+      return self._cued[key]
+
+   def _advance_unit(self) -> bool:
+      """Quét thêm một số có đơn vị; trả về False khi đã hết văn bản"""
+      if self._unit_matches is None:
+         return False
+      match = next(self._unit_matches, None)
+      if match is None or match.start() >= self.end:
+         self._unit_matches = None
+         return False
+
+      value, unit = match.group(1, 2)
+      start, end = match.span(1)
+      unit_end = match.end(2)
+      if unit.startswith('year'):
+         unit = 'years old'
+      else:
+         unit = _UNIT_NAMES.get(fold(unit), unit)
+      decimal = NumberEntity(value, start, end, None, unit, unit_end)
+      self.with_unit.append(decimal)
+      self._first['decimal'].setdefault(unit, decimal)
+
+      # '(\d+)\s*<đơn vị>' chỉ khớp khi ngay trước khoảng trắng là chữ số
+      if value[-1] != '.':
+         digits = value[value.rfind('.') + 1:]
+         integer = NumberEntity(digits, end - len(digits), end, None, unit, unit_end)
+         self.unit_integers.append(integer)
+         self._first['integer'].setdefault(unit, integer)
+      return True
+
+   def _lookup(self, kind: str, cue: Optional[str], unit: Optional[str]) -> Optional[NumberEntity]:
+      if cue is not None:
+         return self._find_cued(kind, cue)
+      first = self._first[kind]
+      while unit not in first:
+         if not self._advance_unit():
+            return None
+      return first[unit]
+
+   def first_integer(self, cue: Optional[str] = None, unit: Optional[str] = None) -> Optional[NumberEntity]:
+      """Số nguyên đầu tiên có từ khóa đứng trước là cue (hoặc đơn vị đứng sau là unit)"""
+      return self._lookup('integer', cue, unit)
+
+   def first_decimal(self, cue: Optional[str] = None, unit: Optional[str] = None) -> Optional[NumberEntity]:
+      """Như first_integer nhưng trên các dãy [\\d.]+"""
+      return self._lookup('decimal', cue, unit)
+
+   def iter_integers(self) -> Iterator[NumberEntity]:
+      """Duyệt các số nguyên có đơn vị theo thứ tự, chỉ quét thêm khi cần"""
+      return self._iter(self.unit_integers)
+
+   def iter_decimals(self) -> Iterator[NumberEntity]:
+      """Duyệt các dãy [\\d.]+ có đơn vị theo thứ tự"""
+      return self._iter(self.with_unit)
+
+   def _iter(self, entities: List[NumberEntity]) -> Iterator[NumberEntity]:
+      index = 0
+      while index < len(entities) or self._advance_unit():
+         # Một lần quét có thể không thêm số nguyên nào (vd '5. năm')
+         while index < len(entities):
+            yield entities[index]
+            index += 1
+
+   def standalone_numbers(self) -> List[str]:
+      """Các số đứng riêng như một từ, theo thứ tự xuất hiện và không lặp lại"""
+      if self._standalone is None:
+         if self.start == 0 and self.end == len(self.text):
+            numbers = _STANDALONE_NUMBER.findall(self.text)
+         else:
+            numbers = [match.group() for match in _STANDALONE_NUMBER.finditer(self.text, self.start)
+                       if match.start() < self.end]
+         self._standalone = list(dict.fromkeys(numbers))
+      return self._standalone
+
+   def mentions_any(self, words: Pattern) -> bool:
+      """
+      Văn bản có thể chứa một trong các từ (words: accent_fold.words_pattern):
+      khi quét từng đoạn thì các từ này có thể nằm ở đoạn khác nên luôn trả về
+      True và để context() quyết định
+      """
+      return self._contexts is not None or words.search(self.text) is not None
+
+   def starts_word(self, entity: NumberEntity) -> bool:
+      """Trước số là ranh giới từ (tương đương \\b ở đầu số trong regex)"""
+      return entity.start == 0 or not _WORD_CHAR.match(self.text, entity.start - 1)
+
+   def followed_by(self, entity: NumberEntity, words: Pattern) -> bool:
+      """Sau đơn vị của số (bỏ qua khoảng trắng) là một trong các từ (accent_fold.words_pattern)"""
+      pos = _SPACES.match(self.text, entity.unit_end).end()
+      return words.match(self.text, pos) is not None
+
+   def context(self, number: str, width: int = 20) -> str:
+      """
+      Cửa sổ ngữ cảnh quanh lần xuất hiện đầu tiên của chuỗi số
+      (text.find được nhớ lại cho mỗi giá trị: số lần tìm không tăng theo số
+      lần chuỗi số lặp lại trong văn bản)
+      """
+      if self._contexts is not None:
+         return self._contexts.get(number, '')
+      idx = self._offsets.get(number)
+      if idx is None:
+         idx = self._offsets[number] = self.text.find(number)
+      return self.text[max(0, idx - width):min(len(self.text), idx + width)]
+
+
+def scan_numbers(text: str) -> NumberScan:
+   """Quét văn bản (đã lowercase) và trả về các số tìm thấy"""
+   return NumberScan(text)
@@ -1,7 +1,13 @@
 import os
 import joblib
 
-from nlp_processor import HeartDiseaseNLPExtractor
+from cascade import load_cascade
+from compiled_forest import load_forest
+from compiled_preprocessor import load_preprocessor, model_hash
+from extractor_artifact import load_extractor
+from near_duplicate_cache import NearDuplicateCache
+from tiered_extractor import TieredExtractor
+from tree_explainer import load_explainer
 
 BASE_DIR = os.path.dirname(__file__)
 MODEL_PATH = os.path.join(BASE_DIR, "..", "heart_disease_model.pkl")
@@ -16,4 +22,49 @@ except Exception as e:
    model = None
    feature_names = []
 
-nlp_extractor = HeartDiseaseNLPExtractor()
+# Phiên bản model (hash nội dung file): nằm trong khóa của cache kết quả dự đoán,
+# nên file model mới được nạp thì các kết quả của model cũ không còn được dùng
+model_version = model_hash(MODEL_PATH) if model is not None else None
+
+# Bước tiền xử lý của model compile thành numpy (giống hệt sklearn từng bit),
+# tắt bằng COMPILED_PREPROCESSOR=0; None = dùng pipeline sklearn
+preprocessor = None
+if model is not None and os.environ.get("COMPILED_PREPROCESSOR", "1").lower() in ("1", "true", "yes"):
+   preprocessor = load_preprocessor(model, MODEL_PATH)
+
+# Các cây của RandomForest nối thành mảng phẳng (giống hệt predict_proba từng bit),
+# dùng cho batch nhỏ; tắt bằng COMPILED_FOREST=0; None = dùng sklearn
+forest = None
+if model is not None and os.environ.get("COMPILED_FOREST", "1").lower() in ("1", "true", "yes"):
+   forest = load_forest(model, MODEL_PATH)
+
+# Phần đóng góp của từng feature vào xác suất của từng bệnh nhân (TreeSHAP gộp
+# về 11 feature) trả về trong /predict; tắt bằng PREDICT_EXPLANATIONS=0
+explainer = None
+if model is not None and os.environ.get("PREDICT_EXPLANATIONS", "1").lower() in ("1", "true", "yes"):
+   explainer = load_explainer(model, preprocessor)
+
+# Model chưng cất chấm trước, forest chỉ chấm các hàng nằm trong dải bất định
+# của nó (xem cascade.py); bật bằng PREDICT_CASCADE=1
+cascade = None
+if model is not None and os.environ.get("PREDICT_CASCADE", "").lower() in ("1", "true", "yes"):
+   cascade = load_cascade(model_data)
+
+# Một extractor dùng chung cho mọi route, nạp từ artifact dựng sẵn nếu còn khớp từ điển
+nlp_extractor = load_extractor()
+
+# Dùng lại kết quả của văn bản gần giống (gửi lại sau khi sửa lỗi gõ, thêm dấu
+# phẩy), bật bằng NLP_NEAR_DUPLICATE_CACHE=1
+near_duplicate_cache = None
+if os.environ.get("NLP_NEAR_DUPLICATE_CACHE", "").lower() in ("1", "true", "yes"):
+   near_duplicate_cache = NearDuplicateCache(
+      nlp_extractor, max_entries=int(os.environ.get("NLP_NEAR_DUPLICATE_ENTRIES", "4096"))
+   )
+
+# Tầng 2 (vd NER) chỉ bật khi khai báo backend, vd
+# NLP_TIER2_BACKEND=tiered_extractor:LabeledValueBackend; chỉ nạp khi lần đầu cần đến
+tiered_extractor = TieredExtractor(
+   near_duplicate_cache if near_duplicate_cache is not None else nlp_extractor,
+   backend=os.environ.get("NLP_TIER2_BACKEND") or None,
+   budget=float(os.environ.get("NLP_TIER2_BUDGET_MS", "500")) / 1000
+)
@@ -0,0 +1,111 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Cận trên (micro giây) của các bucket thời gian chạy, bucket cuối không giới hạn
+TIME_BUCKETS_US = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Cận trên (số ký tự) của các bucket độ dài văn bản đầu vào
+LENGTH_BUCKETS = (64, 256, 1024, 4096, 16384)
+
+# Kết quả của một lần gọi extractor
+MATCH = 'match'         # giá trị ghi rõ trong văn bản được dùng làm feature
+NO_MATCH = 'no_match'   # văn bản không ghi rõ, feature lấy default_values hoặc giá trị ước tính
+DEFAULT = 'default'     # có giá trị ghi rõ nhưng bị thay bằng default_values (vd 0 với `x if x else default`)
+OUTCOMES = (MATCH, NO_MATCH, DEFAULT)
+
+
+def _bucket_labels(bounds: Iterable[int], unit: str) -> List[str]:
+   bounds = list(bounds)
+   return [f'<={bound}{unit}' for bound in bounds] + [f'>{bounds[-1]}{unit}']
+
+
+_TIME_LABELS = _bucket_labels(TIME_BUCKETS_US, 'us')
+_LENGTH_LABELS = _bucket_labels(LENGTH_BUCKETS, '')
+
+
+class _ExtractorStats:
+   """Bộ đếm của một extractor"""
+
+   __slots__ = ('calls', 'total', 'max', 'times', 'lengths', 'outcomes')
+
+   def __init__(self):
+      self.calls = 0
+      self.total = 0.0
+      self.max = 0.0
+      self.times = [0] * (len(TIME_BUCKETS_US) + 1)
+      self.lengths = [0] * (len(LENGTH_BUCKETS) + 1)
+      self.outcomes = dict.fromkeys(OUTCOMES, 0)
+
+   def as_dict(self) -> Dict[str, Any]:
+      return {
+         'calls': self.calls,
+         'total_ms': round(self.total * 1000, 3),
+         'mean_us': round(self.total * 1e6 / self.calls, 2) if self.calls else 0.0,
+         'max_us': round(self.max * 1e6, 2),
+         'time_histogram': dict(zip(_TIME_LABELS, self.times)),
+         'length_histogram': dict(zip(_LENGTH_LABELS, self.lengths)),
+         'outcomes': dict(self.outcomes),
+      }
+
+
+class ExtractionProfiler:
+   """
+   Thống kê thời gian chạy và kết quả của từng extractor.
+
+   Với mỗi extractor: histogram thời gian chạy, histogram độ dài văn bản đầu
+   vào và số lần match / no_match / default. Ngoài ra đếm số văn bản chứa từng
+   từ khóa của từ điển để biết từ khóa nào không bao giờ khớp.
+   An toàn khi dùng từ nhiều thread.
+   """
+
+   def __init__(self, keywords: Iterable[str] = (), clock: Callable[[], float] = time.perf_counter):
+      self.clock = clock
+      self._keywords = list(keywords)
+      self._lock = threading.Lock()
+      self.reset()
+
+   def reset(self) -> None:
+      with self._lock:
+         self._stats: Dict[str, _ExtractorStats] = {}
+         self._keyword_counts = dict.fromkeys(self._keywords, 0)
+         self._texts = 0
+         self._started = time.time()
+
+   def record(self, name: str, elapsed: float, length: int, outcome: Optional[str] = None) -> None:
+      """Ghi lại một lần gọi extractor `name` chạy mất `elapsed` giây trên văn bản dài `length`"""
+      time_bucket = bisect_left(TIME_BUCKETS_US, elapsed * 1e6)
+      length_bucket = bisect_left(LENGTH_BUCKETS, length)
+      with self._lock:
+         stats = self._stats.get(name)
+         if stats is None:
+            stats = self._stats[name] = _ExtractorStats()
+         stats.calls += 1
+         stats.total += elapsed
+         if elapsed > stats.max:
+            stats.max = elapsed
+         stats.times[time_bucket] += 1
+         stats.lengths[length_bucket] += 1
+         if outcome is not None:
+            stats.outcomes[outcome] += 1
+
+   def record_keywords(self, keywords: Iterable[str]) -> None:
+      """Ghi lại các từ khóa có trong một văn bản"""
+      with self._lock:
+         self._texts += 1
+         counts = self._keyword_counts
+         for keyword in keywords:
+            counts[keyword] = counts.get(keyword, 0) + 1
+
+   def snapshot(self) -> Dict[str, Any]:
+      """Bản chụp các thống kê hiện tại (dict dạng JSON)"""
+      with self._lock:
+         return {
+            'since': self._started,
+            'extractors': {name: stats.as_dict() for name, stats in self._stats.items()},
+            'keywords': {
+               'texts': self._texts,
+               'counts': dict(self._keyword_counts),
+               'never_matched': [keyword for keyword, count in self._keyword_counts.items() if count == 0],
+            },
+         }
@@ -0,0 +1,102 @@
+"""
+Artifact dựng sẵn của HeartDiseaseNLPExtractor.
+
+Phần tốn thời gian nhất khi khởi tạo extractor là dựng automaton từ khóa
+(bảng từ khóa lồng nhau / chồng nhau, regex dạng trie). Artifact lưu sẵn các
+bảng này ra đĩa để mỗi worker chỉ cần nạp lại. Artifact ghi kèm hash của từ
+điển: nếu từ điển trong code đã đổi thì load_extractor dựng lại và ghi đè.
+
+Dựng trước khi deploy:
+   python extractor_artifact.py [đường dẫn]
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+from typing import Any, Dict, Optional
+
+from keyword_index import KeywordIndex
+from nlp_processor import HeartDiseaseNLPExtractor
+
+# Tăng khi cấu trúc KeywordIndex hoặc nội dung artifact thay đổi
+ARTIFACT_VERSION = 3
+
+BASE_DIR = os.path.dirname(__file__)
+DEFAULT_ARTIFACT_PATH = os.environ.get(
+   "NLP_ARTIFACT_PATH", os.path.join(BASE_DIR, "..", "nlp_extractor.artifact")
+)
+
+
+def vocabulary_hash(extractor: HeartDiseaseNLPExtractor) -> str:
+   """Hash của các nhóm từ khóa (giữ thứ tự khai báo) và phiên bản artifact"""
+   digest = hashlib.blake2b(digest_size=16)
+   digest.update(str(ARTIFACT_VERSION).encode("utf-8"))
+   digest.update(json.dumps(extractor.keyword_groups(), ensure_ascii=False).encode("utf-8"))
+   return digest.hexdigest()
+
+
+def build_artifact(path: str = DEFAULT_ARTIFACT_PATH,
+                   extractor: Optional[HeartDiseaseNLPExtractor] = None) -> HeartDiseaseNLPExtractor:
+   """Dựng extractor (nếu chưa có) và ghi automaton của nó ra path"""
+   extractor = extractor or HeartDiseaseNLPExtractor()
+   artifact = {
+      "version": ARTIFACT_VERSION,
+      "vocabulary_hash": vocabulary_hash(extractor),
+      "keyword_index": extractor.keyword_index,
+   }
+
+   # Ghi ra file tạm rồi đổi tên: worker khác đang đọc không bao giờ thấy file dở
+   directory = os.path.dirname(os.path.abspath(path))
+   fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".nlp_extractor.")
+   try:
+      with os.fdopen(fd, "wb") as f:
+         pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+      os.replace(tmp_path, path)
+   except BaseException:
+      os.unlink(tmp_path)
+      raise
+   return extractor
+
+
+def _read_artifact(path: str) -> Optional[Dict[str, Any]]:
+   try:
+      with open(path, "rb") as f:
+         artifact = pickle.load(f)
+   except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+      return None
+   if not isinstance(artifact, dict) or artifact.get("version") != ARTIFACT_VERSION:
+      return None
+   if not isinstance(artifact.get("keyword_index"), KeywordIndex):
+      return None
+   return artifact
+
+
+def load_extractor(path: str = DEFAULT_ARTIFACT_PATH, rebuild: bool = True) -> HeartDiseaseNLPExtractor:
+   """
+   Nạp extractor từ artifact
+
+   Nếu artifact không có, hỏng, khác phiên bản hoặc khác hash từ điển thì dựng
+   extractor từ đầu, và ghi lại artifact khi rebuild=True (bỏ qua nếu không
+   ghi được, vd thư mục chỉ đọc).
+   """
+   artifact = _read_artifact(path)
+   if artifact is not None:
+      extractor = HeartDiseaseNLPExtractor(keyword_index=artifact["keyword_index"])
+      if vocabulary_hash(extractor) == artifact["vocabulary_hash"]:
+         return extractor
+
+   extractor = HeartDiseaseNLPExtractor()
+   if rebuild:
+      try:
+         build_artifact(path, extractor)
+      except OSError as e:
+         print("Cannot write NLP extractor artifact:", e)
+   return extractor
+
+
+if __name__ == "__main__":
+   target = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_ARTIFACT_PATH
+   built = build_artifact(target)
+   print(f"Wrote {os.path.abspath(target)} (vocabulary {vocabulary_hash(built)})")
@@ -0,0 +1,205 @@
+import re
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterator, List, NamedTuple, Tuple
+
+from entity_scanner import scan_numbers
+from nlp_processor import KEYWORD_EVIDENCE, HeartDiseaseNLPExtractor, first_found
+
+# Ranh giới câu: dấu câu theo sau bởi khoảng trắng, nên số thập phân
+# ('oldpeak 1.5') và ngày tháng ('12/03') không bị cắt đôi
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;\n])\s+')
+
+
+def _sentence_spans(text: str, pos: int = 0) -> Iterator[Tuple[int, int]]:
+   """(start, end) của các câu không rỗng, bắt đầu quét từ pos"""
+   start = pos
+   # lookbehind vẫn nhìn thấy ký tự trước pos nên ranh giới ngay tại pos được nhận ra
+   for boundary in _SENTENCE_BOUNDARY.finditer(text, pos):
+      if boundary.start() > start:
+         yield start, boundary.start()
+      start = boundary.end()
+   if start < len(text):
+      yield start, len(text)
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+   """Độ dài tiền tố chung, tìm nhị phân trên các phép so sánh chuỗi (chạy trong C)"""
+   low, high = 0, min(len(a), len(b))
+   while low < high:
+      middle = (low + high + 1) // 2
+      if a[:middle] == b[:middle]:
+         low = middle
+      else:
+         high = middle - 1
+   return low
+
+
+class SentenceResult(NamedTuple):
+   """Kết quả trích xuất trên một câu"""
+   groups: FrozenSet[str]              # các nhóm từ khóa có trong câu
+   found: Dict[str, Tuple[int, Any]]   # feature số -> (thứ tự cách tìm, giá trị)
+   exercise_angina: bool               # câu có đau ngực khi gắng sức
+
+
+class _PrefixState(NamedTuple):
+   """Kết quả gộp của các câu từ đầu văn bản tới câu hiện tại"""
+   sentence: str
+   groups: FrozenSet[str]
+   found: Dict[str, Tuple[int, Any]]
+   exercise_angina: bool
+
+
+class IncrementalExtraction:
+   """
+   Trích xuất features cho văn bản đang được gõ.
+
+   Văn bản được chia thành câu; mỗi câu chỉ được trích xuất một lần (nhớ theo
+   nội dung câu) và kết quả gộp được giữ cho từng tiền tố của văn bản, nên khi
+   người dùng sửa văn bản (apply_edit) thì chỉ các câu từ vị trí sửa trở đi được
+   chia và gộp lại, các câu không đổi lấy lại từ cache. Gõ ở cuối ghi chú có
+   chi phí gần như không đổi dù ghi chú dài bao nhiêu.
+
+   Kết quả gộp theo cùng thứ tự ưu tiên với extract_all_features:
+   - feature từ khóa: chạy extractor trên hợp các nhóm từ khóa của mọi câu
+   - feature số: cách tìm có ưu tiên cao nhất ở bất kỳ câu nào, lấy câu đầu tiên
+   Khác biệt duy nhất là ngữ cảnh không vượt qua ranh giới câu (vd từ khóa
+   đau ngực và 'gắng sức' phải nằm cùng câu), nên /analyze vẫn là kết quả cuối.
+   """
+
+   def __init__(self, extractor: HeartDiseaseNLPExtractor, max_cached_sentences: int = 512):
+      self.extractor = extractor
+      self.max_cached_sentences = max_cached_sentences
+      self._sentences: "OrderedDict[str, SentenceResult]" = OrderedDict()
+      self._prefixes: List[_PrefixState] = []
+      # vị trí kết thúc của từng câu trong self.text
+      self._ends: List[int] = []
+      self.text = ""
+      self.features: Dict[str, Any] = {}
+      self.missing_features: List[str] = []
+      self.found_features: List[str] = []
+      # số câu đã phải trích xuất lại (để theo dõi hiệu quả cache)
+      self.rescanned = 0
+
+   def _sentence_result(self, sentence: str) -> SentenceResult:
+      result = self._sentences.get(sentence)
+      if result is not None:
+         self._sentences.move_to_end(sentence)
+         return result
+
+      extractor = self.extractor
+      scan = scan_numbers(sentence)
+      hits = extractor.keyword_index.scan(sentence)
+      candidates = {
+         'Age': extractor._age_candidates(sentence, scan),
+         'RestingBP': extractor._blood_pressure_candidates(sentence, scan),
+         'Cholesterol': extractor._cholesterol_candidates(sentence, scan),
+         # Từ khóa tiểu đường được xử lý khi gộp, ở đây chỉ lấy chỉ số đường huyết
+         'FastingBS': extractor._fasting_bs_candidates(sentence, scan),
+         'MaxHR': extractor._max_hr_candidates(sentence, scan),
+         'Oldpeak': extractor._oldpeak_candidates(sentence, scan),
+      }
+      found = {}
+      for feature, values in candidates.items():
+         stage, value = first_found(values)
+         if value is not None:
+            found[feature] = (stage, value)
+
+      result = SentenceResult(
+         frozenset(group for group in extractor.keyword_index.members if hits.has(group)),
+         found,
+         extractor._extract_exercise_angina(sentence, hits) == 1
+      )
+
+      self.rescanned += 1
+      self._sentences[sentence] = result
+      while len(self._sentences) > self.max_cached_sentences:
+         self._sentences.popitem(last=False)
+      return result
+
+   def update(self, text: str) -> Dict[str, Any]:
+      """
+      Thay toàn bộ văn bản và trả về phần thay đổi (xem apply_edit)
+      """
+      if text.startswith(self.text):
+         # Gõ thêm ở cuối: không cần so sánh từng ký tự
+         changed_from = len(self.text)
+      else:
+         changed_from = _common_prefix_length(self.text, text)
+      return self._reextract(text, changed_from)
+
+   def apply_edit(self, offset: int, delete: int = 0, insert: str = "") -> Dict[str, Any]:
+      """
+      Áp dụng một thay đổi: xóa `delete` ký tự tại `offset` rồi chèn `insert`
+
+      Returns:
+         Dict chỉ chứa các key thay đổi: 'features_extracted' (các feature
+         đổi giá trị), 'missing_features', 'found_features' (các feature
+         được ghi rõ trong văn bản, không phải giá trị mặc định)
+      """
+      if not 0 <= offset <= len(self.text) or delete < 0:
+         raise ValueError("Vị trí sửa nằm ngoài văn bản")
+      text = self.text[:offset] + insert + self.text[offset + delete:]
+      return self._reextract(text, offset)
+
+   def _reextract(self, text: str, changed_from: int) -> Dict[str, Any]:
+      # Các câu kết thúc trước vị trí sửa đầu tiên giữ nguyên (kể cả ranh giới sau chúng)
+      keep = bisect_left(self._ends, changed_from)
+      del self._prefixes[keep:]
+      del self._ends[keep:]
+
+      pos = self._ends[-1] if self._ends else 0
+      for start, end in _sentence_spans(text, pos):
+         sentence = text[start:end].lower()
+         self._prefixes.append(self._extend(self._sentence_result(sentence), sentence))
+         self._ends.append(end)
+      self.text = text
+
+      features, missing, found = self._finalize()
+      delta: Dict[str, Any] = {}
+      changed = {name: value for name, value in features.items() if self.features.get(name) != value}
+      if changed:
+         delta['features_extracted'] = changed
+      if missing != self.missing_features:
+         delta['missing_features'] = missing
+      if found != self.found_features:
+         delta['found_features'] = found
+
+      self.features, self.missing_features, self.found_features = features, missing, found
+      return delta
+
+   def _extend(self, result: SentenceResult, sentence: str) -> _PrefixState:
+      """Gộp thêm một câu vào tiền tố hiện có"""
+      if not self._prefixes:
+         return _PrefixState(sentence, result.groups, result.found, result.exercise_angina)
+
+      previous = self._prefixes[-1]
+      found = previous.found
+      # Câu sau chỉ thắng khi nó tìm được bằng cách có ưu tiên cao hơn
+      better = {feature: stage_value for feature, stage_value in result.found.items()
+                if feature not in found or stage_value[0] < found[feature][0]}
+      if better:
+         found = {**found, **better}
+      return _PrefixState(
+         sentence,
+         previous.groups | result.groups,
+         found,
+         previous.exercise_angina or result.exercise_angina
+      )
+
+   def _finalize(self) -> Tuple[Dict[str, Any], List[str], List[str]]:
+      """Dựng features như extract_all_features từ kết quả gộp của toàn văn bản"""
+      if self._prefixes:
+         state = self._prefixes[-1]
+      else:
+         state = _PrefixState('', frozenset(), {}, False)
+      numeric = {feature: value for feature, (_, value) in state.found.items()}
+      features, missing = self.extractor._features_from_parts(numeric, state.groups, state.exercise_angina)
+
+      found = [
+         feature for feature in features
+         if feature in numeric
+         or any(group in state.groups for group in KEYWORD_EVIDENCE.get(feature, ()))
+         or (feature == 'ExerciseAngina' and features[feature] == 1)
+      ]
+      return features, missing, found
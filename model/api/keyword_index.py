@@ -0,0 +1,186 @@
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from accent_fold import accepts_unaccented, char_class, char_variants, contains, find, fold
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+   """
+   Dựng regex dạng trie từ danh sách từ khóa, vd ['đau ngực', 'đau nhói'] ->
+   'đau\\ (?:ngực|nhói)'. Mỗi vị trí chỉ đi theo một nhánh của trie nên chi phí
+   không tăng theo số từ khóa; nhánh dài hơn được thử trước (longest match).
+
+   Trie được dựng trên từ khóa đã bỏ dấu, mỗi cạnh nhận chữ có dấu của các từ
+   khóa đi qua nó hoặc chữ không dấu ('đau' -> '[dđ]au'), nên văn bản gõ không
+   dấu vẫn khớp mà số nhánh không tăng. Từ khóa ngắn chỉ nhận đúng chữ có dấu
+   (accent_fold.accepts_unaccented); KeywordIndex.resolve kiểm tra lại chuỗi khớp.
+   """
+   # chữ không dấu -> (các chữ được nhận, nút con)
+   trie: Dict[str, Tuple[Set[str], dict]] = {}
+   for keyword in keywords:
+      node = trie
+      tolerant = accepts_unaccented(keyword)
+      for char in keyword:
+         variants, node = node.setdefault(fold(char), (set(), {}))
+         variants.update(char_variants(char) if tolerant else char)
+      node[''] = (set(), {})
+
+   def build(node: Dict[str, Tuple[Set[str], dict]]) -> str:
+      terminal = '' in node
+      branches = [char_class(variants) + build(child)
+                  for base, (variants, child) in sorted(node.items()) if base]
+      if not branches:
+         return ''
+      if len(branches) == 1 and not terminal:
+         return branches[0]
+      pattern = '(?:' + '|'.join(branches) + ')'
+      return pattern + '?' if terminal else pattern
+
+   return build(trie)
+
+
+_MAX_RESOLVED = 4096
+
+
+class KeywordHits:
+   """
+   Kết quả quét từ khóa trên văn bản (đã lowercase).
+
+   Automaton quét văn bản một lượt và trả về từ khóa dài nhất tại mỗi vị trí,
+   các từ khóa nằm bên trong nó được suy ra từ bảng tính sẵn. Chỉ những từ khóa
+   bắt đầu giữa một từ khóa khác và kéo dài ra ngoài ('nam' trong 'tim nam'
+   không có khoảng trắng...) mới cần kiểm tra lại bằng `in`, và chỉ khi nhóm
+   của chúng chưa được tìm thấy.
+
+   Một từ khóa có mặt khi mỗi chữ của nó được gõ đúng dấu hoặc bỏ dấu ('dau
+   nguc', 'đau nguc' đều là 'đau ngực'), nhưng sai dấu thì không ('năng' không
+   phải 'nặng'); từ khóa ngắn như 'ông', 'bà' phải gõ đúng dấu.
+   """
+
+   __slots__ = ('text', 'keywords', 'groups', '_index', '_matched', '_suspects')
+
+   def __init__(self, index: 'KeywordIndex', text: str):
+      self.text = text
+      self._index = index
+      # các từ khóa dài nhất automaton khớp được (không lặp lại)
+      self._matched = set(index.pattern.findall(text))
+      # các từ khóa chắc chắn có trong văn bản và các nhóm của chúng
+      self.keywords: Set[str] = set()
+      self.groups: Set[str] = set()
+      for matched in self._matched:
+         keywords, groups, _ = index.resolve(matched)
+         self.keywords.update(keywords)
+         self.groups.update(groups)
+      self._suspects: Optional[Set[str]] = None
+
+   def _suspect_keywords(self) -> Set[str]:
+      """Các từ khóa có thể bị automaton bỏ qua vì chồng lên từ khóa khác"""
+      if self._suspects is None:
+         self._suspects = set()
+         for matched in self._matched:
+            self._suspects.update(self._index.resolve(matched)[2])
+         self._suspects -= self.keywords
+      return self._suspects
+
+   def _maybe_present(self, keyword: str) -> bool:
+      return keyword in self._suspect_keywords() and contains(self.text, keyword)
+
+   def contains(self, keyword: str) -> bool:
+      """Như `keyword in text`, chấp nhận chữ bỏ dấu"""
+      return keyword in self.keywords or self._maybe_present(keyword)
+
+   def has(self, group: str) -> bool:
+      """Văn bản có chứa ít nhất một từ khóa của nhóm"""
+      if group in self.groups:
+         return True
+      for keyword in self._index.members[group]:
+         if self._maybe_present(keyword):
+            self.keywords.add(keyword)
+            self.groups.update(self._index.groups[keyword])
+            return True
+      return False
+
+   def all_keywords(self) -> frozenset:
+      """Tất cả từ khóa có trong văn bản: hai văn bản cùng all_keywords() thì has() / contains() như nhau"""
+      return frozenset(self.keywords).union(
+         keyword for keyword in self._suspect_keywords() if contains(self.text, keyword))
+
+   def first_offset(self, keyword: str) -> int:
+      """Như text.find(keyword), chấp nhận chữ bỏ dấu"""
+      return find(self.text, keyword) if self.contains(keyword) else -1
+
+   def any_within(self, group: str, start: int, end: int) -> bool:
+      """Có từ khóa nào của nhóm nằm trọn trong text[start:end]"""
+      if not self.has(group):
+         return False
+      return self._index.scan(self.text[start:end]).has(group)
+
+
+class GroupHits:
+   """
+   Tập nhóm từ khóa đã biết trước (vd gộp từ nhiều câu / nhiều đoạn văn bản),
+   dùng thay KeywordHits cho các extractor chỉ cần has()
+   """
+
+   __slots__ = ('groups',)
+
+   def __init__(self, groups: Iterable[str]):
+      self.groups = frozenset(groups)
+
+   def has(self, group: str) -> bool:
+      return group in self.groups
+
+
+class KeywordIndex:
+   """
+   Compile các nhóm từ khóa một lần thành một automaton (trie dạng regex).
+
+   scan() quét văn bản một lượt, chi phí gần như không đổi khi từ điển lớn lên,
+   và cho kết quả giống hệt việc kiểm tra `keyword in text` cho từng từ khóa,
+   với văn bản gõ đủ dấu hay bỏ dấu (accent_fold.contains).
+   """
+
+   def __init__(self, groups: Dict[str, Iterable[str]]):
+      # nhóm -> các từ khóa theo thứ tự khai báo
+      self.members: Dict[str, List[str]] = {group: list(keywords) for group, keywords in groups.items()}
+      # từ khóa -> các nhóm chứa nó (một từ khóa có thể thuộc nhiều nhóm)
+      self.groups: Dict[str, List[str]] = {}
+      for group, keywords in self.members.items():
+         for keyword in keywords:
+            self.groups.setdefault(keyword, []).append(group)
+
+      # Automaton trả về chuỗi trong văn bản mà dạng bỏ dấu là một từ khóa đã bỏ
+      # dấu F. Với mỗi F:
+      # - inner: các từ khóa mà dạng bỏ dấu nằm trọn trong F, là ứng viên có mặt
+      #   (resolve kiểm tra lại dấu trên chuỗi khớp được)
+      # - overlaps: các từ khóa bắt đầu giữa F và kéo dài ra ngoài F; automaton
+      #   tiếp tục quét sau F nên có thể bỏ sót chúng
+      folded = {keyword: fold(keyword) for keyword in self.groups}
+      self.inner: Dict[str, List[str]] = {}
+      self.overlaps: Dict[str, List[str]] = {}
+      for base in set(folded.values()):
+         self.inner[base] = [other for other in self.groups if folded[other] in base]
+         self.overlaps[base] = [
+            other for other in self.groups
+            if any(len(folded[other]) > len(base) - i and folded[other].startswith(base[i:])
+                   for i in range(1, len(base)))
+         ]
+      self.pattern = re.compile(_trie_pattern(self.groups))
+      # chuỗi khớp -> (từ khóa có mặt, nhóm của chúng, overlaps), tính một lần cho mỗi chuỗi
+      self._resolved: Dict[str, Tuple[List[str], Set[str], List[str]]] = {}
+
+   def resolve(self, matched: str) -> Tuple[List[str], Set[str], List[str]]:
+      """Các từ khóa có mặt trong chuỗi automaton khớp được, nhóm của chúng và overlaps"""
+      result = self._resolved.get(matched)
+      if result is None:
+         base = fold(matched)
+         keywords = [keyword for keyword in self.inner[base] if contains(matched, keyword)]
+         result = (keywords, {group for keyword in keywords for group in self.groups[keyword]},
+                   self.overlaps[base])
+         # Chỉ nhớ có giới hạn: số cách gõ dấu / bỏ dấu của văn bản là không giới hạn
+         if len(self._resolved) < _MAX_RESOLVED:
+            self._resolved[matched] = result
+      return result
+
+   def scan(self, text: str) -> KeywordHits:
+      return KeywordHits(self, text)
@@ -0,0 +1,265 @@
+"""
+Cache kết quả trích xuất cho các văn bản gần giống nhau.
+
+Người dùng hay gửi lại gần như cùng một đoạn triệu chứng (sửa lỗi gõ, thêm
+dấu phẩy) nên cache theo hash chính xác của văn bản không nhận ra. Mỗi văn
+bản được tóm tắt bằng chữ ký MinHash của các bộ ba từ liên tiếp; chỉ mục LSH
+(chia chữ ký thành các band) tìm ra các văn bản đã trích xuất có nhiều bộ ba
+chung. Chữ ký dùng một hàm băm duy nhất (one permutation hashing): không gian
+băm chia thành num_slots ngăn, giá trị nhỏ nhất trong mỗi ngăn là một thành
+phần, nên mỗi bộ ba chỉ được băm một lần. Khóa của bucket LSH gồm cả hash của
+dãy số nên các ghi chú theo mẫu chỉ khác số liệu không trở thành ứng viên của
+nhau.
+
+Kết quả cũ chỉ được dùng lại khi chỗ khác nhau giữa hai văn bản (từ đầu chỗ
+khác đầu tiên tới cuối chỗ khác cuối cùng) nằm xa mọi con số và mọi từ khóa
+gắng sức, và không tạo ra hay làm mất từ khóa nào: các extractor chỉ đọc từ
+khóa có mặt, số kèm từ khóa / đơn vị / ngữ cảnh ngay cạnh nó, và ngữ cảnh
+±30 ký tự quanh từ khóa gắng sức, nên khi đó kết quả là như nhau.
+"""
+import heapq
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+_DIGITS = re.compile(r'\d+')
+# ngăn không có bộ ba nào (lớn hơn mọi giá trị hash())
+_EMPTY = sys.maxsize + 1
+# Ngữ cảnh quanh chỗ sửa phải dài hơn: ngữ cảnh của số (đứng riêng: ±20 ký
+# tự) và cửa sổ tìm đau ngực quanh từ khóa gắng sức (±30, _extract_exercise_angina),
+# cộng độ dài từ khóa dài nhất
+_CONTEXT_MARGIN = 30
+# ... và ít nhất chừng này từ mỗi bên: giữa từ khóa / đơn vị và số có thể có
+# khoảng trắng dài tùy ý ('huyết áp      150')
+_CONTEXT_WORDS = 4
+
+
+def _common_prefix(a: str, b: str) -> int:
+   """Độ dài phần đầu chung của a và b (so sánh slice, tìm nhị phân)"""
+   lo, hi = 0, min(len(a), len(b))
+   while lo < hi:
+      mid = (lo + hi + 1) // 2
+      if a[lo:mid] == b[lo:mid]:
+         lo = mid
+      else:
+         hi = mid - 1
+   return lo
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+   """Độ dài phần cuối chung của a và b, tối đa limit"""
+   lo, hi = 0, limit
+   while lo < hi:
+      mid = (lo + hi + 1) // 2
+      if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+         lo = mid
+      else:
+         hi = mid - 1
+   return lo
+
+
+def _context(text: str, start: int, end: int, margin: int) -> str:
+   """text[start:end] mở rộng mỗi bên margin ký tự và ít nhất _CONTEXT_WORDS từ"""
+   before = text[:start].rsplit(None, _CONTEXT_WORDS)
+   begin = len(before[0]) if len(before) > _CONTEXT_WORDS else 0
+   after = text[end:].split(None, _CONTEXT_WORDS)
+   stop = len(text) - len(after[-1]) if len(after) > _CONTEXT_WORDS else len(text)
+   return text[max(0, min(begin, start - margin)):max(stop, end + margin)]
+
+
+class _Entry:
+   __slots__ = ('bands', 'text', 'result')
+
+   def __init__(self, bands: List[int], text: str,
+                result: Tuple[Dict[str, Any], List[str]]):
+      self.bands = bands
+      # văn bản đã lowercase, để so với văn bản mới
+      self.text = text
+      self.result = result
+
+
+class NearDuplicateCache:
+   """
+   Lớp cache đặt trước extractor.extract_all_features.
+
+   Có cùng extract_all_features / default_values với HeartDiseaseNLPExtractor
+   nên dùng thay được (vd làm tầng 1 của TieredExtractor). Giữ tối đa
+   max_entries kết quả, loại kết quả ít dùng gần đây nhất. An toàn khi dùng từ
+   nhiều thread.
+
+   Mỗi lần không dùng lại được tốn thêm chữ ký, tra LSH và kiểm tra ứng viên
+   (cỡ một nửa thời gian trích xuất một ghi chú ngắn), nên chỉ có lợi khi văn
+   bản được gửi lại nhiều (xem benchmarks/bench_near_duplicate.py).
+   """
+
+   def __init__(self, extractor, max_entries: int = 4096, num_slots: int = 32, bands: int = 8,
+                min_bands: int = 2, max_candidates: int = 2):
+      """
+      Args:
+         extractor: HeartDiseaseNLPExtractor
+         num_slots: số thành phần của chữ ký MinHash (chia hết cho bands)
+         bands: số band của LSH; nhiều band hơn thì tìm được cặp ít giống nhau
+            hơn nhưng phải kiểm tra nhiều ứng viên hơn
+         min_bands: số band chung tối thiểu để xét dùng lại (bỏ qua các văn bản
+            chỉ tình cờ trùng một band)
+         max_candidates: số ứng viên tối đa được kiểm tra cho mỗi văn bản
+      """
+      if num_slots % bands:
+         raise ValueError("num_slots must be a multiple of bands")
+      self.extractor = extractor
+      self.default_values = extractor.default_values
+      vocab = extractor.medical_vocab['angina_yes']
+      self._angina_keywords = frozenset(vocab['vi'] + vocab['en'])
+      self._margin = _CONTEXT_MARGIN + max(map(len, extractor.keyword_index.groups))
+      self.max_entries = max_entries
+      self.min_bands = min_bands
+      self.max_candidates = max_candidates
+      self.num_slots = num_slots
+      self._rows = num_slots // bands
+
+      self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+      self._exact: Dict[str, int] = {}
+      self._exact_keys: Dict[int, str] = {}
+      # band thứ i -> giá trị band -> các entry
+      self._buckets: List[Dict[int, Set[int]]] = [{} for _ in range(bands)]
+      self._next_id = 0
+      self._lock = threading.Lock()
+      self.exact_hits = 0
+      self.near_hits = 0
+      self.misses = 0
+      self.rejected = 0
+      self.evictions = 0
+
+   def signature(self, text: str) -> List[int]:
+      """Chữ ký MinHash của các bộ ba từ liên tiếp (văn bản quá ngắn: cả văn bản)"""
+      words = text.split()
+      shingles = {hash(shingle) for shingle in zip(words, words[1:], words[2:])} or {hash(tuple(words))}
+      num_slots = self.num_slots
+      slots = [_EMPTY] * num_slots
+      for shingle in shingles:
+         slot = shingle % num_slots
+         if shingle < slots[slot]:
+            slots[slot] = shingle
+      return slots
+
+   def extract_all_features(self, text: str) -> Tuple[Dict[str, Any], List[str]]:
+      """Như extractor.extract_all_features, dùng lại kết quả của văn bản gần giống nếu có"""
+      with self._lock:
+         entry_id = self._exact.get(text)
+         if entry_id is not None:
+            self._entries.move_to_end(entry_id)
+            self.exact_hits += 1
+            return self._copy(self._entries[entry_id].result)
+
+      text_lower = text.lower()
+      signature = self.signature(text_lower)
+      digits = hash(tuple(_DIGITS.findall(text_lower)))
+      bands = [hash((digits, *signature[i:i + self._rows])) for i in range(0, self.num_slots, self._rows)]
+
+      for entry_id, entry in self._candidates(bands):
+         if not self._same_features(entry.text, text_lower):
+            self._count_rejected()
+            continue
+         with self._lock:
+            if entry_id in self._entries:
+               self._entries.move_to_end(entry_id)
+            self.near_hits += 1
+         return self._copy(entry.result)
+
+      result = self.extractor.extract_all_features(text)
+      self._put(text, _Entry(bands, text_lower, self._copy(result)))
+      with self._lock:
+         self.misses += 1
+      return result
+
+   def found_features(self, text: str, features: Optional[Iterable[str]] = None) -> List[str]:
+      """Như extractor.found_features (không qua cache)"""
+      return self.extractor.found_features(text, features)
+
+   def _same_features(self, cached: str, text: str) -> bool:
+      """Chỗ khác nhau giữa hai văn bản (đã lowercase) không ảnh hưởng tới kết quả trích xuất"""
+      prefix = _common_prefix(cached, text)
+      suffix = _common_suffix(cached, text, min(len(cached), len(text)) - prefix)
+      keywords = []
+      for version in (cached, text):
+         context = _context(version, prefix, len(version) - suffix, self._margin)
+         if _DIGITS.search(context):
+            return False
+         found = self.extractor.keyword_index.scan(context).all_keywords()
+         if not found.isdisjoint(self._angina_keywords):
+            return False
+         keywords.append(found)
+      return keywords[0] == keywords[1]
+
+   def _candidates(self, bands: List[int]) -> List[Tuple[int, _Entry]]:
+      """Các entry chung ít nhất min_bands band (cùng các số), chung nhiều band nhất trước"""
+      with self._lock:
+         shared: Dict[int, int] = {}
+         for buckets, band in zip(self._buckets, bands):
+            for entry_id in buckets.get(band, ()):
+               shared[entry_id] = shared.get(entry_id, 0) + 1
+         best = heapq.nlargest(self.max_candidates,
+                               ((count, entry_id) for entry_id, count in shared.items()
+                                if count >= self.min_bands))
+         return [(entry_id, self._entries[entry_id]) for _, entry_id in best]
+
+   def _put(self, key: str, entry: _Entry) -> None:
+      if self.max_entries <= 0:
+         return
+      with self._lock:
+         if key in self._exact:
+            return
+         entry_id = self._next_id
+         self._next_id += 1
+         self._entries[entry_id] = entry
+         self._exact[key] = entry_id
+         self._exact_keys[entry_id] = key
+         for buckets, band in zip(self._buckets, entry.bands):
+            buckets.setdefault(band, set()).add(entry_id)
+         while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+   def _remove(self, entry_id: int) -> None:
+      entry = self._entries.pop(entry_id)
+      del self._exact[self._exact_keys.pop(entry_id)]
+      for buckets, band in zip(self._buckets, entry.bands):
+         bucket = buckets[band]
+         bucket.discard(entry_id)
+         if not bucket:
+            del buckets[band]
+
+   def _count_rejected(self) -> None:
+      with self._lock:
+         self.rejected += 1
+
+   @staticmethod
+   def _copy(result: Tuple[Dict[str, Any], List[str]]) -> Tuple[Dict[str, Any], List[str]]:
+      return dict(result[0]), list(result[1])
+
+   def clear(self) -> None:
+      with self._lock:
+         self._entries.clear()
+         self._exact.clear()
+         self._exact_keys.clear()
+         for buckets in self._buckets:
+            buckets.clear()
+
+   def stats(self) -> Dict[str, Any]:
+      with self._lock:
+         lookups = self.exact_hits + self.near_hits + self.misses
+         saved = self.exact_hits + self.near_hits
+         return {
+            "entries": len(self._entries),
+            "lookups": lookups,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "evictions": self.evictions,
+            # số lần không phải chạy extractor
+            "extractions_saved": saved,
+            "saved_rate": round(saved / lookups, 4) if lookups else 0.0
+         }
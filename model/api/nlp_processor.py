@@ -1,9 +1,188 @@
+import os
 import re
-from typing import Dict, List, Any, Optional, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, List, Any, Iterable, Iterator, NamedTuple, Optional, Tuple
 import numpy as np
 
+from accent_fold import tolerant_pattern, words_pattern
+from chunked_extractor import ChunkedExtraction
+from entity_scanner import UNREADABLE, NumberScan, scan_numbers
+from extraction_profiler import DEFAULT, MATCH, NO_MATCH, ExtractionProfiler
+from keyword_index import GroupHits, KeywordHits, KeywordIndex
+
+# Độ dài tối đa (ký tự) của văn bản các route nhận để trích xuất. Thời gian
+# trích xuất tuyến tính theo độ dài (xem extract_all_features) nên giới hạn độ
+# dài cũng giới hạn thời gian mỗi request
+MAX_TEXT_CHARS = int(os.environ.get("NLP_MAX_TEXT_CHARS", "20000"))
+
+# Số đứng riêng có thể là huyết áp / cholesterol khi không có từ khóa đi kèm
+_BP_CANDIDATE = re.compile(r'1[0-2]\d|90|1[3-9]\d|200')
+_CHOLESTEROL_CANDIDATE = re.compile(r'[1-3]\d{2}|400')
+# Các từ ngữ cảnh / từ đứng sau đơn vị (khớp cả khi gõ không dấu)
+_BP_CONTEXT = words_pattern(('huyết áp', 'blood', 'bp'))
+_CHOLESTEROL_CONTEXT = words_pattern(('cholesterol', 'mỡ', 'lipid'))
+_CHOLESTEROL_AFTER_UNIT = words_pattern(('cholesterol', 'mỡ'))
+_GLUCOSE_AFTER_UNIT = words_pattern(('đường', 'sugar'))
+_OLDPEAK_AFTER_UNIT = words_pattern(('st', 'depression'))
+
+def _is_bp_candidate(number: str) -> bool:
+   return _BP_CANDIDATE.fullmatch(number) is not None
+
+def _is_cholesterol_candidate(number: str) -> bool:
+   return _CHOLESTEROL_CANDIDATE.fullmatch(number) is not None and 150 <= int(number) <= 300
+
+# Phần sau dấu '/' của "<tâm thu>/<tâm trương> huyết áp"
+_DIASTOLIC_BP = re.compile(r'\s*\d+\s*' + tolerant_pattern('huyết áp'))
+
+# Từ khóa ngoài medical_vocab, cũng được đưa vào automaton
+_SEVERE_SYMPTOMS = ['nặng', 'dữ dội', 'severe', 'intense']
+_MENTION_WORDS = {
+   'Cholesterol': ['cholesterol', 'mỡ máu', 'lipid'],
+   'RestingBP': ['huyết áp', 'blood pressure', 'bp'],
+   'MaxHR': ['nhịp tim', 'heart rate', 'mạch']
+}
+
+def first_found(candidates: Iterable[Optional[Any]]) -> Tuple[int, Optional[Any]]:
+   """
+   Duyệt các cách tìm theo thứ tự ưu tiên, dừng ở cách đầu tiên cho kết quả
+
+   Returns:
+      (thứ tự của cách tìm, giá trị), hoặc (-1, None) nếu không cách nào tìm thấy
+   """
+   for stage, value in enumerate(candidates):
+      if value is not None and value is not UNREADABLE:
+         return stage, value
+   return -1, None
+
+# Các hàm được đo khi bật profiling -> feature mà kết quả được phân loại theo
+# (xem _profiled); None = không phân loại kết quả
+_PROFILED_METHODS = {
+   'extract_all_features': None,
+   '_extract_age': 'Age',
+   '_extract_gender': 'Sex',
+   '_extract_chest_pain_type': 'ChestPainType',
+   '_extract_blood_pressure': 'RestingBP',
+   '_extract_cholesterol': 'Cholesterol',
+   '_extract_fasting_bs': 'FastingBS',
+   '_extract_resting_ecg': 'RestingECG',
+   '_extract_max_hr': 'MaxHR',
+   '_extract_exercise_angina': 'ExerciseAngina',
+   '_extract_oldpeak': 'Oldpeak',
+   '_extract_st_slope': 'ST_Slope',
+   '_check_missing_features': None,
+}
+
+
+class FeatureExtractor(NamedTuple):
+   """Cách trích xuất một feature"""
+   method: str                # hàm của HeartDiseaseNLPExtractor, gọi với (text, *inputs)
+   inputs: Tuple[str, ...]    # 1-2 đầu vào: 'scan' (NumberScan), 'hits' (KeywordHits) hoặc feature cần trước
+   keeps_falsy: bool          # giá trị 0 / 0.0 được giữ lại, không bị thay bằng default_values
+
+
+# Feature -> extractor, theo thứ tự của extract_all_features (feature phụ thuộc
+# đứng sau feature nó cần)
+FEATURE_EXTRACTORS: Dict[str, FeatureExtractor] = {
+   'Age': FeatureExtractor('_extract_age', ('scan',), False),
+   'Sex': FeatureExtractor('_extract_gender', ('hits',), False),
+   'ChestPainType': FeatureExtractor('_extract_chest_pain_type', ('hits',), False),
+   'RestingBP': FeatureExtractor('_extract_blood_pressure', ('scan',), False),
+   'Cholesterol': FeatureExtractor('_extract_cholesterol', ('scan',), False),
+   'FastingBS': FeatureExtractor('_extract_fasting_bs', ('scan', 'hits'), True),
+   # 0 = Normal cũng là default nên giữ hay thay đều như nhau; giữ để câu trả
+   # "ecg bình thường" vẫn cập nhật được (update_features_with_response)
+   'RestingECG': FeatureExtractor('_extract_resting_ecg', ('hits',), True),
+   'MaxHR': FeatureExtractor('_extract_max_hr', ('Age', 'scan'), False),
+   'ExerciseAngina': FeatureExtractor('_extract_exercise_angina', ('hits',), True),
+   'Oldpeak': FeatureExtractor('_extract_oldpeak', ('scan', 'hits'), False),
+   'ST_Slope': FeatureExtractor('_extract_st_slope', ('hits',), False),
+}
+
+# Thứ tự cột model cần (cùng thứ tự với lúc train)
+FEATURE_ORDER = [
+   'Age', 'Sex', 'ChestPainType', 'RestingBP', 'Cholesterol',
+   'FastingBS', 'RestingECG', 'MaxHR', 'ExerciseAngina',
+   'Oldpeak', 'ST_Slope'
+]
+
+# Feature từ khóa -> các nhóm mà chỉ cần một nhóm có mặt là feature được ghi rõ
+KEYWORD_EVIDENCE = {
+   'Sex': ('gender_male', 'gender_female'),
+   'ChestPainType': ('symptom_chest_pain',),
+   'FastingBS': ('comorbidity_diabetes',),
+   'RestingECG': ('ecg_normal', 'ecg_stt', 'ecg_lvh'),
+   'Oldpeak': ('severe_symptom',),
+   'ST_Slope': ('st_up', 'st_down'),
+}
+# Mapping giá trị của các feature dạng mã (HeartDiseaseNLPExtractor.value_mapping)
+VALUE_MAPPING = {
+   'Sex': {'M': 1, 'F': 0},
+   'ChestPainType': {'TA': 0, 'ATA': 1, 'NAP': 2, 'ASY': 3},
+   'RestingECG': {'Normal': 0, 'ST': 1, 'LVH': 2},
+   'ExerciseAngina': {'N': 0, 'Y': 1},
+   'ST_Slope': {'Up': 0, 'Flat': 1, 'Down': 2}
+}
+# Feature dạng mã -> các mã hợp lệ (FastingBS: đường huyết lúc đói > 120 mg/dl)
+FEATURE_CODES = {feature: frozenset(codes.values()) for feature, codes in VALUE_MAPPING.items()}
+FEATURE_CODES['FastingBS'] = frozenset((0, 1))
+# Khoảng hợp lý của các feature số: giá trị ghi rõ trong văn bản được kẹp vào đây
+VALUE_RANGES = {
+   'Age': (20, 100),
+   'RestingBP': (80, 200),
+   'Cholesterol': (100, 400),
+   'MaxHR': (50, 200),
+   'Oldpeak': (0.0, 6.0),
+}
+
+
+def clamp(feature: str, value):
+   """Kẹp value vào VALUE_RANGES[feature]"""
+   low, high = VALUE_RANGES[feature]
+   return min(max(value, low), high)
+
+# Feature số -> hàm liệt kê các cách tìm giá trị ghi rõ (FastingBS: chỉ số đường huyết)
+_NUMERIC_CANDIDATES = {
+   'Age': '_age_candidates',
+   'RestingBP': '_blood_pressure_candidates',
+   'Cholesterol': '_cholesterol_candidates',
+   'FastingBS': '_fasting_bs_candidates',
+   'MaxHR': '_max_hr_candidates',
+   'Oldpeak': '_oldpeak_candidates',
+}
+
+# Các feature có câu hỏi bổ sung (generate_missing_questions) mà
+# update_features_with_response cập nhật được
+_FOLLOW_UP_FEATURES = frozenset([
+   'Cholesterol', 'RestingBP', 'MaxHR', 'RestingECG', 'Oldpeak', 'FastingBS', 'ExerciseAngina'
+])
+
+# extract_many: dưới ngưỡng này chạy ngay trong process hiện tại, vì chi phí
+# khởi động process pool lớn hơn thời gian trích xuất
+_MIN_PARALLEL_TEXTS = 256
+
+# Extractor riêng của mỗi worker process, tạo một lần trong _init_worker
+_worker_extractor = None
+
+
+def _init_worker(keyword_index: Optional[KeywordIndex] = None):
+   global _worker_extractor
+   # Nhận automaton đã dựng từ process cha thay vì dựng lại
+   _worker_extractor = HeartDiseaseNLPExtractor(keyword_index)
+
+
+def _extract_chunk(texts: List[str]) -> List[Tuple[Dict[str, Any], List[str]]]:
+   return [_worker_extractor.extract_all_features(text) for text in texts]
+
+
 class HeartDiseaseNLPExtractor:
-   def __init__(self):
+   def __init__(self, keyword_index: Optional[KeywordIndex] = None):
+      """
+      Args:
+         keyword_index: automaton từ khóa dựng sẵn (vd nạp từ artifact, xem
+            extractor_artifact.load_extractor); mặc định dựng từ keyword_groups()
+      """
       # Từ điển triệu chứng và điều kiện y tế
       self.medical_vocab = {
          # Giới tính
@@ -113,13 +292,7 @@ class HeartDiseaseNLPExtractor:
       }
 
       # Mapping giá trị cho các feature
-      self.value_mapping = {
-         'Sex': {'M': 1, 'F': 0},
-         'ChestPainType': {'TA': 0, 'ATA': 1, 'NAP': 2, 'ASY': 3},
-         'RestingECG': {'Normal': 0, 'ST': 1, 'LVH': 2},
-         'ExerciseAngina': {'N': 0, 'Y': 1},
-         'ST_Slope': {'Up': 0, 'Flat': 1, 'Down': 2}
-      }
+      self.value_mapping = {feature: dict(codes) for feature, codes in VALUE_MAPPING.items()}
 
       # Danh sách features bắt buộc và tùy chọn
       self.required_features = ['Age', 'Sex']
@@ -143,312 +316,588 @@ class HeartDiseaseNLPExtractor:
          'ST_Slope': 1  # Flat
       }
 
+      # Compile toàn bộ từ khóa một lần thành automaton, quét một lượt cho mọi extractor
+      self.keyword_index = keyword_index or KeywordIndex(self.keyword_groups())
+      self.profiler: Optional[ExtractionProfiler] = None
+
+   def keyword_groups(self) -> Dict[str, List[str]]:
+      """Nhóm -> các từ khóa mà automaton cần nhận ra"""
+      keyword_groups = {
+         category: terms['vi'] + terms['en'] for category, terms in self.medical_vocab.items()
+      }
+      keyword_groups['severe_symptom'] = _SEVERE_SYMPTOMS
+      for feature, words in _MENTION_WORDS.items():
+         keyword_groups['mention_' + feature] = words
+      return keyword_groups
+
    def extract_all_features(self, text: str) -> Tuple[Dict[str, Any], List[str]]:
       """
       Trích xuất tất cả features từ văn bản
 
+      Thời gian tuyến tính theo độ dài văn bản, kể cả với văn bản cố tình gây
+      chậm (dãy chữ số rất dài, từ khóa lặp lại, khoảng trắng rất dài):
+      - số và từ khóa được quét một lượt (NumberScan, KeywordIndex), các tra
+        cứu sau đó dùng lại kết quả quét;
+      - mọi pattern có `\s*` hay `[\d.]+` chỉ có một vòng lặp, không lồng nhau,
+        và dãy [\d.]+ chỉ bắt đầu ở đầu dãy (lookbehind), nên mỗi ký tự chỉ bị
+        đọc lại một số lần giới hạn;
+      - ngữ cảnh của số đứng riêng tìm bằng text.find tối đa một lần cho mỗi
+        giá trị ứng viên (_BP_CANDIDATE / _CHOLESTEROL_CANDIDATE: vài trăm chuỗi
+        2-3 chữ số), không phải cho mỗi lần xuất hiện.
+      benchmarks/bench_adversarial.py kiểm tra điều này. Các route giới hạn độ
+      dài văn bản ở MAX_TEXT_CHARS.
+
       Returns:
          Tuple[features_dict, missing_features]
       """
-      features = {}
       text_lower = text.lower()
 
-      # 1. Trích xuất tuổi
-      age = self._extract_age(text_lower)
-      features['Age'] = age if age else self.default_values['Age']
+      # Quét số và từ khóa một lượt, dùng chung cho các extractor
+      scan = scan_numbers(text_lower)
+      hits = self.keyword_index.scan(text_lower)
 
-      # 2. Trích xuất giới tính
-      sex = self._extract_gender(text_lower)
-      features['Sex'] = sex if sex else self.default_values['Sex']
+      features = self._run_extractors(text_lower, FEATURE_EXTRACTORS, scan, hits, {})
 
-      # 3. Trích xuất ChestPainType
-      cp_type = self._extract_chest_pain_type(text_lower)
-      features['ChestPainType'] = cp_type if cp_type else self.default_values['ChestPainType']
+      # Kiểm tra features missing
+      missing_features = self._check_missing_features(features, text_lower, hits)
 
-      # 4. Trích xuất RestingBP
-      resting_bp = self._extract_blood_pressure(text_lower)
-      features['RestingBP'] = resting_bp if resting_bp else self.default_values['RestingBP']
+      return features, missing_features
 
-      # 5. Trích xuất Cholesterol
-      cholesterol = self._extract_cholesterol(text_lower)
-      features['Cholesterol'] = cholesterol if cholesterol else self.default_values['Cholesterol']
+   def extract(self, text: str, features: Optional[Iterable[str]] = None,
+               known: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+      """
+      Chỉ trích xuất các feature được yêu cầu (vd câu trả lời cho một câu hỏi bổ sung)
 
-      # 6. Trích xuất FastingBS
-      fasting_bs = self._extract_fasting_bs(text_lower)
-      features['FastingBS'] = fasting_bs if fasting_bs is not None else self.default_values['FastingBS']
+      Chỉ chạy extractor của các feature đó và của feature chúng cần (MaxHR cần
+      Age), chỉ quét số / từ khóa khi có extractor dùng đến. Giá trị giống hệt
+      extract_all_features, kể cả cách thay giá trị không tìm thấy bằng default_values.
 
-      # 7. Trích xuất RestingECG
-      resting_ecg = self._extract_resting_ecg(text_lower)
-      features['RestingECG'] = resting_ecg if resting_ecg else self.default_values['RestingECG']
+      Args:
+         features: tên các feature (xem FEATURE_EXTRACTORS); mặc định tất cả
+         known: giá trị đã biết của các feature được cần đến (vd Age khi trích
+            xuất MaxHR), không trích xuất lại
 
-      # 8. Trích xuất MaxHR
-      max_hr = self._extract_max_hr(text_lower, features['Age'])
-      features['MaxHR'] = max_hr if max_hr else self.default_values['MaxHR']
+      Returns:
+         feature -> giá trị, chỉ gồm các feature được yêu cầu
 
-      # 9. Trích xuất ExerciseAngina
-      exercise_angina = self._extract_exercise_angina(text_lower)
-      features['ExerciseAngina'] = exercise_angina if exercise_angina is not None else self.default_values['ExerciseAngina']
+      Raises:
+         ValueError: tên feature không có trong FEATURE_EXTRACTORS
+      """
+      requested = list(FEATURE_EXTRACTORS if features is None else features)
+      known = known or {}
+      text_lower = text.lower()
+      order = self._extraction_order(requested, known)
+      scan, hits = self._shared_inputs(text_lower, order)
+      values = self._run_extractors(text_lower, order, scan, hits, known)
+      return {name: values[name] for name in requested}
 
-      # 10. Trích xuất Oldpeak
-      oldpeak = self._extract_oldpeak(text_lower)
-      features['Oldpeak'] = oldpeak if oldpeak else self.default_values['Oldpeak']
+   def found_features(self, text: str, features: Optional[Iterable[str]] = None) -> List[str]:
+      """
+      Các feature (trong features, mặc định tất cả) có giá trị ghi rõ trong văn bản
+
+      Cùng quy ước với found_features của IncrementalExtraction: feature số có
+      một cách tìm cho kết quả, feature từ khóa có từ khóa của nó (KEYWORD_EVIDENCE),
+      ExerciseAngina khi có đau ngực lúc gắng sức. Các feature còn lại mang giá
+      trị mặc định hoặc ước tính (vd MaxHR theo tuổi), dù giá trị đó có bằng
+      default_values hay không; ngược lại giá trị ghi rõ có thể trùng
+      default_values (vd huyết áp 120).
+      """
+      requested = list(FEATURE_EXTRACTORS if features is None else features)
+      text_lower = text.lower()
+      hits = self.keyword_index.scan(text_lower)
+      scan = scan_numbers(text_lower) if any(name in _NUMERIC_CANDIDATES for name in requested) else None
+      found = []
+      for name in requested:
+         value = self._extract_exercise_angina(text_lower, hits) if name == 'ExerciseAngina' else None
+         if self._is_found(name, text_lower, scan, hits, value):
+            found.append(name)
+      return found
+
+   def _is_found(self, name: str, text: str, scan: Optional[NumberScan], hits, value: Any) -> bool:
+      """
+      Feature name có giá trị ghi rõ trong văn bản (đã lowercase) không, theo
+      quy ước của found_features
 
-      # 11. Trích xuất ST_Slope
-      st_slope = self._extract_st_slope(text_lower)
-      features['ST_Slope'] = st_slope if st_slope else self.default_values['ST_Slope']
+      Args:
+         scan: cần cho các feature trong _NUMERIC_CANDIDATES
+         value: giá trị extractor của feature trả về (chỉ dùng cho ExerciseAngina)
+      """
+      if name == 'ExerciseAngina':
+         return value == 1
+      if any(hits.has(group) for group in KEYWORD_EVIDENCE.get(name, ())):
+         return True
+      return (name in _NUMERIC_CANDIDATES
+              and first_found(getattr(self, _NUMERIC_CANDIDATES[name])(text, scan))[1] is not None)
+
+   def _extraction_order(self, features: Iterable[str], known: Dict[str, Any]) -> List[str]:
+      """Các feature cần chạy extractor (kèm feature chúng cần mà chưa biết), theo thứ tự chạy"""
+      needed = set()
+      pending = list(features)
+      while pending:
+         name = pending.pop()
+         if name in needed:
+            continue
+         if name not in FEATURE_EXTRACTORS:
+            raise ValueError(f"Unknown feature: {name}")
+         needed.add(name)
+         pending.extend(dependency for dependency in FEATURE_EXTRACTORS[name].inputs
+                        if dependency in FEATURE_EXTRACTORS and dependency not in known)
+      return [name for name in FEATURE_EXTRACTORS if name in needed]
+
+   def _shared_inputs(self, text: str, order: Iterable[str]) -> Tuple[Optional[NumberScan], Optional[KeywordHits]]:
+      """Quét số / từ khóa một lần nếu có extractor trong order cần đến"""
+      inputs = {source for name in order for source in FEATURE_EXTRACTORS[name].inputs}
+      scan = scan_numbers(text) if 'scan' in inputs else None
+      hits = self.keyword_index.scan(text) if 'hits' in inputs else None
+      return scan, hits
+
+   def _call_extractor(self, name: str, text: str, inputs: Dict[str, Any]) -> Any:
+      """
+      Giá trị extractor của feature name tìm được (None / giá trị falsy nếu không thấy)
 
-      # Kiểm tra features missing
-      missing_features = self._check_missing_features(features, text_lower)
+      Args:
+         inputs: 'scan', 'hits' và giá trị các feature đã có
+      """
+      method, sources, _ = FEATURE_EXTRACTORS[name]
+      # Extractor nhận một hoặc hai đầu vào: gọi thẳng, không dựng list tham số
+      # (chạy cho mỗi feature của mỗi văn bản)
+      if len(sources) == 1:
+         return getattr(self, method)(text, inputs[sources[0]])
+      return getattr(self, method)(text, inputs[sources[0]], inputs[sources[1]])
+
+   def _run_extractors(self, text: str, order: Iterable[str], scan: Optional[NumberScan],
+                       hits: Optional[KeywordHits], known: Dict[str, Any]) -> Dict[str, Any]:
+      """
+      Chạy extractor của các feature trong order, thay giá trị không tìm thấy bằng default_values
 
-      return features, missing_features
+      Returns:
+         feature -> giá trị, gồm các feature trong order (theo thứ tự đó)
+      """
+      inputs = dict(known, scan=scan, hits=hits)
+      defaults = self.default_values
+      features = {}
+      for name in order:
+         value = self._call_extractor(name, text, inputs)
+         if not value and (value is None or not FEATURE_EXTRACTORS[name].keeps_falsy):
+            value = defaults[name]
+         features[name] = inputs[name] = value
+      return features
+
+   def enable_profiling(self, profiler: Optional[ExtractionProfiler] = None) -> ExtractionProfiler:
+      """
+      Bật đo thời gian chạy và kết quả của từng extractor (xem ExtractionProfiler)
+
+      Các hàm trong _PROFILED_METHODS được thay bằng bản có đo trên chính
+      instance này, nên khi tắt profiling không còn chi phí nào. Khi bật, mỗi
+      văn bản được quét từ khóa thêm một lần để đếm từ khóa khớp. Các worker
+      process của extract_many không được đo.
+      """
+      self.disable_profiling()
+      profiler = profiler or ExtractionProfiler(self.keyword_index.groups)
+      for name, feature in _PROFILED_METHODS.items():
+         setattr(self, name, self._profiled(name, getattr(self, name), profiler, feature))
+      self.profiler = profiler
+      return profiler
+
+   def disable_profiling(self) -> None:
+      for name in _PROFILED_METHODS:
+         self.__dict__.pop(name, None)
+      self.profiler = None
+
+   def profiling_snapshot(self) -> Optional[Dict[str, Any]]:
+      """Thống kê profiling hiện tại, None nếu chưa bật"""
+      return self.profiler.snapshot() if self.profiler is not None else None
+
+   def _profiled(self, name: str, method, profiler: ExtractionProfiler, feature: Optional[str]):
+      """
+      Bản có đo của method. Kết quả lấy theo bằng chứng trong văn bản như
+      found_features, không theo giá trị trả về: extractor có giá trị dự phòng
+      (vd ChestPainType 3, MaxHR theo tuổi) hay trả 0 / 0.0 khi không thấy gì
+      đều là no_match; giá trị ghi rõ nhưng bị thay bằng default_values (vd
+      "oldpeak 0") là default
+      """
+      clock = profiler.clock
+      keyword_index = self.keyword_index
+      record_keywords = name == 'extract_all_features'
+      if feature is not None:
+         inputs = FEATURE_EXTRACTORS[feature].inputs
+         keeps_falsy = FEATURE_EXTRACTORS[feature].keeps_falsy
+         # Vị trí của NumberScan / KeywordHits trong các tham số sau text
+         scan_at = inputs.index('scan') if 'scan' in inputs else None
+         hits_at = inputs.index('hits') if 'hits' in inputs else None
+
+      def profiled(text, *args, **kwargs):
+         started = clock()
+         value = method(text, *args, **kwargs)
+         elapsed = clock() - started
+
+         if feature is None:
+            outcome = None
+         elif not self._is_found(feature, text, None if scan_at is None else args[scan_at],
+                                 None if hits_at is None else args[hits_at], value):
+            outcome = NO_MATCH
+         elif value or (value is not None and keeps_falsy):
+            outcome = MATCH
+         else:
+            outcome = DEFAULT
+         profiler.record(name, elapsed, len(text), outcome)
+
+         if record_keywords:
+            hits = keyword_index.scan(text.lower())
+            profiler.record_keywords(keyword for keyword in keyword_index.groups if hits.contains(keyword))
+         return value
+
+      return profiled
+
+   @staticmethod
+   def _is_context_number(number: str) -> bool:
+      """Số đứng riêng mà extractor sẽ xét ngữ cảnh (ứng viên huyết áp / cholesterol)"""
+      return _is_bp_candidate(number) or _is_cholesterol_candidate(number)
+
+   def extract_stream(self, source, chunk_size: int = 16384) -> Tuple[Dict[str, Any], List[str]]:
+      """
+      Trích xuất features từ văn bản dài đọc dần theo từng đoạn
+
+      Cho kết quả giống hệt extract_all_features trên toàn văn bản nhưng không
+      giữ cả văn bản trong bộ nhớ (xem ChunkedExtraction).
+
+      Args:
+         source: file-like (có .read(), vd open(path, encoding='utf-8')) hoặc
+            iterator các đoạn chuỗi
+         chunk_size: số ký tự xử lý mỗi lần
+      """
+      return ChunkedExtraction(self, chunk_size).run(source)
+
+   def _features_from_parts(self, found: Dict[str, Any], groups: Iterable[str],
+                            exercise_angina: bool) -> Tuple[Dict[str, Any], List[str]]:
+      """
+      Dựng kết quả như extract_all_features từ các phần đã trích xuất riêng
+      (theo câu hoặc theo đoạn văn bản)
+
+      Args:
+         found: giá trị ghi rõ của các feature số (Age, RestingBP, Cholesterol,
+            FastingBS theo chỉ số đường huyết, MaxHR, Oldpeak)
+         groups: các nhóm từ khóa có trong văn bản
+         exercise_angina: có đau ngực khi gắng sức
+      """
+      hits = GroupHits(groups)
+      defaults = self.default_values
+      features = {}
+
+      features['Age'] = found.get('Age') or defaults['Age']
+      sex = self._extract_gender('', hits)
+      features['Sex'] = sex if sex else defaults['Sex']
+      cp_type = self._extract_chest_pain_type('', hits)
+      features['ChestPainType'] = cp_type if cp_type else defaults['ChestPainType']
+      features['RestingBP'] = found.get('RestingBP') or defaults['RestingBP']
+      features['Cholesterol'] = found.get('Cholesterol') or defaults['Cholesterol']
+      fasting_bs = 1 if hits.has('comorbidity_diabetes') else found.get('FastingBS')
+      features['FastingBS'] = fasting_bs if fasting_bs is not None else defaults['FastingBS']
+      resting_ecg = self._extract_resting_ecg('', hits)
+      features['RestingECG'] = resting_ecg if resting_ecg else defaults['RestingECG']
+      max_hr = found.get('MaxHR')
+      if max_hr is None:
+         max_hr = min(max(220 - features['Age'], 60), 180)
+      features['MaxHR'] = max_hr or defaults['MaxHR']
+      features['ExerciseAngina'] = 1 if exercise_angina else 0
+      oldpeak = found.get('Oldpeak')
+      if oldpeak is None:
+         oldpeak = 2.0 if hits.has('severe_symptom') else 0.0
+      features['Oldpeak'] = oldpeak or defaults['Oldpeak']
+      st_slope = self._extract_st_slope('', hits)
+      features['ST_Slope'] = st_slope if st_slope else defaults['ST_Slope']
+
+      return features, self._check_missing_features(features, '', hits)
+
+   def extract_many(self, texts: Iterable[str], workers: Optional[int] = None,
+                    chunksize: int = 64) -> Iterator[Tuple[Dict[str, Any], List[str]]]:
+      """
+      Trích xuất features cho nhiều văn bản, trả về theo đúng thứ tự đầu vào
+
+      Kết quả được trả về dần (iterator): texts chỉ được đọc trước vài chunk,
+      nên có thể truyền vào một generator đọc từ file mà không cần giữ toàn bộ
+      danh sách trong bộ nhớ. Dùng list(...) nếu cần kết quả dạng list.
 
-   def _extract_age(self, text: str) -> Optional[int]:
+      Args:
+         texts: các văn bản cần trích xuất
+         workers: số process; mặc định os.cpu_count(), 1 = chạy tuần tự
+         chunksize: số văn bản gửi cho worker mỗi lần
+
+      Yields:
+         Tuple[features_dict, missing_features] như extract_all_features
+      """
+      workers = workers or os.cpu_count() or 1
+      texts = iter(texts)
+      # Đọc trước một đoạn để quyết định có cần process pool hay không
+      head = list(islice(texts, _MIN_PARALLEL_TEXTS))
+
+      if workers <= 1 or len(head) < _MIN_PARALLEL_TEXTS:
+         for text in head:
+            yield self.extract_all_features(text)
+         for text in texts:
+            yield self.extract_all_features(text)
+         return
+
+      yield from self._extract_many_parallel(head, texts, workers, max(1, chunksize))
+
+   def extract_frame(self, texts):
+      """
+      Trích xuất features cho một cột văn bản (pd.Series), xem series_extractor
+
+      Returns:
+         DataFrame các cột model cần (cùng thứ tự với lúc train), cùng index
+         với texts, giống hệt extract_all_features trên từng hàng
+      """
+      # pandas chỉ cần cho đường trích xuất này
+      from series_extractor import extract_series
+      return extract_series(self, texts)
+
+   def _extract_many_parallel(self, head: List[str], texts: Iterator[str], workers: int,
+                              chunksize: int) -> Iterator[Tuple[Dict[str, Any], List[str]]]:
+      """Chia texts thành các chunk và gửi cho process pool, giữ đúng thứ tự kết quả"""
+      chunks = iter(lambda: list(islice(texts, chunksize)), [])
+      head_chunks = [head[i:i + chunksize] for i in range(0, len(head), chunksize)]
+
+      with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(self.keyword_index,)) as pool:
+         # Chỉ giữ tối đa 2 chunk/worker đang chờ để giới hạn bộ nhớ
+         pending = deque()
+         for chunk in head_chunks:
+            pending.append(pool.submit(_extract_chunk, chunk))
+
+         for chunk in chunks:
+            while len(pending) >= 2 * workers:
+               yield from pending.popleft().result()
+            pending.append(pool.submit(_extract_chunk, chunk))
+
+         while pending:
+            yield from pending.popleft().result()
+
+   def _extract_age(self, text: str, scan: Optional[NumberScan] = None) -> Optional[int]:
       """Trích xuất tuổi"""
-      # Tìm pattern tuổi cụ thể
-      age_pattern = r'\b(\d+)\s*(?:tuổi|years? old)\b'
-      match = re.search(age_pattern, text)
-      if match:
-         age = int(match.group(1))
-         return min(max(age, 20), 100)  # Giới hạn trong khoảng hợp lý
-
-      # Tìm trong cấu trúc câu thông thường
-      for pattern in [r'tuổi\s*(\d+)', r'age\s*(\d+)', r'(\d+)\s*năm']:
-         match = re.search(pattern, text)
-         if match:
-               age = int(match.group(1))
-               return min(max(age, 20), 100)
+      return first_found(self._age_candidates(text, scan or scan_numbers(text)))[1]
 
-      return None
+   def _age_candidates(self, text: str, scan: NumberScan) -> Iterator[Optional[int]]:
+      """Các cách tìm tuổi theo thứ tự ưu tiên"""
+      # Tìm pattern tuổi cụ thể: "<số> tuổi", "<số> years old"
+      yield next((clamp('Age', int(entity.text))  # Giới hạn trong khoảng hợp lý
+                  for entity in scan.iter_integers()
+                  if entity.unit in ('tuổi', 'years old') and scan.starts_word(entity)), None)
 
-   def _extract_gender(self, text: str) -> Optional[int]:
+      # Tìm trong cấu trúc câu thông thường: "tuổi <số>", "age <số>", "<số> năm"
+      for cue, unit in [('tuổi', None), ('age', None), (None, 'năm')]:
+         entity = scan.first_integer(cue=cue, unit=unit)
+         yield clamp('Age', int(entity.text)) if entity else None
+
+   def _extract_gender(self, text: str, hits: Optional[KeywordHits] = None) -> Optional[int]:
       """Trích xuất giới tính (1: Nam, 0: Nữ)"""
-      male_keywords = self.medical_vocab['gender_male']['vi'] + self.medical_vocab['gender_male']['en']
-      female_keywords = self.medical_vocab['gender_female']['vi'] + self.medical_vocab['gender_female']['en']
+      hits = hits or self.keyword_index.scan(text)
 
-      for keyword in male_keywords:
-         if keyword in text:
-               return 1
+      if hits.has('gender_male'):
+         return 1
 
-      for keyword in female_keywords:
-         if keyword in text:
-               return 0
+      if hits.has('gender_female'):
+         return 0
 
       return None
 
-   def _extract_chest_pain_type(self, text: str) -> Optional[int]:
+   def _extract_chest_pain_type(self, text: str, hits: Optional[KeywordHits] = None) -> Optional[int]:
       """Trích xuất loại đau ngực"""
-      # Kiểm tra xem có đau ngực không
-      chest_pain_keywords = (self.medical_vocab['symptom_chest_pain']['vi'] +
-                           self.medical_vocab['symptom_chest_pain']['en'])
+      hits = hits or self.keyword_index.scan(text)
 
-      has_chest_pain = any(keyword in text for keyword in chest_pain_keywords)
-
-      if not has_chest_pain:
+      # Kiểm tra xem có đau ngực không
+      if not hits.has('symptom_chest_pain'):
          return 3  # ASY (không có triệu chứng)
 
       # Kiểm tra các loại đau ngực cụ thể
       # ATA (atypical angina)
-      for keyword in self.medical_vocab['chest_pain_ata']['vi'] + self.medical_vocab['chest_pain_ata']['en']:
-         if keyword in text:
-               return 1  # ATA
+      if hits.has('chest_pain_ata'):
+         return 1  # ATA
 
       # TA (typical angina)
-      for keyword in self.medical_vocab['chest_pain_ta']['vi'] + self.medical_vocab['chest_pain_ta']['en']:
-         if keyword in text:
-               return 0  # TA
+      if hits.has('chest_pain_ta'):
+         return 0  # TA
 
       # NAP (non-anginal pain)
-      for keyword in self.medical_vocab['chest_pain_nap']['vi'] + self.medical_vocab['chest_pain_nap']['en']:
-         if keyword in text:
-               return 2  # NAP
+      if hits.has('chest_pain_nap'):
+         return 2  # NAP
 
       # Mặc định là ATA nếu có đau ngực nhưng không xác định rõ
       return 1
 
-   def _extract_blood_pressure(self, text: str) -> Optional[int]:
+   def _extract_blood_pressure(self, text: str, scan: Optional[NumberScan] = None) -> Optional[int]:
       """Trích xuất huyết áp"""
-      # Tìm pattern huyết áp
-      patterns = [
-         r'huyết áp\s*(\d+)', r'blood pressure\s*(\d+)', r'bp\s*(\d+)',
-         r'(\d+)\s*/\s*\d+\s*(?:mmHg|huyết áp)'
-      ]
+      return first_found(self._blood_pressure_candidates(text, scan or scan_numbers(text)))[1]
 
-      for pattern in patterns:
-         matches = re.findall(pattern, text)
-         if matches:
-               try:
-                  bp = int(matches[0])
-                  # Giới hạn trong khoảng hợp lý
-                  return min(max(bp, 80), 200)
-               except:
-                  continue
+   def _blood_pressure_candidates(self, text: str, scan: NumberScan) -> Iterator[Optional[int]]:
+      """Các cách tìm huyết áp theo thứ tự ưu tiên"""
+      # Tìm pattern huyết áp: "huyết áp <số>", "blood pressure <số>", "bp <số>"
+      for cue in ['huyết áp', 'blood pressure', 'bp']:
+         entity = scan.first_integer(cue=cue)
+         # Giới hạn trong khoảng hợp lý
+         yield clamp('RestingBP', int(entity.text)) if entity else None
 
-      # Tìm số có thể là huyết áp
-      number_pattern = r'\b(1[0-2]\d|90|1[3-9]\d|200)\b'
-      matches = re.findall(number_pattern, text)
-      for match in matches:
-         num = int(match)
-         if 90 <= num <= 200:  # Khoảng huyết áp hợp lý
-               # Kiểm tra xem số này có gần từ "huyết áp" không
-               idx = text.find(match)
-               context = text[max(0, idx-20):min(len(text), idx+20)]
-               if 'huyết áp' in context or 'blood' in context or 'bp' in context:
-                  return num
+      # "<tâm thu>/<tâm trương> huyết áp" (chữ 'mmHg' viết hoa trong pattern cũ
+      # không bao giờ khớp văn bản đã lowercase nên chỉ còn 'huyết áp')
+      yield next((clamp('RestingBP', int(entity.text)) for entity in scan.iter_integers()
+                  if entity.unit == '/' and _DIASTOLIC_BP.match(text, entity.unit_end)), None)
 
-      return None
-
-   def _extract_cholesterol(self, text: str) -> Optional[int]:
+      # Tìm số có thể là huyết áp
+      if scan.mentions_any(_BP_CONTEXT):
+         for number in scan.standalone_numbers():
+               if _is_bp_candidate(number):
+                  # Kiểm tra xem số này có gần từ "huyết áp" không
+                  context = scan.context(number)
+                  if _BP_CONTEXT.search(context):
+                     yield int(number)
+                     return
+
+   def _extract_cholesterol(self, text: str, scan: Optional[NumberScan] = None) -> Optional[int]:
       """Trích xuất cholesterol"""
+      return first_found(self._cholesterol_candidates(text, scan or scan_numbers(text)))[1]
+
+   def _cholesterol_candidates(self, text: str, scan: NumberScan) -> Iterator[Optional[int]]:
+      """Các cách tìm cholesterol theo thứ tự ưu tiên"""
       # Tìm pattern cholesterol cụ thể
-      patterns = [
-         r'cholesterol\s*(\d+)', r'mỡ máu\s*(\d+)', r'lipid\s*(\d+)',
-         r'(\d+)\s*(?:mg/dl|mmol/l)\s*(?:cholesterol|mỡ)'
-      ]
+      for cue in ['cholesterol', 'mỡ máu', 'lipid']:
+         entity = scan.first_integer(cue=cue)
+         yield clamp('Cholesterol', int(entity.text)) if entity else None  # Giới hạn hợp lý
 
-      for pattern in patterns:
-         matches = re.findall(pattern, text)
-         if matches:
-               try:
-                  chol = int(matches[0])
-                  return min(max(chol, 100), 400)  # Giới hạn hợp lý
-               except:
-                  continue
+      # "<số> mg/dl cholesterol", "<số> mmol/l mỡ máu"
+      yield next((clamp('Cholesterol', int(entity.text)) for entity in scan.iter_integers()
+                  if entity.unit in ('mg/dl', 'mmol/l') and scan.followed_by(entity, _CHOLESTEROL_AFTER_UNIT)), None)
 
       # Tìm số có thể là cholesterol
-      number_pattern = r'\b([1-3]\d{2}|400)\b'
-      matches = re.findall(number_pattern, text)
-      for match in matches:
-         num = int(match)
-         if 150 <= num <= 300:  # Khoảng cholesterol phổ biến
-               # Kiểm tra context
-               idx = text.find(match)
-               context = text[max(0, idx-20):min(len(text), idx+20)]
-               if 'cholesterol' in context or 'mỡ' in context or 'lipid' in context:
-                  return num
-
-      return None
-
-   def _extract_fasting_bs(self, text: str) -> Optional[int]:
+      if scan.mentions_any(_CHOLESTEROL_CONTEXT):
+         for number in scan.standalone_numbers():
+               if _is_cholesterol_candidate(number):
+                  # Kiểm tra context
+                  context = scan.context(number)
+                  if _CHOLESTEROL_CONTEXT.search(context):
+                     yield int(number)
+                     return
+
+   def _extract_fasting_bs(self, text: str, scan: Optional[NumberScan] = None,
+                           hits: Optional[KeywordHits] = None) -> Optional[int]:
       """Trích xuất đường huyết lúc đói"""
-      # Kiểm tra tiểu đường
-      diabetes_keywords = (self.medical_vocab['comorbidity_diabetes']['vi'] +
-                        self.medical_vocab['comorbidity_diabetes']['en'])
+      hits = hits or self.keyword_index.scan(text)
 
-      has_diabetes = any(keyword in text for keyword in diabetes_keywords)
-
-      if has_diabetes:
+      # Kiểm tra tiểu đường
+      if hits.has('comorbidity_diabetes'):
          return 1
 
       # Tìm chỉ số đường huyết cụ thể
-      glucose_patterns = [
-         r'đường huyết\s*(\d+)', r'blood sugar\s*(\d+)', r'glucose\s*(\d+)',
-         r'(\d+)\s*(?:mg/dl|mmol/l)\s*(?:đường|sugar)'
-      ]
+      return first_found(self._fasting_bs_candidates(text, scan or scan_numbers(text)))[1]
 
-      for pattern in glucose_patterns:
-         matches = re.findall(pattern, text)
-         if matches:
-               try:
-                  glucose = int(matches[0])
-                  return 1 if glucose >= 126 else 0  # Ngưỡng tiểu đường
-               except:
-                  continue
+   def _fasting_bs_candidates(self, text: str, scan: NumberScan) -> Iterator[Optional[int]]:
+      """Các cách tìm chỉ số đường huyết theo thứ tự ưu tiên (không tính từ khóa tiểu đường)"""
+      for cue in ['đường huyết', 'blood sugar', 'glucose']:
+         entity = scan.first_integer(cue=cue)
+         yield (1 if int(entity.text) >= 126 else 0) if entity else None  # Ngưỡng tiểu đường
 
-      return None
+      yield next((1 if int(entity.text) >= 126 else 0 for entity in scan.iter_integers()
+                  if entity.unit in ('mg/dl', 'mmol/l') and scan.followed_by(entity, _GLUCOSE_AFTER_UNIT)), None)
 
-   def _extract_resting_ecg(self, text: str) -> Optional[int]:
+   def _extract_resting_ecg(self, text: str, hits: Optional[KeywordHits] = None) -> Optional[int]:
       """Trích xuất kết quả ECG"""
+      hits = hits or self.keyword_index.scan(text)
+
       # Normal
-      for keyword in self.medical_vocab['ecg_normal']['vi'] + self.medical_vocab['ecg_normal']['en']:
-         if keyword in text:
-               return 0  # Normal
+      if hits.has('ecg_normal'):
+         return 0  # Normal
 
       # ST-T changes
-      for keyword in self.medical_vocab['ecg_stt']['vi'] + self.medical_vocab['ecg_stt']['en']:
-         if keyword in text:
-               return 1  # ST
+      if hits.has('ecg_stt'):
+         return 1  # ST
 
       # LVH
-      for keyword in self.medical_vocab['ecg_lvh']['vi'] + self.medical_vocab['ecg_lvh']['en']:
-         if keyword in text:
-               return 2  # LVH
+      if hits.has('ecg_lvh'):
+         return 2  # LVH
 
       return None
 
-   def _extract_max_hr(self, text: str, age: int) -> Optional[int]:
+   def _extract_max_hr(self, text: str, age: int, scan: Optional[NumberScan] = None) -> Optional[int]:
       """Trích xuất nhịp tim tối đa"""
-      # Tìm nhịp tim cụ thể
-      hr_patterns = [
-         r'nhịp tim\s*(\d+)', r'heart rate\s*(\d+)', r'hr\s*(\d+)',
-         r'(\d+)\s*bpm', r'mạch\s*(\d+)'
-      ]
-
-      for pattern in hr_patterns:
-         matches = re.findall(pattern, text)
-         if matches:
-               try:
-                  hr = int(matches[0])
-                  return min(max(hr, 50), 200)  # Giới hạn hợp lý
-               except:
-                  continue
+      hr = first_found(self._max_hr_candidates(text, scan or scan_numbers(text)))[1]
+      if hr is not None:
+         return hr
 
       # Ước tính dựa trên tuổi nếu không tìm thấy
       estimated_hr = 220 - age
       return min(max(estimated_hr, 60), 180)
 
-   def _extract_exercise_angina(self, text: str) -> Optional[int]:
+   def _max_hr_candidates(self, text: str, scan: NumberScan) -> Iterator[Optional[int]]:
+      """Các cách tìm nhịp tim ghi rõ trong văn bản theo thứ tự ưu tiên"""
+      hr_patterns = [
+         ('nhịp tim', None), ('heart rate', None), ('hr', None),
+         (None, 'bpm'), ('mạch', None)
+      ]
+
+      for cue, unit in hr_patterns:
+         entity = scan.first_integer(cue=cue, unit=unit)
+         yield clamp('MaxHR', int(entity.text)) if entity else None  # Giới hạn hợp lý
+
+   def _extract_exercise_angina(self, text: str, hits: Optional[KeywordHits] = None) -> Optional[int]:
       """Trích xuất đau thắt ngực khi gắng sức"""
+      hits = hits or self.keyword_index.scan(text)
       angina_keywords = self.medical_vocab['angina_yes']['vi'] + self.medical_vocab['angina_yes']['en']
 
       for keyword in angina_keywords:
-         if keyword in text:
+         idx = hits.first_offset(keyword)
+         if idx != -1:
                # Kiểm tra xem có đau ngực khi gắng sức không
-               context = text[max(0, text.find(keyword)-30):min(len(text), text.find(keyword)+30)]
-               chest_pain_keywords = (self.medical_vocab['symptom_chest_pain']['vi'] +
-                                    self.medical_vocab['symptom_chest_pain']['en'])
-
-               if any(cp in context for cp in chest_pain_keywords):
+               if hits.any_within('symptom_chest_pain', max(0, idx-30), min(len(text), idx+30)):
                   return 1  # Y
 
       return 0
 
-   def _extract_oldpeak(self, text: str) -> Optional[float]:
+   def _extract_oldpeak(self, text: str, scan: Optional[NumberScan] = None,
+                        hits: Optional[KeywordHits] = None) -> Optional[float]:
       """Trích xuất oldpeak (ST depression)"""
-      patterns = [
-         r'oldpeak\s*([\d.]+)', r'st depression\s*([\d.]+)',
-         r'([\d.]+)\s*mm\s*(?:st|depression)'
-      ]
+      oldpeak = first_found(self._oldpeak_candidates(text, scan or scan_numbers(text)))[1]
+      if oldpeak is not None:
+         return oldpeak
 
-      for pattern in patterns:
-         matches = re.findall(pattern, text)
-         if matches:
-               try:
-                  op = float(matches[0])
-                  return min(max(op, 0.0), 6.0)
-               except:
-                  continue
-
-      severe_symptoms = ['nặng', 'dữ dội', 'severe', 'intense']
-      if any(symptom in text for symptom in severe_symptoms):
+      hits = hits or self.keyword_index.scan(text)
+      if hits.has('severe_symptom'):
          return 2.0
 
       return 0.0
 
-   def _extract_st_slope(self, text: str) -> Optional[int]:
+   def _oldpeak_candidates(self, text: str, scan: NumberScan) -> Iterator[Optional[float]]:
+      """Các cách tìm oldpeak ghi rõ trong văn bản theo thứ tự ưu tiên"""
+      finders = [
+         lambda: scan.first_decimal(cue='oldpeak'),
+         lambda: scan.first_decimal(cue='st depression'),
+         # "<số> mm st", "<số> mm depression"
+         lambda: next((entity for entity in scan.iter_decimals()
+                       if entity.unit == 'mm' and scan.followed_by(entity, _OLDPEAK_AFTER_UNIT)), None)
+      ]
+
+      for find in finders:
+         entity = find()
+         try:
+            yield clamp('Oldpeak', float(entity.text)) if entity else None
+         except ValueError:
+            yield UNREADABLE
+
+   def _extract_st_slope(self, text: str, hits: Optional[KeywordHits] = None) -> Optional[int]:
       """Trích xuất ST slope"""
+      hits = hits or self.keyword_index.scan(text)
+
       # Up
-      for keyword in self.medical_vocab['st_up']['vi'] + self.medical_vocab['st_up']['en']:
-         if keyword in text:
-               return 0
+      if hits.has('st_up'):
+         return 0
 
       # Down
-      for keyword in self.medical_vocab['st_down']['vi'] + self.medical_vocab['st_down']['en']:
-         if keyword in text:
-               return 2
+      if hits.has('st_down'):
+         return 2
       return 1
 
-   def _check_missing_features(self, features: Dict[str, Any], text: str) -> List[str]:
+   def _check_missing_features(self, features: Dict[str, Any], text: str,
+                               hits: Optional[KeywordHits] = None) -> List[str]:
       """Kiểm tra features nào còn missing hoặc cần làm rõ"""
+      hits = hits or self.keyword_index.scan(text)
       missing = []
 
       # Kiểm tra các features quan trọng
@@ -457,16 +906,7 @@ class HeartDiseaseNLPExtractor:
       for feature in important_features:
          if features.get(feature) == self.default_values[feature]:
                # Kiểm tra xem feature này đã được đề cập trong text chưa
-               mentioned = False
-
-               if feature == 'Cholesterol':
-                  mentioned = any(word in text for word in ['cholesterol', 'mỡ máu', 'lipid'])
-               elif feature == 'RestingBP':
-                  mentioned = any(word in text for word in ['huyết áp', 'blood pressure', 'bp'])
-               elif feature == 'MaxHR':
-                  mentioned = any(word in text for word in ['nhịp tim', 'heart rate', 'mạch'])
-
-               if not mentioned:
+               if not hits.has('mention_' + feature):
                   missing.append(feature)
 
       return missing
@@ -491,43 +931,25 @@ class HeartDiseaseNLPExtractor:
       return questions
 
    def update_features_with_response(self, features: Dict[str, Any], response_text: str, feature_name: str) -> Dict[str, Any]:
-      """Cập nhật features với thông tin mới từ người dùng"""
-      text_lower = response_text.lower()
+      """
+      Cập nhật features với thông tin mới từ người dùng
 
-      if feature_name == 'Cholesterol':
-         value = self._extract_cholesterol(text_lower)
-         if value:
-               features['Cholesterol'] = value
-
-      elif feature_name == 'RestingBP':
-         value = self._extract_blood_pressure(text_lower)
-         if value:
-               features['RestingBP'] = value
-
-      elif feature_name == 'MaxHR':
-         value = self._extract_max_hr(text_lower, features['Age'])
-         if value:
-               features['MaxHR'] = value
-
-      elif feature_name == 'RestingECG':
-         value = self._extract_resting_ecg(text_lower)
-         if value is not None:
-               features['RestingECG'] = value
-
-      elif feature_name == 'Oldpeak':
-         value = self._extract_oldpeak(text_lower)
-         if value:
-               features['Oldpeak'] = value
-
-      elif feature_name == 'FastingBS':
-         value = self._extract_fasting_bs(text_lower)
-         if value is not None:
-               features['FastingBS'] = value
-
-      elif feature_name == 'ExerciseAngina':
-         value = self._extract_exercise_angina(text_lower)
-         if value is not None:
-               features['ExerciseAngina'] = value
+      Chỉ chạy extractor của feature_name (và của Age nếu features chưa có,
+      cho MaxHR). Giá trị chỉ được cập nhật khi câu trả lời có ghi rõ; feature
+      không có câu hỏi bổ sung thì giữ nguyên.
+      """
+      if feature_name not in _FOLLOW_UP_FEATURES:
+         return features
+
+      text_lower = response_text.lower()
+      order = self._extraction_order([feature_name], features)
+      scan, hits = self._shared_inputs(text_lower, order)
+      # order kết thúc bằng feature_name, trước đó là các feature nó cần
+      inputs = dict(features, scan=scan, hits=hits)
+      inputs.update(self._run_extractors(text_lower, order[:-1], scan, hits, features))
+      value = self._call_extractor(feature_name, text_lower, inputs)
+      if value is not None and (value or FEATURE_EXTRACTORS[feature_name].keeps_falsy):
+         features[feature_name] = value
 
       return features
 
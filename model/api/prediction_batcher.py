@@ -0,0 +1,139 @@
+"""
+Gộp các request /predict đồng thời thành một lần predict_proba.
+
+Mỗi lần gọi predict_proba có một phần chi phí cố định (kiểm tra đầu vào, gọi
+từng cây của forest...) gần như không phụ thuộc số hàng. Khi nhiều request một
+bệnh nhân tới cùng lúc, PredictionBatcher giữ chúng trong một hàng đợi: batch
+bắt đầu từ request đầu tiên, nhận thêm các request tới trong `window` giây
+(tối đa `max_batch` hàng), rồi một worker thread chạy predict một lần cho cả
+batch và trả từng hàng cho thread đang chờ của nó.
+
+Chỉ có ích khi server xử lý nhiều request cùng lúc trong một process (Flask
+threaded, gunicorn gthread); với worker đồng bộ mỗi process một request thì
+mỗi batch chỉ có một hàng và request chờ thêm tối đa `window`.
+"""
+import queue
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# Số mẫu thời gian chờ gần nhất giữ lại để tính phân vị
+_DELAY_SAMPLES = 10000
+
+
+class _Pending:
+   """Một hàng đang chờ trong hàng đợi"""
+   __slots__ = ('row', 'enqueued', 'done', 'result', 'error')
+
+   def __init__(self, row: np.ndarray, enqueued: float):
+      self.row = row
+      self.enqueued = enqueued
+      self.done = threading.Event()
+      self.result: Optional[np.ndarray] = None
+      self.error: Optional[BaseException] = None
+
+
+class PredictionBatcher:
+   """Hàng đợi các hàng cần predict, chạy theo batch trong một worker thread"""
+
+   def __init__(self, predict: Callable[[np.ndarray], np.ndarray], window: float = 0.002,
+                max_batch: int = 32, clock: Callable[[], float] = time.perf_counter):
+      """
+      Args:
+         predict: hàm nhận mảng (n, số feature), trả về mảng (n, ...) theo từng hàng
+         window: thời gian gom thêm request kể từ request đầu tiên của batch (giây)
+         max_batch: số hàng tối đa mỗi batch
+      """
+      self.predict = predict
+      self.window = window
+      self.max_batch = max(1, max_batch)
+      self._clock = clock
+      self._queue: "queue.SimpleQueue[_Pending]" = queue.SimpleQueue()
+      self._thread: Optional[threading.Thread] = None
+      self._lock = threading.Lock()
+      self._batch_sizes: Counter = Counter()
+      self._delays = deque(maxlen=_DELAY_SAMPLES)
+      self._requests = 0
+      self._errors = 0
+
+   def submit(self, row) -> np.ndarray:
+      """
+      Kết quả predict của một hàng, chờ tới khi batch chứa nó chạy xong
+
+      Raises:
+         lỗi của predict (mọi hàng trong batch lỗi đó nhận cùng lỗi)
+      """
+      self._ensure_worker()
+      pending = _Pending(np.asarray(row, dtype=np.float64), self._clock())
+      self._queue.put(pending)
+      pending.done.wait()
+      if pending.error is not None:
+         raise pending.error
+      return pending.result
+
+   def _ensure_worker(self) -> None:
+      # Worker chỉ tạo khi có request đầu tiên (không tạo thread lúc import)
+      if self._thread is None:
+         with self._lock:
+            if self._thread is None:
+               self._thread = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+               self._thread.start()
+
+   def _run(self) -> None:
+      while True:
+         self._run_batch(self._collect())
+
+   def _collect(self) -> List[_Pending]:
+      """Một batch: request đầu tiên và các request tới trong window sau nó"""
+      batch = [self._queue.get()]
+      # Request đầu đã chờ lâu hơn window (batch trước chạy lâu) thì chỉ lấy
+      # thêm những gì đang có sẵn trong hàng đợi
+      deadline = batch[0].enqueued + self.window
+      while len(batch) < self.max_batch:
+         timeout = deadline - self._clock()
+         try:
+            batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+         except queue.Empty:
+            break
+      return batch
+
+   def _run_batch(self, batch: List[_Pending]) -> None:
+      started = self._clock()
+      try:
+         result = self.predict(np.vstack([pending.row for pending in batch]))
+         for pending, row in zip(batch, result):
+            pending.result = row
+      except Exception as e:
+         for pending in batch:
+            pending.error = e
+      finally:
+         with self._lock:
+            self._requests += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            self._delays.extend(started - pending.enqueued for pending in batch)
+            if batch[0].error is not None:
+               self._errors += 1
+         for pending in batch:
+            pending.done.set()
+
+   def stats(self) -> Dict[str, Any]:
+      with self._lock:
+         batches = sum(self._batch_sizes.values())
+         delays = np.sort(np.fromiter(self._delays, dtype=np.float64, count=len(self._delays)))
+         return {
+            'window_ms': self.window * 1000,
+            'max_batch': self.max_batch,
+            'requests': self._requests,
+            'batches': batches,
+            'errors': self._errors,
+            'mean_batch_size': round(self._requests / batches, 2) if batches else 0.0,
+            'batch_sizes': {str(size): count for size, count in sorted(self._batch_sizes.items())},
+            # Thời gian từ lúc vào hàng đợi tới lúc batch bắt đầu chạy
+            'queue_delay_ms': {
+               f'p{q}': round(float(np.percentile(delays, q)) * 1000, 3) if len(delays) else 0.0
+               for q in (50, 90, 99)
+            }
+         }
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from services.feature_service import convert_symptoms_to_features_nlp
+from services.feature_service import TextTooLongError, convert_symptoms_to_features_nlp
 from services.question_service import get_missing_feature_questions
 
 analyze_bp = Blueprint("analyze", __name__)
@@ -8,18 +8,22 @@ analyze_bp = Blueprint("analyze", __name__)
 def analyze():
    data = request.json or {}
 
-   features, missing = convert_symptoms_to_features_nlp(
-      data.get("symptoms", ""),
-      data.get("age"),
-      data.get("gender"),
-      data.get("symptom_duration")
-   )
+   try:
+      features, missing, sources = convert_symptoms_to_features_nlp(
+         data.get("symptoms", ""),
+         data.get("age"),
+         data.get("gender"),
+         data.get("symptom_duration")
+      )
+   except TextTooLongError as e:
+      return jsonify({"error": str(e)}), 413
 
    progress = round(len(features) / 11 * 100)
 
    return jsonify({
       "status": "analysis_complete",
       "features_extracted": features,
+      "feature_sources": sources,
       "missing_features": missing,
       "questions_needed": get_missing_feature_questions(missing),
       "progress_percentage": progress
@@ -0,0 +1,77 @@
+import json
+import queue
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+from services.feature_service import TextTooLongError
+from services.stream_service import create_session, get_session
+
+analyze_stream_bp = Blueprint("analyze_stream", __name__)
+
+# Gửi comment SSE định kỳ để proxy không đóng kết nối đang rảnh
+HEARTBEAT_SECONDS = 15
+
+
+def _sse(event, data):
+   return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@analyze_stream_bp.route("/analyze/stream", methods=["POST"])
+def create_stream():
+   try:
+      session, delta = create_session(request.json or {})
+   except TextTooLongError as e:
+      return jsonify({"error": str(e)}), 413
+   except (TypeError, ValueError) as e:
+      return jsonify({"error": str(e)}), 400
+
+   return jsonify({
+      "session_id": session.id,
+      "events_url": f"/analyze/stream/{session.id}/events",
+      **delta
+   })
+
+
+@analyze_stream_bp.route("/analyze/stream/<session_id>", methods=["POST"])
+def update_stream(session_id):
+   session = get_session(session_id)
+   if session is None:
+      return jsonify({"error": "Session not found"}), 404
+
+   try:
+      delta = session.apply(request.json or {})
+   except TextTooLongError as e:
+      return jsonify({"error": str(e)}), 413
+   except (TypeError, ValueError) as e:
+      return jsonify({"error": str(e)}), 400
+
+   return jsonify(delta)
+
+
+@analyze_stream_bp.route("/analyze/stream/<session_id>/events", methods=["GET"])
+def stream_events(session_id):
+   session = get_session(session_id)
+   if session is None:
+      return jsonify({"error": "Session not found"}), 404
+
+   listener = session.subscribe()
+
+   def generate():
+      try:
+         yield _sse("snapshot", session.snapshot())
+         # Đóng kết nối khi phiên hết hạn hoặc bị bỏ khỏi analyze_sessions
+         while get_session(session_id) is not None:
+            try:
+               delta = listener.get(timeout=HEARTBEAT_SECONDS)
+            except queue.Empty:
+               yield ": heartbeat\n\n"
+               continue
+            yield _sse("delta", delta)
+      finally:
+         session.unsubscribe(listener)
+
+   return Response(
+      stream_with_context(generate()),
+      mimetype="text/event-stream",
+      headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+   )
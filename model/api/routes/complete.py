@@ -1,15 +1,22 @@
 from flask import Blueprint, request, jsonify
 from extensions import nlp_extractor
+from services.feature_service import TextTooLongError, check_text_length
 
 complete_bp = Blueprint("complete", __name__)
 
 @complete_bp.route("/complete_features", methods=["POST"])
 def complete_features():
    data = request.json or {}
+   user_response = data.get("user_response", "")
+
+   try:
+      check_text_length(len(user_response), "user_response")
+   except TextTooLongError as e:
+      return jsonify({"error": str(e)}), 413
 
    updated = nlp_extractor.update_features_with_response(
       data.get("partial_features", {}),
-      data.get("user_response", ""),
+      user_response,
       data.get("feature_to_update", "")
    )
 
@@ -1,5 +1,7 @@
 from flask import Blueprint, jsonify
-from extensions import model
+from extensions import cascade, model, model_version, near_duplicate_cache, tiered_extractor
+from services.feature_service import feature_cache
+from services.prediction_service import prediction_batcher, prediction_cache
 
 health_bp = Blueprint("health", __name__)
 
@@ -8,5 +10,12 @@ def health():
     return jsonify({
         "status": "healthy",
         "model_loaded": model is not None,
-        "api_version": "2.0-nlp"
+        "model_version": model_version,
+        "api_version": "2.0-nlp",
+        "feature_cache": feature_cache.stats(),
+        "nlp_tier2": tiered_extractor.stats(),
+        "near_duplicate_cache": near_duplicate_cache.stats() if near_duplicate_cache is not None else None,
+        "prediction_batcher": prediction_batcher.stats() if prediction_batcher is not None else None,
+        "prediction_cache": prediction_cache.stats(),
+        "cascade": cascade.stats() if cascade is not None else None
     })
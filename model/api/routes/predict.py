@@ -1,9 +1,27 @@
-from flask import Blueprint, request, jsonify
-import pandas as pd
+import json
+import math
+import os
 
-from extensions import model, nlp_extractor
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 
-from services.feature_service import convert_symptoms_to_features_nlp
+from extensions import explainer, model, nlp_extractor
+
+from services.feature_service import (
+   TextTooLongError,
+   check_text_length,
+   convert_many_symptoms_to_features_nlp,
+   convert_symptoms_to_features_nlp
+)
+from services.prediction_service import (
+   FEATURE_ORDER,
+   explain,
+   feature_matrix,
+   predict_one,
+   predicted_classes,
+   prediction_cache,
+   prediction_key,
+   score
+)
 
 from services.question_service import (
    get_missing_feature_questions,
@@ -14,6 +32,8 @@ from services.recommendation_service import (
    get_recommendations,
    get_next_steps
 )
+from nlp_processor import FEATURE_CODES
+from tiered_extractor import SOURCE_INPUT
 
 predict_bp = Blueprint("predict", __name__)
 
@@ -24,13 +44,114 @@ def predict():
 
    data = request.json or {}
 
-   features, missing = convert_symptoms_to_features_nlp(
-      data.get("symptoms", ""),
-      data.get("age"),
-      data.get("gender"),
-      data.get("symptom_duration")
-   )
+   try:
+      features, missing, sources = convert_symptoms_to_features_nlp(
+         data.get("symptoms", ""),
+         data.get("age"),
+         data.get("gender"),
+         data.get("symptom_duration")
+      )
+   except TextTooLongError as e:
+      return jsonify({"error": str(e)}), 413
+
+   ask = _features_to_ask(missing)
+   if ask:
+      return jsonify(_need_more_info(features, sources, ask))
+
+   for f in FEATURE_ORDER:
+      features.setdefault(f, nlp_extractor.default_values[f])
+
+   # "full_forest": true luôn lấy xác suất đúng của cả forest, bỏ qua cascade
+   # (cả kết quả của nó trong cache)
+   full_forest = bool(data.get("full_forest"))
+   key = prediction_key(features)
+   cached = prediction_cache.get(key)
+   if not _cache_usable(cached, full_forest, explained=True):
+      pred, prob, exact = predict_one(features, full_forest)
+      contributions = explain(feature_matrix([features])) if exact else None
+      cached = _cache_prediction(key, pred, prob, features, None if contributions is None else contributions[0],
+                                 exact)
+
+   return jsonify({**cached[2], "feature_sources": sources})
+
+
+# Số bệnh nhân tối đa mỗi request /predict_batch
+MAX_BATCH_ROWS = int(os.environ.get("PREDICT_BATCH_MAX_ROWS", "10000"))
+# Khi trả về NDJSON: số hàng chấm điểm (một lần predict_proba) rồi gửi đi mỗi lần
+STREAM_CHUNK_ROWS = 256
+# Số feature đóng góp nhiều nhất trả về trong important_factors
+IMPORTANT_FACTORS = 5
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Khoảng chấp nhận của feature số trong bản ghi có cấu trúc: rộng hơn
+# nlp_processor.VALUE_RANGES (khoảng kẹp giá trị đọc từ văn bản) để nhận mọi
+# giá trị có trong dataset train (Cholesterol 0, Oldpeak âm, ...), chỉ loại
+# giá trị không thể có như tuổi âm
+RECORD_RANGES = {
+   'Age': (1, 120),
+   'RestingBP': (0, 300),
+   'Cholesterol': (0, 1000),
+   'MaxHR': (30, 250),
+   'Oldpeak': (-5.0, 10.0),
+}
+
+
+@predict_bp.route("/predict_batch", methods=["POST"])
+def predict_batch():
+   """
+   Dự đoán cho nhiều bệnh nhân trong một request
+
+   Body: {"patients": [...]} (hoặc chính danh sách), mỗi phần tử là
+   - văn bản triệu chứng: {"symptoms", "age", "gender", "symptom_duration"}
+     như /predict, hoặc chỉ một chuỗi;
+   - bản ghi có cấu trúc: {"features": {"Age": 54, "Sex": 1, ...}} theo mã
+     của extractor (số hữu hạn, feature số trong RECORD_RANGES, feature dạng
+     mã là một mã của nlp_processor.FEATURE_CODES);
+   kèm "id" tùy chọn được gửi lại trong kết quả; "full_forest": true (khi
+   body là object) bỏ qua cascade như /predict.
+
+   Mặc định kết quả không có important_factors / base_probability: giải thích
+   một hàng tốn khoảng 2 ms, gấp nhiều lần chấm điểm, nên phải bật bằng
+   "explain": true (khi body là object).
+
+   Mỗi kết quả có "index" (vị trí trong danh sách) và nội dung như /predict
+   (dự đoán, hoặc status need_more_info), hoặc "error" nếu hàng đó không hợp
+   lệ. Văn bản được trích xuất hàng loạt, cả batch chấm điểm bằng một lần
+   predict_proba. Với "Accept: application/x-ndjson" kết quả được gửi dần,
+   mỗi dòng một JSON, mỗi lần STREAM_CHUNK_ROWS hàng.
+   """
+   if model is None:
+      return jsonify({"error": "Model not loaded"}), 503
+
+   data = request.json
+   patients = data.get("patients") if isinstance(data, dict) else data
+   full_forest = isinstance(data, dict) and bool(data.get("full_forest"))
+   explained = isinstance(data, dict) and bool(data.get("explain"))
+   if not isinstance(patients, list):
+      return jsonify({"error": "'patients' must be a list"}), 400
+   if len(patients) > MAX_BATCH_ROWS:
+      return jsonify({"error": f"at most {MAX_BATCH_ROWS} patients per request"}), 413
+
+   rows = [_parse_patient(index, patient) for index, patient in enumerate(patients)]
+
+   if request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+      def generate():
+         for result in _batch_results(rows, STREAM_CHUNK_ROWS, full_forest, explained):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+      return Response(
+         stream_with_context(generate()),
+         mimetype=NDJSON_MIMETYPE,
+         headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+      )
+
+   results = list(_batch_results(rows, max(1, len(rows)), full_forest, explained))
+   return jsonify({"count": len(results), "results": results})
+
 
+def _features_to_ask(missing):
+   """Các feature cần hỏi thêm trước khi dự đoán (rỗng: đủ thông tin)"""
    critical = ['Age', 'Sex', 'Cholesterol', 'RestingBP', 'MaxHR']
    missing_critical = [f for f in critical if f in missing]
 
@@ -52,29 +173,56 @@ def predict():
             ask = group_missing
             break
 
-   if ask:
-      progress = round(len(features) / 11 * 100)
-      return jsonify({
-         "status": "need_more_info",
-         "message": generate_missing_info_message(ask, progress),
-         "questions": get_missing_feature_questions(ask),
-         "partial_features": features,
-         "progress_percentage": progress
-      })
-
-   expected = [
-      'Age','Sex','ChestPainType','RestingBP','Cholesterol',
-      'FastingBS','RestingECG','MaxHR','ExerciseAngina',
-      'Oldpeak','ST_Slope'
-   ]
+   return ask
 
-   for f in expected:
-      features.setdefault(f, nlp_extractor.default_values[f])
 
-   df = pd.DataFrame([features])[expected]
-   pred = model.predict(df)[0]
-   prob = model.predict_proba(df)[0]
+def _need_more_info(features, sources, ask):
+   progress = round(len(features) / 11 * 100)
+   return {
+      "status": "need_more_info",
+      "message": generate_missing_info_message(ask, progress),
+      "questions": get_missing_feature_questions(ask),
+      "partial_features": features,
+      "feature_sources": sources,
+      "progress_percentage": progress
+   }
+
+
+def _cache_prediction(key, pred, prob, features, contributions=None, exact=True):
+   """
+   Lưu (lớp, xác suất các lớp, body, xác suất có đúng của cả forest không) vào
+   prediction_cache; body không gồm feature_sources
+   """
+   cached = (int(pred), tuple(float(p) for p in prob), _prediction(pred, prob, features, contributions),
+             exact)
+   prediction_cache.put(key, cached)
+   return cached
+
+
+def _cache_usable(cached, full_forest, explained):
+   """
+   Kết quả trong cache dùng lại được không: full_forest cần xác suất của cả
+   forest, explained cần phần giải thích nếu hàng đó giải thích được
+   """
+   if cached is None or (full_forest and not cached[3]):
+      return False
+   return not (explained and cached[3] and explainer is not None and "important_factors" not in cached[2])
+
+
+def _without_explanation(body):
+   return {k: v for k, v in body.items() if k not in ("important_factors", "base_probability")}
+
+
+def _important_factors(contributions, features):
+   """Các feature đóng góp nhiều nhất (trị tuyệt đối) vào xác suất có bệnh của bệnh nhân này"""
+   ranked = sorted(zip(explainer.feature_names, contributions.tolist()), key=lambda item: abs(item[1]), reverse=True)
+   return [
+      {"feature": f, "value": features[f], "contribution": round(c, 4)}
+      for f, c in ranked[:IMPORTANT_FACTORS]
+   ]
+
 
+def _prediction(pred, prob, features, contributions=None):
    risk_prob = prob[1]
    if risk_prob >= 0.75:
       risk_level = "Cao"
@@ -89,11 +237,126 @@ def predict():
       risk_level = "Thấp"
       message = "Nguy cơ mắc bệnh tim thấp"
 
-   return jsonify({
+   result = {
       "prediction": int(pred),
       "probability": float(prob[pred]),
       "risk_level": risk_level,
       "message": message,
       "recommendations": get_recommendations(pred, features),
       "next_steps": get_next_steps(pred, features)
-   })
+   }
+   if contributions is not None:
+      # Xác suất trung bình cộng các phần đóng góp (của cả 11 feature) bằng xác suất có bệnh
+      result["base_probability"] = round(explainer.expected_value, 4)
+      result["important_factors"] = _important_factors(contributions, features)
+   return result
+
+
+def _parse_patient(index, patient):
+   """
+   Kiểm tra một phần tử của /predict_batch
+
+   Returns:
+      Tuple[head, kind, value]: head là phần đầu của kết quả ({"index", "id"});
+      kind là 'text' (value: tham số của convert_symptoms_to_features_nlp),
+      'features' (value: (features, missing, sources)) hoặc 'error' (value: thông báo)
+   """
+   head = {"index": index}
+   if isinstance(patient, str):
+      patient = {"symptoms": patient}
+   if not isinstance(patient, dict):
+      return head, 'error', "each patient must be an object or a symptoms string"
+   if "id" in patient:
+      head["id"] = patient["id"]
+
+   if "features" in patient:
+      record = patient["features"]
+      if not isinstance(record, dict):
+         return head, 'error', "'features' must be an object"
+      features, missing = {}, []
+      for f in FEATURE_ORDER:
+         value = record.get(f)
+         if value is None:
+            missing.append(f)
+            continue
+         error = _feature_error(f, value)
+         if error:
+            return head, 'error', error
+         features[f] = value
+      return head, 'features', (features, missing, dict.fromkeys(features, SOURCE_INPUT))
+
+   symptoms = patient.get("symptoms", "")
+   if not isinstance(symptoms, str):
+      return head, 'error', "'symptoms' must be a string"
+   for field in ("age", "symptom_duration"):
+      value = patient.get(field)
+      if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))
+                                or not math.isfinite(value)):
+         return head, 'error', f"'{field}' must be a finite number"
+   try:
+      check_text_length(len(symptoms))
+   except TextTooLongError as e:
+      return head, 'error', str(e)
+   return head, 'text', (symptoms, patient.get("age"), patient.get("gender"), patient.get("symptom_duration"))
+
+
+def _feature_error(feature, value):
+   """
+   Lỗi của một giá trị trong bản ghi có cấu trúc, None nếu hợp lệ: số hữu
+   hạn, trong RECORD_RANGES (feature số) hoặc là một mã của FEATURE_CODES
+   """
+   if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+      return f"'{feature}' must be a finite number"
+   if feature in RECORD_RANGES:
+      low, high = RECORD_RANGES[feature]
+      if not low <= value <= high:
+         return f"'{feature}' must be between {low} and {high}"
+   elif value not in FEATURE_CODES[feature]:
+      return f"'{feature}' must be one of {sorted(FEATURE_CODES[feature])}"
+   return None
+
+
+def _batch_results(rows, chunk_rows, full_forest=False, explained=False):
+   """
+   Kết quả của từng hàng theo thứ tự; mỗi chunk_rows hàng chấm điểm bằng một
+   lần score. explained: thêm phần giải thích (như /predict) cho các hàng có
+   xác suất đúng của cả forest
+   """
+   extracted = convert_many_symptoms_to_features_nlp(value for _, kind, value in rows if kind == 'text')
+
+   for start in range(0, len(rows), chunk_rows):
+      results, scored = [], []
+      for head, kind, value in rows[start:start + chunk_rows]:
+         if kind == 'error':
+            results.append({**head, "error": value})
+            continue
+         features, missing, sources = next(extracted) if kind == 'text' else value
+         ask = _features_to_ask(missing)
+         if ask:
+            results.append({**head, **_need_more_info(features, sources, ask)})
+            continue
+         for f in FEATURE_ORDER:
+            features.setdefault(f, nlp_extractor.default_values[f])
+         key = prediction_key(features)
+         cached = prediction_cache.get(key)
+         if _cache_usable(cached, full_forest, explained):
+            body = cached[2] if explained else _without_explanation(cached[2])
+            results.append({**head, **body, "feature_sources": sources})
+            continue
+         results.append(head)
+         scored.append((len(results) - 1, key, features, sources))
+
+      if scored:
+         X = feature_matrix([features for _, _, features, _ in scored])
+         proba, exact = score(X, full_forest)
+         # Chỉ giải thích các hàng có xác suất đúng của cả forest (explainer giải thích forest)
+         contributions = [None] * len(scored)
+         if explained and explainer is not None and exact.any():
+            for i, contribution in zip(exact.nonzero()[0], explain(X[exact])):
+               contributions[i] = contribution
+         for (position, key, features, sources), pred, prob, contribution, row_exact in zip(
+               scored, predicted_classes(proba), proba, contributions, exact):
+            body = _cache_prediction(key, pred, prob, features, contribution, bool(row_exact))[2]
+            results[position] = {**results[position], **body, "feature_sources": sources}
+
+      yield from results
@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify, request
+from services.feature_service import nlp_extractor
+
+profile_bp = Blueprint("profile", __name__)
+
+@profile_bp.route("/profile/nlp", methods=["GET"])
+def nlp_profile():
+   """
+   Thống kê theo từng extractor (bật bằng biến môi trường NLP_PROFILING=1)
+
+   ?reset=1 xóa thống kê sau khi trả về
+   """
+   profiler = nlp_extractor.profiler
+   if profiler is None:
+      return jsonify({"enabled": False})
+
+   snapshot = profiler.snapshot()
+   if request.args.get("reset") in ("1", "true"):
+      profiler.reset()
+   return jsonify({"enabled": True, **snapshot})
@@ -1,11 +1,96 @@
-from nlp_processor import HeartDiseaseNLPExtractor
+import os
+from collections import deque
 
-nlp_extractor = HeartDiseaseNLPExtractor()
+from extensions import nlp_extractor, tiered_extractor
+from nlp_processor import MAX_TEXT_CHARS
+from tiered_extractor import SOURCE_INPUT
+from utils.text_cache import TextCache, normalize_text, text_key
+
+# Đo thời gian / tỷ lệ khớp của từng extractor, xem GET /profile/nlp
+if os.environ.get("NLP_PROFILING", "").lower() in ("1", "true", "yes"):
+   nlp_extractor.enable_profiling()
+
+# /analyze rồi /predict thường gửi cùng một đoạn triệu chứng: nhớ lại kết quả
+# theo văn bản đã chuẩn hóa. Trả về bản sao vì caller sửa dict features
+feature_cache = TextCache(
+   max_entries=2048,
+   max_bytes=16 * 1024 * 1024,
+   ttl=15 * 60,
+   copy_value=lambda result: (dict(result[0]), list(result[1]), dict(result[2]))
+)
+
+class TextTooLongError(ValueError):
+   """Văn bản gửi lên dài hơn MAX_TEXT_CHARS (route trả về 413)"""
+
+def check_text_length(length, field="symptoms"):
+   """Từ chối văn bản dài hơn MAX_TEXT_CHARS trước khi trích xuất"""
+   if length > MAX_TEXT_CHARS:
+      raise TextTooLongError(f"'{field}' is longer than {MAX_TEXT_CHARS} characters")
 
 def convert_symptoms_to_features_nlp(symptoms_text, age = None, gender=None, symptom_duration=None):
    """
    Chuyển đổi triệu chứng thành features bằng NLP
+
+   Returns:
+      Tuple[features, missing_features, sources] với sources: feature -> tầng
+      tạo ra giá trị ('rules', 'tier2', 'input' hoặc 'default')
+
+   Raises:
+      TextTooLongError: symptoms_text dài hơn MAX_TEXT_CHARS
    """
+   check_text_length(len(symptoms_text or ""))
+   symptoms_text = normalize_text(symptoms_text)
+   key = text_key(symptoms_text, age, gender, symptom_duration)
+
+   return feature_cache.get_or_compute(
+      key,
+      lambda: _convert_symptoms_to_features_nlp(symptoms_text, age, gender, symptom_duration)
+   )
+
+def convert_many_symptoms_to_features_nlp(rows):
+   """
+   convert_symptoms_to_features_nlp cho nhiều bệnh nhân, trả về dần theo đúng thứ tự
+
+   Hàng đã có trong cache được trả lại ngay, các hàng còn lại đi qua
+   tiered_extractor.extract_many (trích xuất hàng loạt, song song khi nhiều).
+
+   Args:
+      rows: các tuple (symptoms_text, age, gender, symptom_duration); độ dài văn
+         bản phải đã được kiểm tra bằng check_text_length
+
+   Yields:
+      Tuple[features, missing_features, sources] như convert_symptoms_to_features_nlp
+   """
+   # Các hàng đã đọc nhưng chưa trả kết quả: (key, kết quả trong cache hoặc None, tham số)
+   read = deque()
+
+   def uncached():
+      for symptoms_text, age, gender, symptom_duration in rows:
+         symptoms_text = normalize_text(symptoms_text)
+         key = text_key(symptoms_text, age, gender, symptom_duration)
+         cached = feature_cache.get(key)
+         read.append((key, cached, age, gender, symptom_duration))
+         if cached is None:
+            yield _context_text(symptoms_text, age, gender, symptom_duration), _provided_features(age, gender)
+
+   for result in tiered_extractor.extract_many(uncached()):
+      key, cached, age, gender, symptom_duration = read.popleft()
+      while cached is not None:
+         yield cached
+         key, cached, age, gender, symptom_duration = read.popleft()
+      result = _apply_parameters(result, age, gender, symptom_duration)
+      feature_cache.put(key, result)
+      yield result
+
+   while read:
+      yield read.popleft()[1]
+
+def _convert_symptoms_to_features_nlp(symptoms_text, age, gender, symptom_duration):
+   full_text = _context_text(symptoms_text, age, gender, symptom_duration)
+   result = tiered_extractor.extract_all_features(full_text, skip=_provided_features(age, gender))
+   return _apply_parameters(result, age, gender, symptom_duration)
+
+def _context_text(symptoms_text, age, gender, symptom_duration):
    # Tạo context text từ các tham số
    context_parts = []
 
@@ -21,23 +106,33 @@ def convert_symptoms_to_features_nlp(symptoms_text, age = None, gender=None, sym
    if symptom_duration is not None:
       context_parts.append(f"Thời gian triệu chứng: {symptom_duration} ngày")
 
-   full_text = ". ".join(context_parts)
+   return ". ".join(context_parts)
+
+def _provided_features(age, gender):
+   # Tầng 2 không cần chạy cho feature có từ tham số
+   return [feature for feature, value in (('Age', age), ('Sex', gender)) if value is not None]
 
-   # Trích xuất features bằng NLP
-   features, missing_features = nlp_extractor.extract_all_features(full_text)
+def _apply_parameters(result, age, gender, symptom_duration):
+   features, missing_features, sources = result
 
    if age is not None:
       features['Age'] = int(age)
+      sources['Age'] = SOURCE_INPUT
 
    if gender is not None:
       features['Sex'] = 1 if str(gender).lower() in ['nam', 'male', 'm', '1', 'true'] else 0
+      sources['Sex'] = SOURCE_INPUT
 
    # Điều chỉnh dựa trên thời gian triệu chứng
    if symptom_duration is not None:
+      oldpeak = features.get('Oldpeak', 0)
       if symptom_duration > 30:
-         features['Oldpeak'] = max(features.get('Oldpeak', 0), 1.5)
+         features['Oldpeak'] = max(oldpeak, 1.5)
          features['ST_Slope'] = 2  # Down
+         sources['ST_Slope'] = SOURCE_INPUT
       elif symptom_duration > 7:
-         features['Oldpeak'] = max(features.get('Oldpeak', 0), 0.5)
+         features['Oldpeak'] = max(oldpeak, 0.5)
+      if features['Oldpeak'] != oldpeak:
+         sources['Oldpeak'] = SOURCE_INPUT
 
-   return features, missing_features
+   return features, missing_features, sources
@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from compiled_forest import FOREST_MAX_BATCH
+from extensions import cascade, explainer, forest, model, model_version, preprocessor
+from nlp_processor import FEATURE_ORDER
+from prediction_batcher import PredictionBatcher
+from utils.text_cache import TextCache
+
+def feature_matrix(rows):
+   """Mảng float (n, 11) theo FEATURE_ORDER từ các dict features"""
+   return np.array([[row[f] for f in FEATURE_ORDER] for row in rows], dtype=np.float64)
+
+def _transform(X):
+   """Đầu ra của bước tiền xử lý (mảng dày) cho mảng X (n, 11)"""
+   if preprocessor is not None:
+      return preprocessor.transform(X)
+   transformed = model.named_steps['preprocessor'].transform(pd.DataFrame(X, columns=FEATURE_ORDER))
+   return transformed.toarray() if hasattr(transformed, 'toarray') else transformed
+
+def predict_proba(X):
+   """
+   Xác suất của từng lớp cho mảng X (n, 11)
+
+   Dùng bản compile của bước tiền xử lý (xem compiled_preprocessor) và của
+   forest với batch tới FOREST_MAX_BATCH hàng (xem compiled_forest) nếu có,
+   không thì cho DataFrame đi qua cả pipeline sklearn; các cách cho cùng kết quả.
+   """
+   if preprocessor is None and forest is None:
+      return model.predict_proba(pd.DataFrame(X, columns=FEATURE_ORDER))
+   transformed = _transform(X)
+   if forest is not None and len(transformed) <= FOREST_MAX_BATCH:
+      return forest.predict_proba(transformed)
+   return model.named_steps['classifier'].predict_proba(transformed)
+
+def score(X, full_forest=False):
+   """
+   (xác suất các lớp, mask các hàng có xác suất đúng của cả forest) cho mảng X (n, 11)
+
+   Khi bật cascade (và không full_forest), model chưng cất chấm trước; chỉ các
+   hàng nằm trong dải bất định của nó mới qua predict_proba.
+   """
+   if cascade is None or full_forest:
+      return predict_proba(X), np.ones(len(X), dtype=bool)
+   proba = cascade.predict_proba(_transform(X))
+   uncertain = cascade.uncertain(proba)
+   exact = np.zeros(len(X), dtype=bool)
+   if uncertain.any():
+      proba[uncertain] = predict_proba(X[uncertain])
+      exact[uncertain] = True
+   return proba, exact
+
+def explain(X):
+   """
+   Phần đóng góp của từng feature (theo explainer.feature_names) vào xác suất có
+   bệnh, mảng (n, 11) cho mảng X (n, 11); None khi tắt giải thích
+   """
+   if explainer is None:
+      return None
+   return explainer.explain(_transform(X))
+
+def predicted_classes(proba):
+   """Lớp dự đoán như model.predict: lớp có xác suất lớn nhất"""
+   return model.classes_[np.argmax(proba, axis=1)]
+
+def predict_one(features, full_forest=False):
+   """
+   (lớp dự đoán, xác suất các lớp, xác suất có đúng của cả forest không) cho
+   dict features của một bệnh nhân
+
+   Khi bật cascade (và không full_forest), hàng mà model chưng cất đủ chắc
+   không qua forest (xem score). Khi bật prediction_batcher, hàng cần forest
+   được gộp với các request đồng thời thành một lần predict_proba; kết quả
+   giống hệt khi chạy riêng.
+   """
+   X = feature_matrix([features])
+   if cascade is not None and not full_forest:
+      proba = cascade.predict_proba(_transform(X))[0]
+      if not cascade.uncertain(proba[None])[0]:
+         return predicted_classes(proba[None])[0], proba, False
+   if prediction_batcher is not None:
+      proba = prediction_batcher.submit(X[0])
+   else:
+      proba = predict_proba(X)[0]
+   return predicted_classes(proba[None])[0], proba, True
+
+# Gộp các request /predict đồng thời, bật bằng PREDICT_COALESCING=1: gom trong
+# PREDICT_COALESCE_WINDOW_MS (mặc định 2 ms), tối đa PREDICT_COALESCE_MAX_BATCH hàng
+prediction_batcher = None
+if model is not None and os.environ.get("PREDICT_COALESCING", "").lower() in ("1", "true", "yes"):
+   prediction_batcher = PredictionBatcher(
+      predict_proba,
+      window=float(os.environ.get("PREDICT_COALESCE_WINDOW_MS", "2")) / 1000,
+      max_batch=int(os.environ.get("PREDICT_COALESCE_MAX_BATCH", "32"))
+   )
+
+# Kết quả dự đoán theo vector 11 features: nhiều văn bản khác nhau cho cùng một
+# vector vì phần lớn feature rơi về default_values. Lưu (lớp, xác suất, body,
+# xác suất có đúng của cả forest không);
+# PREDICTION_CACHE_ENTRIES=0 để tắt
+prediction_cache = TextCache(
+   max_entries=int(os.environ.get("PREDICTION_CACHE_ENTRIES", "4096")),
+   max_bytes=8 * 1024 * 1024,
+   ttl=60 * 60
+)
+
+def prediction_key(features):
+   """Khóa của prediction_cache: phiên bản model và vector đúng như model nhận (float64)"""
+   return (model_version,) + tuple(float(features[f]) for f in FEATURE_ORDER)
@@ -0,0 +1,112 @@
+import os
+import queue
+import threading
+import uuid
+
+from incremental_extractor import IncrementalExtraction
+from services.feature_service import check_text_length, nlp_extractor
+from utils.text_cache import TextCache
+
+TOTAL_FEATURES = 11
+
+# Phiên gõ trực tiếp: hết hạn sau 30 phút không dùng (mỗi lần get_session
+# tính lại hạn). Đầy thì bỏ phiên lâu không dùng nhất; kết nối SSE đang mở
+# gọi get_session mỗi nhịp nên phiên đang được nghe không bị bỏ trước
+analyze_sessions = TextCache(max_entries=int(os.environ.get("ANALYZE_MAX_SESSIONS", "1024")), ttl=30 * 60,
+                             sizeof=lambda session: 1, sliding=True)
+
+
+class AnalyzeSession:
+   """Một ô nhập triệu chứng đang được gõ cùng các kết nối SSE đang nghe nó"""
+
+   def __init__(self):
+      self.id = uuid.uuid4().hex
+      self.extraction = IncrementalExtraction(nlp_extractor)
+      self.lock = threading.Lock()
+      self.listeners = []
+
+   def apply(self, data):
+      """
+      Áp dụng thay đổi từ client và trả về phần thay đổi
+
+      data là {"symptoms": "<toàn bộ văn bản>"} hoặc
+      {"edit": {"offset": int, "delete": int, "insert": str}}
+
+      Raises:
+         TextTooLongError: văn bản sau thay đổi dài hơn MAX_TEXT_CHARS
+         TypeError, ValueError: data không đúng dạng trên (route trả về 400)
+      """
+      if not isinstance(data, dict):
+         raise TypeError("Body must be a JSON object")
+      with self.lock:
+         edit = data.get("edit")
+         if edit is not None:
+            if not isinstance(edit, dict):
+               raise TypeError("'edit' must be an object")
+            offset = int(edit.get("offset", 0))
+            delete = int(edit.get("delete", 0))
+            insert = edit.get("insert", "")
+            if not isinstance(insert, str):
+               raise TypeError("'edit.insert' must be a string")
+            text = self.extraction.text
+            check_text_length(offset + len(insert) + max(0, len(text) - offset - max(delete, 0)))
+            delta = self.extraction.apply_edit(offset, delete, insert)
+         else:
+            symptoms = data.get("symptoms", "")
+            if not isinstance(symptoms, str):
+               raise TypeError("'symptoms' must be a string")
+            check_text_length(len(symptoms))
+            delta = self.extraction.update(symptoms)
+
+         delta = self._with_progress(delta)
+         for listener in list(self.listeners):
+            listener.put(delta)
+         return delta
+
+   def snapshot(self):
+      """Toàn bộ trạng thái hiện tại, gửi khi client vừa kết nối"""
+      with self.lock:
+         extraction = self.extraction
+         return self._with_progress({
+            "features_extracted": dict(extraction.features),
+            "missing_features": list(extraction.missing_features),
+            "found_features": list(extraction.found_features)
+         }, force=True)
+
+   def _with_progress(self, delta, force=False):
+      if force or "found_features" in delta:
+         found = len(self.extraction.found_features)
+         delta["progress_percentage"] = round(found / TOTAL_FEATURES * 100)
+      delta["text_length"] = len(self.extraction.text)
+      return delta
+
+   def subscribe(self):
+      listener = queue.Queue()
+      with self.lock:
+         self.listeners.append(listener)
+      return listener
+
+   def unsubscribe(self, listener):
+      with self.lock:
+         if listener in self.listeners:
+            self.listeners.remove(listener)
+
+
+def create_session(data):
+   """
+   Tạo phiên từ body của POST /analyze/stream; phiên chỉ được lưu khi data hợp lệ
+
+   Returns:
+      Tuple[session, delta]
+
+   Raises:
+      như AnalyzeSession.apply
+   """
+   session = AnalyzeSession()
+   delta = session.apply(data) if data else session.snapshot()
+   analyze_sessions.put(session.id, session)
+   return session, delta
+
+
+def get_session(session_id):
+   return analyze_sessions.get(session_id)
@@ -0,0 +1,303 @@
+"""
+Trích xuất hai tầng.
+
+Tầng 1 là HeartDiseaseNLPExtractor (luật: từ khóa + regex), chạy ngay trong
+request. Tầng 2 là một backend nặng hơn (NER / mô hình thống kê) có thể cắm
+vào qua đường dẫn "module:Class". Backend chỉ được nạp khi lần đầu cần đến,
+trong một process pool riêng, nên worker Flask không tốn thời gian khởi động
+hay bộ nhớ cho nó. Tầng 2 chỉ chạy cho các feature tầng 1 để ở default_values
+và trong giới hạn thời gian: quá hạn thì giữ kết quả tầng 1.
+"""
+import importlib
+import math
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from nlp_processor import FEATURE_CODES, VALUE_RANGES, clamp
+
+# Nguồn của mỗi giá trị trong kết quả
+SOURCE_RULES = 'rules'      # tầng 1
+SOURCE_TIER2 = 'tier2'      # backend tầng 2
+SOURCE_INPUT = 'input'      # tham số người dùng gửi kèm (tuổi, giới tính, ...)
+SOURCE_DEFAULT = 'default'  # không tầng nào tìm thấy: default_values hoặc giá trị ước tính của tầng 1
+
+# Oldpeak là số thực, các feature khác là số nguyên
+_FLOAT_FEATURES = ('Oldpeak',)
+# Pool hỏng liên tiếp chừng này lần (vd backend không nạp được) thì tắt tầng 2
+_MAX_POOL_FAILURES = 3
+
+
+class ExtractionBackend:
+   """
+   Backend tầng 2, chạy trong worker process.
+
+   Lớp con nạp mô hình trong load() (gọi một lần khi worker khởi động) và trả
+   về trong extract() các feature tìm được trong số `features` được yêu cầu.
+   Giá trị phải cùng mã hóa với HeartDiseaseNLPExtractor (vd ChestPainType
+   0-3); feature không tìm thấy thì bỏ qua.
+   """
+
+   def load(self) -> None:
+      pass
+
+   def extract(self, text: str, features: List[str]) -> Dict[str, Any]:
+      raise NotImplementedError
+
+
+class LabeledValueBackend(ExtractionBackend):
+   """
+   Backend thay thế đơn giản (để chạy thử tầng 2): đọc "<nhãn>: <số>" với nhãn
+   là tên cột của dataset, vd văn bản dán từ phiếu xét nghiệm hay bảng dữ liệu
+   "chol: 250, trestbps=140, thalach 150"
+   """
+
+   LABELS = {
+      'Age': ('age',),
+      'RestingBP': ('restingbp', 'trestbps'),
+      'Cholesterol': ('chol',),
+      'FastingBS': ('fastingbs', 'fbs'),
+      'MaxHR': ('maxhr', 'thalach'),
+      'ExerciseAngina': ('exerciseangina', 'exang'),
+      'Oldpeak': ('oldpeak',),
+   }
+
+   def load(self) -> None:
+      self.patterns = {
+         feature: re.compile(r'\b(?:' + '|'.join(labels) + r')\s*[:=]?\s*(\d+(?:\.\d+)?)\b')
+         for feature, labels in self.LABELS.items()
+      }
+
+   def extract(self, text: str, features: List[str]) -> Dict[str, Any]:
+      text = text.lower()
+      found = {}
+      for feature in features:
+         pattern = self.patterns.get(feature)
+         match = pattern.search(text) if pattern else None
+         if match:
+            found[feature] = float(match.group(1))
+      return found
+
+
+# Backend của mỗi worker process, nạp một lần trong _init_backend
+_worker_backend: Optional[ExtractionBackend] = None
+
+
+def load_backend(spec: str) -> ExtractionBackend:
+   """Tạo backend từ "module:Class" (vd "tiered_extractor:LabeledValueBackend")"""
+   module_name, _, class_name = spec.partition(':')
+   backend = getattr(importlib.import_module(module_name), class_name)()
+   backend.load()
+   return backend
+
+
+def _init_backend(spec: str):
+   global _worker_backend
+   _worker_backend = load_backend(spec)
+
+
+def _run_backend(text: str, features: List[str]) -> Dict[str, Any]:
+   return _worker_backend.extract(text, features)
+
+
+def _checked_value(feature: str, value: Any) -> Optional[Any]:
+   """
+   Giá trị tầng 2 theo cùng quy ước với tầng 1: feature số kẹp vào VALUE_RANGES,
+   feature dạng mã chỉ nhận mã trong FEATURE_CODES; None nếu không dùng được
+   (không phải số, không hữu hạn, mã không hợp lệ, feature không biết)
+   """
+   try:
+      value = float(value)
+   except (TypeError, ValueError, OverflowError):
+      return None
+   if not math.isfinite(value):
+      return None
+   if feature in VALUE_RANGES:
+      value = clamp(feature, value)
+      return value if feature in _FLOAT_FEATURES else int(round(value))
+   if feature in FEATURE_CODES and value.is_integer() and int(value) in FEATURE_CODES[feature]:
+      return int(value)
+   return None
+
+
+class TieredExtractor:
+   """
+   Bọc HeartDiseaseNLPExtractor thêm tầng 2.
+
+   Một feature được coi là tầng 1 chưa tìm thấy khi nó không có trong
+   extractor.found_features (không ghi rõ trong văn bản), kể cả khi giá trị
+   ước tính khác default_values (vd MaxHR theo tuổi); giá trị ghi rõ trùng
+   default_values (vd huyết áp 120) vẫn là của tầng 1. Process pool chỉ được tạo ở
+   lần đầu có feature cần tầng 2; lần đó thường quá hạn vì worker còn đang
+   nạp backend, các lần sau dùng lại worker đã nạp.
+   """
+
+   def __init__(self, extractor, backend: Optional[str] = None, budget: float = 0.5, workers: int = 1):
+      """
+      Args:
+         extractor: HeartDiseaseNLPExtractor (tầng 1)
+         backend: "module:Class" của ExtractionBackend; None = chỉ dùng tầng 1
+         budget: thời gian chờ tầng 2 tối đa mỗi văn bản (giây)
+         workers: số worker process của tầng 2
+      """
+      self.extractor = extractor
+      self.backend = backend
+      self.budget = budget
+      self.workers = workers
+      self._pool: Optional[ProcessPoolExecutor] = None
+      self._lock = threading.Lock()
+      self._stats = {'calls': 0, 'filled': 0, 'timeouts': 0, 'errors': 0}
+      self._pool_failures = 0
+
+   def extract_all_features(self, text: str, skip: Iterable[str] = ()
+                            ) -> Tuple[Dict[str, Any], List[str], Dict[str, str]]:
+      """
+      Trích xuất features qua hai tầng
+
+      Args:
+         skip: các feature không cần tầng 2 (vd caller đã có giá trị từ tham số)
+
+      Returns:
+         Tuple[features_dict, missing_features, sources] với sources: feature ->
+         SOURCE_RULES / SOURCE_TIER2 / SOURCE_DEFAULT
+      """
+      features, missing = self.extractor.extract_all_features(text)
+      return self._with_tier2(text, features, missing, skip)
+
+   def extract_many(self, items: Iterable[Tuple[str, Iterable[str]]]
+                    ) -> Iterator[Tuple[Dict[str, Any], List[str], Dict[str, str]]]:
+      """
+      extract_all_features cho nhiều văn bản, trả về dần theo đúng thứ tự đầu vào
+
+      Tầng 1 chạy qua extractor.extract_many (process pool khi nhiều văn bản)
+      nếu extractor có, items chỉ được đọc trước vài chunk; tầng 2 vẫn chạy cho
+      từng văn bản như extract_all_features.
+
+      Args:
+         items: các cặp (text, skip)
+      """
+      extract_many = getattr(self.extractor, 'extract_many', None)
+      if extract_many is None:
+         for text, skip in items:
+            yield self.extract_all_features(text, skip)
+         return
+
+      # Các văn bản extract_many đã đọc nhưng chưa trả kết quả
+      read = deque()
+
+      def texts():
+         for text, skip in items:
+            read.append((text, skip))
+            yield text
+
+      for features, missing in extract_many(texts()):
+         text, skip = read.popleft()
+         yield self._with_tier2(text, features, missing, skip)
+
+   def _with_tier2(self, text: str, features: Dict[str, Any], missing: List[str], skip: Iterable[str]
+                   ) -> Tuple[Dict[str, Any], List[str], Dict[str, str]]:
+      """Gắn nguồn cho kết quả tầng 1 và chạy tầng 2 cho các feature tầng 1 không tìm thấy"""
+      found = set(self.extractor.found_features(text, features))
+      sources = {feature: SOURCE_RULES if feature in found else SOURCE_DEFAULT for feature in features}
+
+      skip = set(skip)
+      pending = [feature for feature, source in sources.items()
+                 if source == SOURCE_DEFAULT and feature not in skip]
+      if pending and self.backend:
+         for feature, value in self._run_tier2(text, pending).items():
+            if feature in pending and value is not None:
+               features[feature] = value
+               sources[feature] = SOURCE_TIER2
+         missing = [feature for feature in missing if sources[feature] != SOURCE_TIER2]
+
+      return features, missing, sources
+
+   def _run_tier2(self, text: str, features: List[str]) -> Dict[str, Any]:
+      """Giá trị tầng 2 đã ép kiểu, rỗng nếu quá hạn, backend lỗi hoặc tầng 2 đã tắt"""
+      with self._lock:
+         if self._pool_failures >= _MAX_POOL_FAILURES:
+            return {}
+         self._stats['calls'] += 1
+      pool = self._get_pool()
+      if pool is None:
+         return {}
+      try:
+         future = pool.submit(_run_backend, text, features)
+      except (BrokenProcessPool, RuntimeError):
+         self._reset_pool(pool)
+         self._count('errors')
+         return {}
+
+      try:
+         values = future.result(timeout=self.budget)
+      except FutureTimeout:
+         # Chưa chạy thì bỏ luôn; đang chạy thì để worker làm xong
+         future.cancel()
+         self._count('timeouts')
+         return {}
+      except BrokenProcessPool:
+         self._reset_pool(pool)
+         self._count('errors')
+         return {}
+      except Exception as e:
+         print("Tier 2 extraction failed:", e)
+         self._count('errors')
+         return {}
+
+      with self._lock:
+         self._pool_failures = 0
+      result = {}
+      for feature, value in (values or {}).items():
+         value = _checked_value(feature, value)
+         if value is not None:
+            result[feature] = value
+      if result:
+         self._count('filled')
+      return result
+
+   def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+      """Pool hiện tại (tạo nếu chưa có); None nếu tầng 2 đã tắt"""
+      with self._lock:
+         if self._pool_failures >= _MAX_POOL_FAILURES:
+            return None
+         if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_backend,
+                                             initargs=(self.backend,))
+         return self._pool
+
+   def _reset_pool(self, pool: ProcessPoolExecutor) -> None:
+      """
+      Bỏ pool hỏng (worker chết); lần gọi sau tạo pool mới. Các request cùng
+      gặp lỗi của một pool chỉ tính là một lần hỏng
+      """
+      with self._lock:
+         if self._pool is not pool:
+            return
+         self._pool = None
+         self._pool_failures += 1
+         if self._pool_failures == _MAX_POOL_FAILURES:
+            print("Tier 2 extraction disabled: backend worker keeps failing")
+      pool.shutdown(wait=False, cancel_futures=True)
+
+   def _count(self, key: str) -> None:
+      with self._lock:
+         self._stats[key] += 1
+
+   def stats(self) -> Dict[str, Any]:
+      with self._lock:
+         return {
+            'backend': self.backend,
+            'started': self._pool is not None,
+            'disabled': self._pool_failures >= _MAX_POOL_FAILURES,
+            **self._stats
+         }
+
+   def shutdown(self) -> None:
+      with self._lock:
+         pool, self._pool = self._pool, None
+      if pool is not None:
+         pool.shutdown(wait=False, cancel_futures=True)
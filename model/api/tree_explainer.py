@@ -0,0 +1,338 @@
+"""
+Giải thích từng bệnh nhân kiểu TreeSHAP cho RandomForest trong pipeline đã train.
+
+feature_importances_ giống nhau cho mọi bệnh nhân; ở đây mỗi feature gốc (11
+feature lâm sàng, các cột one-hot của một feature được gộp lại) nhận phần đóng
+góp của nó vào xác suất có bệnh của đúng hàng đó: giá trị Shapley của hàm
+E[f(x) | các feature trong S đã biết], kỳ vọng lấy theo số mẫu train đi qua
+từng nhánh (path-dependent TreeSHAP, như shap.TreeExplainer). Tổng các phần
+đóng góp cộng expected_value bằng xác suất của forest.
+
+Với một lá giá trị v, gọi p_j là tích các tỉ lệ mẫu (con / cha) trên các cạnh
+của đường đi có node cha tách theo feature j, z_j = 1 nếu x đi đúng mọi cạnh
+đó, f_j(t) = p_j + (z_j - p_j) t. Đóng góp của lá vào feature i là
+   v * (z_i - p_i) * tích phân trên [0, 1] của G(t) / f_i(t),  G = tích các f_j
+(bậc < số feature gốc nên tính đúng bằng cầu phương Gauss-Legendre
+ceil(số feature / 2) điểm; t nằm trong (0, 1) nên f_j(t) > 0). Gom theo cạnh
+thay vì theo lá (như Linear TreeSHAP): f_i của lá là f tính tới cạnh tách theo
+i cuối cùng trên đường đi, nên mỗi cạnh e tách theo i góp cho feature i
+   (z_e - p_e) * tích phân của H_e(t) / f_e(t)
+với H_e là tổng v * G của các lá bên dưới không qua cạnh tách theo i nào khác.
+Mỗi lần giải thích, cho mọi node của rừng cùng lúc, mỗi lượt một tầng:
+- z của cạnh vào node: z của cạnh cùng feature gần nhất phía trên và x đi
+  đúng cạnh này;
+- G từ gốc xuống: G của cha nhân f mới / f cũ của feature đó (tính sẵn cho 4
+  trường hợp z của hai cạnh; ở lá nhân sẵn v);
+- tổng v * G từ lá lên; H của cạnh e là tổng đó trừ tổng tại các cạnh cùng
+  feature ngay bên dưới, nên mỗi node nhân tổng của nó với bảng
+  (z - p) * trọng số / f của cạnh vào nó trừ bảng đó của previous (tính sẵn
+  cho 4 trường hợp z), rồi cộng theo feature gốc.
+Cộng một hằng số vào mọi lá của một cây không đổi giá trị Shapley, nên giá trị
+lá phổ biến nhất của mỗi cây (thường là lá thuần một lớp) được coi là 0 và các
+nhánh chỉ có những lá đó bị bỏ. Phần tính theo điểm cầu phương dùng float32
+(sai số cỡ 1e-6, kết quả trả về làm tròn 4 chữ số).
+
+Kiểm tra với giá trị Shapley tính trực tiếp trên mọi tập con, và đo thời gian:
+   python benchmarks/bench_explainer.py
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from compiled_preprocessor import compile_preprocessor
+
+# Số phần tử tối đa của mảng (node × hàng × điểm cầu phương) mỗi lần
+CHUNK_ELEMENTS = 1 << 23
+
+# Kiểu của các mảng theo điểm cầu phương
+_DTYPE = np.float32
+
+
+class TreeExplainer:
+   """Phần đóng góp của từng feature gốc vào xác suất một lớp của RandomForest"""
+
+   def __init__(self, feature_names, expected_value: float, n_features: int, feature, threshold,
+                missing_right, right, group, parent, previous, children, levels, ratios, weights):
+      """
+      Các node đã xếp theo tầng, trong mỗi tầng node trong đứng trước lá; node
+      gốc không có cạnh vào (feature 0, threshold +inf, weights 0).
+
+      Args:
+         feature_names: tên các feature gốc (đầu vào của bước tiền xử lý)
+         expected_value: xác suất trung bình theo mẫu train (chưa biết feature nào)
+         n_features: số cột đầu vào (đầu ra của bước tiền xử lý)
+         feature, threshold, missing_right, right: phép tách ở node cha và node
+            là con phải; x đi đúng cạnh vào node khi (x[feature] > threshold) == right
+         group: feature gốc của cạnh vào node
+         parent: node cha (node gốc: chính nó)
+         previous: cạnh cùng feature gốc gần nhất phía trên (không có: số node)
+         children: mảng (số node trong, 2) các con trái / phải, theo thứ tự node
+            (con đã bỏ: số node)
+         levels: (đầu, cuối các node trong, cuối) của từng tầng
+         ratios: mảng (số node, 4, số điểm) f mới / f cũ theo 2 * z + z của previous
+            (lá: nhân giá trị lá)
+         weights: mảng (số node, 4, số điểm) (z - p) * trọng số cầu phương / f
+            của cạnh vào node trừ của previous, theo 2 * z + z của previous
+      """
+      self.feature_names = list(feature_names)
+      self.n_groups = len(self.feature_names)
+      self.expected_value = float(expected_value)
+      self.n_features = int(n_features)
+      self.feature = np.asarray(feature, dtype=np.intp)
+      self.threshold = np.asarray(threshold, dtype=np.float64)[:, None]
+      self.missing_right = np.asarray(missing_right, dtype=bool)[:, None]
+      self.has_missing_right = bool(self.missing_right.any())
+      self.right = np.asarray(right, dtype=bool)[:, None]
+      self.group = np.asarray(group, dtype=np.intp)
+      self.parent = np.asarray(parent, dtype=np.intp)
+      self.previous = np.asarray(previous, dtype=np.intp)
+      self.levels = [tuple(level) for level in levels]
+      self.n_nodes = len(self.feature)
+      self.n_points = ratios.shape[2]
+      self.ratios = np.ascontiguousarray(ratios, dtype=_DTYPE).reshape(-1, self.n_points)
+      self.weights = np.ascontiguousarray(weights, dtype=_DTYPE).reshape(-1, self.n_points)
+
+      # Con của các node trong từng tầng
+      children = np.asarray(children, dtype=np.intp)
+      counts = [internal - start for start, internal, _ in self.levels]
+      self._children = np.split(children, np.cumsum(counts)[:-1])
+
+   def explain(self, X) -> np.ndarray:
+      """
+      Args:
+         X: mảng float (n, n_features) sau bước tiền xử lý
+
+      Returns:
+         mảng (n, số feature gốc): phần đóng góp vào xác suất; tổng theo hàng
+         cộng expected_value bằng xác suất của forest
+      """
+      X = np.asarray(X)
+      if X.ndim != 2 or X.shape[1] != self.n_features:
+         raise ValueError(f"expected an array of shape (n, {self.n_features}), got {X.shape}")
+      # Cây của sklearn so x dạng float32 với threshold float64
+      X = X.astype(np.float32).astype(np.float64)
+      contributions = np.empty((X.shape[0], self.n_groups))
+      step = max(1, CHUNK_ELEMENTS // max(1, self.n_nodes * self.n_points))
+      for start in range(0, X.shape[0], step):
+         contributions[start:start + step] = self._explain(X[start:start + step])
+      return contributions
+
+   def _agree(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+      """
+      Mảng (số node, n): z của cạnh vào node (x đi đúng mọi cạnh cùng feature
+      gốc từ gốc tới node) và z của previous (không có: True)
+      """
+      values = np.take(X.T, self.feature, axis=0)
+      go_right = values > self.threshold
+      if self.has_missing_right:
+         go_right |= np.isnan(values) & self.missing_right
+      agree = np.empty((self.n_nodes + 1, X.shape[0]), dtype=bool)
+      agree[:self.n_nodes] = go_right == self.right
+      agree[self.n_nodes] = True
+      above = np.ones((self.n_nodes, X.shape[0]), dtype=bool)
+      for start, _, stop in self.levels[1:]:
+         above[start:stop] = np.take(agree, self.previous[start:stop], axis=0)
+         agree[start:stop] &= above[start:stop]
+      return agree[:self.n_nodes], above
+
+   def _explain(self, X: np.ndarray) -> np.ndarray:
+      n_rows = X.shape[0]
+      agree, above = self._agree(X)
+      cases = (np.arange(self.n_nodes)[:, None] * 4 + 2 * agree + above).ravel()
+
+      # G từ gốc xuống; hàng cuối (con đã bỏ) bằng 0
+      paths = np.empty((self.n_nodes + 1, n_rows, self.n_points), dtype=_DTYPE)
+      np.take(self.ratios, cases, axis=0, out=paths[:self.n_nodes].reshape(-1, self.n_points), mode='clip')
+      paths[self.n_nodes] = 0.0
+      for start, _, stop in self.levels[1:]:
+         paths[start:stop] *= np.take(paths, self.parent[start:stop], axis=0)
+
+      # Tổng v * G của các lá bên dưới, từ tầng sâu nhất lên (ghi đè G của node trong)
+      for (start, internal, _), children in zip(reversed(self.levels), reversed(self._children)):
+         if internal > start:
+            np.add(np.take(paths, children[:, 0], axis=0), np.take(paths, children[:, 1], axis=0),
+                   out=paths[start:internal])
+      sums = paths[:self.n_nodes]
+
+      weights = np.take(self.weights, cases, axis=0).reshape(sums.shape)
+      terms = np.einsum('cnq,cnq->cn', sums, weights)
+
+      index = (self.group[:, None] * n_rows + np.arange(n_rows)).ravel()
+      totals = np.bincount(index, weights=terms.ravel(), minlength=self.n_groups * n_rows)
+      return totals.reshape(self.n_groups, n_rows).T
+
+
+def column_groups(preprocessor) -> Tuple[List[str], np.ndarray]:
+   """
+   (tên các feature gốc, feature gốc của từng cột đầu ra) từ CompiledPreprocessor:
+   cột số giữ feature của nó, các cột one-hot gộp về cột phân loại sinh ra chúng
+   """
+   group = np.full(preprocessor.n_features_out, -1, dtype=np.intp)
+   group[preprocessor.num_out] = preprocessor.num_in
+   group[preprocessor.cat_out] = preprocessor.cat_in
+   if (group < 0).any():
+      raise ValueError("every output column must come from an input feature")
+   return list(preprocessor.feature_names_in), group
+
+
+def _tree_edges(tree, column_group: np.ndarray, n_groups: int):
+   """
+   Các tầng node của một cây (theo chiều rộng) và cạnh vào từng node: cha, độ
+   sâu, feature gốc, cạnh cùng feature gần nhất phía trên (-1: không có) và
+   tích tỉ lệ mẫu p của feature đó tính tới node
+   """
+   left, right = tree.children_left, tree.children_right
+   cover = tree.weighted_n_node_samples
+   n_nodes = tree.node_count
+   parent = np.zeros(n_nodes, dtype=np.intp)
+   depth = np.zeros(n_nodes, dtype=np.intp)
+   group = np.zeros(n_nodes, dtype=np.intp)
+   previous = np.full(n_nodes, -1, dtype=np.intp)
+   paths = np.ones(n_nodes)
+   # Cạnh gần nhất của từng feature gốc trên đường từ gốc tới node
+   last = np.full((n_nodes, n_groups), -1, dtype=np.intp)
+   levels = [np.zeros(1, dtype=np.intp)]
+   while True:
+      internal = levels[-1][left[levels[-1]] != -1]
+      if not internal.size:
+         break
+      children = np.concatenate([left[internal], right[internal]])
+      parents = np.concatenate([internal, internal])
+      groups = column_group[tree.feature[parents]]
+      nearest = last[parents, groups]
+      parent[children] = parents
+      depth[children] = depth[parents] + 1
+      group[children] = groups
+      previous[children] = nearest
+      paths[children] = np.where(nearest >= 0, paths[nearest], 1.0) * cover[children] / cover[parents]
+      last[children] = last[parents]
+      last[children, groups] = children
+      levels.append(children)
+   return levels, parent, depth, group, previous, paths
+
+
+def compile_explainer(forest, preprocessor, class_index: int = -1) -> TreeExplainer:
+   """
+   Dựng explainer cho RandomForestClassifier (hoặc ExtraTreesClassifier) đã fit
+
+   Args:
+      forest: model.named_steps['classifier']
+      preprocessor: CompiledPreprocessor của bước tiền xử lý (để gộp cột one-hot)
+      class_index: lớp được giải thích (mặc định lớp cuối: có bệnh)
+
+   Raises:
+      ValueError: model không phải rừng cây phân loại một output
+   """
+   estimators = getattr(forest, 'estimators_', None)
+   if not estimators or not hasattr(forest, 'classes_') or getattr(forest, 'n_outputs_', 1) != 1:
+      raise ValueError(f"unsupported classifier {type(forest).__name__}")
+   feature_names, column_group = column_groups(preprocessor)
+   n_groups = len(feature_names)
+   n_trees = len(estimators)
+
+   # Các node giữ lại của mọi cây, đánh số chung theo (cây, node)
+   names = ('key', 'depth', 'leaf', 'parent', 'previous', 'left', 'right', 'feature', 'threshold',
+            'missing_right', 'is_right', 'group', 'paths', 'values')
+   parts = {name: [] for name in names}
+   expected_value = 0.0
+   offset = 0
+   for estimator in estimators:
+      tree = estimator.tree_
+      levels, parent, depth, group, previous, paths = _tree_edges(tree, column_group, n_groups)
+      leaf = tree.children_left == -1
+      value = tree.value[:, 0, :].astype(np.float64)
+      normalizer = value.sum(axis=1)
+      normalizer[normalizer == 0.0] = 1.0
+      value = value[:, class_index] / normalizer
+      cover = tree.weighted_n_node_samples
+      expected_value += float(np.sum(value[leaf] * cover[leaf])) / cover[0]
+
+      # Giá trị lá phổ biến nhất coi là 0; bỏ các nhánh chỉ gồm lá như vậy
+      common, counts = np.unique(value[leaf], return_counts=True)
+      value = np.where(leaf, value - common[np.argmax(counts)], 0.0)
+      keep = leaf & (value != 0.0)
+      for level in reversed(levels):
+         internal = level[~leaf[level]]
+         keep[internal] = keep[tree.children_left[internal]] | keep[tree.children_right[internal]]
+      order = np.concatenate(levels)
+      order = order[keep[order]]
+      split = parent[order]
+      missing = getattr(tree, 'missing_go_to_left', None)
+
+      parts['key'].append(order + offset)
+      parts['depth'].append(depth[order])
+      parts['leaf'].append(leaf[order])
+      parts['parent'].append(split + offset)
+      parts['previous'].append(np.where(previous[order] >= 0, previous[order] + offset, -1))
+      parts['left'].append(np.where(leaf[order], -1, tree.children_left[order] + offset))
+      parts['right'].append(np.where(leaf[order], -1, tree.children_right[order] + offset))
+      parts['feature'].append(tree.feature[split])
+      parts['threshold'].append(tree.threshold[split])
+      parts['missing_right'].append(np.zeros(len(order), dtype=bool) if missing is None
+                                    else ~missing[split].astype(bool))
+      parts['is_right'].append(tree.children_right[split] == order)
+      parts['group'].append(group[order])
+      parts['paths'].append(paths[order])
+      parts['values'].append(value[order] / n_trees)
+      offset += tree.node_count
+   arrays = {name: np.concatenate(chunks) for name, chunks in parts.items()}
+
+   # Xếp theo tầng, trong mỗi tầng node trong trước lá
+   sort = np.lexsort((arrays['leaf'], arrays['depth']))
+   arrays = {name: values[sort] for name, values in arrays.items()}
+   n_nodes = len(sort)
+   # Vị trí mới theo (cây, node); node đã bỏ -> n_nodes
+   position = np.full(offset + 1, n_nodes, dtype=np.intp)
+   position[arrays['key']] = np.arange(n_nodes)
+   roots = arrays['depth'] == 0
+   parent = np.where(roots, np.arange(n_nodes), position[arrays['parent']])
+   previous = position[arrays['previous']]
+   internal = ~arrays['leaf']
+   children = np.stack([position[arrays['left'][internal]], position[arrays['right'][internal]]], axis=1)
+
+   depth, leaf = arrays['depth'], arrays['leaf']
+   levels = []
+   for d in range(int(depth.max()) + 1 if n_nodes else 0):
+      start, stop = np.searchsorted(depth, [d, d + 1])
+      levels.append((int(start), int(start + np.count_nonzero(~leaf[start:stop])), int(stop)))
+
+   # Bảng theo điểm cầu phương: f(z) = p + (z - p) t của cạnh vào node và của previous
+   points, point_weights = np.polynomial.legendre.leggauss((n_groups + 1) // 2)
+   t = (points + 1.0) / 2.0
+   point_weights = point_weights / 2.0
+   p = np.where(roots, 1.0, arrays['paths'])[:, None]
+   factors = np.stack([p * (1.0 - t), p + (1.0 - p) * t], axis=1)
+   outer = np.concatenate([factors, np.ones((1, 2, len(t)))])[previous]
+   ratios = (factors[:, :, None, :] / outer[:, None, :, :]).reshape(n_nodes, 4, len(t))
+   ratios[roots] = 1.0
+   ratios[leaf] *= arrays['values'][leaf, None, None]
+   edge = np.stack([-p, 1.0 - p], axis=1) * point_weights / factors
+   edge[roots] = 0.0
+   # Tổng tại node đã nằm trong tổng tại previous nhưng không thuộc H của previous
+   weights = edge[:, :, None, :] - np.concatenate([edge, np.zeros((1, 2, len(t)))])[previous][:, None, :, :]
+   weights = weights.reshape(n_nodes, 4, len(t))
+
+   return TreeExplainer(feature_names, expected_value / n_trees, forest.n_features_in_,
+                        np.where(roots, 0, arrays['feature']), np.where(roots, np.inf, arrays['threshold']),
+                        arrays['missing_right'] & ~roots, arrays['is_right'] & ~roots, arrays['group'],
+                        parent, previous, children, levels, ratios, weights)
+
+
+def load_explainer(model, preprocessor=None) -> Optional[TreeExplainer]:
+   """
+   Dựng explainer cho model.named_steps['classifier'] (dựng lại mỗi lần nạp,
+   vài trăm ms với 200 cây)
+
+   Args:
+      preprocessor: CompiledPreprocessor đã nạp; None thì compile từ model
+
+   Trả về None nếu classifier không phải rừng cây hoặc bước tiền xử lý không
+   compile được (khi đó /predict không trả phần giải thích).
+   """
+   try:
+      if preprocessor is None:
+         preprocessor = compile_preprocessor(model.named_steps['preprocessor'])
+      return compile_explainer(model.named_steps['classifier'], preprocessor)
+   except ValueError as e:
+      print("Cannot build explainer:", e)
+      return None
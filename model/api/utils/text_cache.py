@@ -0,0 +1,134 @@
+import hashlib
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def normalize_text(text: Optional[str]) -> str:
+   """Chuẩn hóa văn bản trước khi trích xuất / làm khóa cache: NFC, chữ thường, gộp khoảng trắng"""
+   if not text:
+      return ""
+   return " ".join(unicodedata.normalize("NFC", text).lower().split())
+
+
+def text_key(text: str, *args: Any) -> str:
+   """Khóa cache: hash của văn bản đã chuẩn hóa cùng các tham số đi kèm"""
+   digest = hashlib.blake2b(digest_size=16)
+   digest.update(text.encode("utf-8"))
+   for arg in args:
+      digest.update(b"\x00" + repr(arg).encode("utf-8"))
+   return digest.hexdigest()
+
+
+def estimate_size(value: Any) -> int:
+   """Ước lượng số byte của một giá trị gồm dict / list / tuple / scalar"""
+   size = sys.getsizeof(value)
+   if isinstance(value, dict):
+      size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+   elif isinstance(value, (list, tuple, set)):
+      size += sum(estimate_size(item) for item in value)
+   return size
+
+
+class TextCache:
+   """
+   Cache LRU có TTL, giới hạn theo số phần tử và tổng số byte.
+
+   get() trả về bản sao (qua copy_value) để caller sửa kết quả thoải mái mà
+   không làm hỏng giá trị trong cache. Với sliding=True mỗi lần get() trúng
+   tính lại hạn từ lúc đó (hết hạn sau ttl giây không dùng). An toàn khi dùng
+   từ nhiều thread.
+   """
+
+   def __init__(self, max_entries: int = 1024, max_bytes: int = 8 * 1024 * 1024,
+                ttl: float = 600.0, copy_value: Callable[[Any], Any] = lambda value: value,
+                sizeof: Callable[[Any], int] = estimate_size, clock: Callable[[], float] = time.monotonic,
+                sliding: bool = False):
+      self.max_entries = max_entries
+      self.max_bytes = max_bytes
+      self.ttl = ttl
+      self.sliding = sliding
+      self._copy_value = copy_value
+      self._sizeof = sizeof
+      self._clock = clock
+      # khóa -> (giá trị, số byte, thời điểm hết hạn)
+      self._entries: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+      self._bytes = 0
+      self._lock = threading.Lock()
+      self.hits = 0
+      self.misses = 0
+      self.evictions = 0
+      self.expirations = 0
+
+   def get(self, key: Hashable) -> Optional[Any]:
+      """Giá trị còn hạn của key (bản sao) hoặc None"""
+      with self._lock:
+         now = self._clock()
+         entry = self._entries.get(key)
+         if entry is not None and entry[2] <= now:
+            self._remove(key)
+            self.expirations += 1
+            entry = None
+         if entry is None:
+            self.misses += 1
+            return None
+         if self.sliding:
+            self._entries[key] = (entry[0], entry[1], now + self.ttl)
+         self._entries.move_to_end(key)
+         self.hits += 1
+         value = entry[0]
+      return self._copy_value(value)
+
+   def put(self, key: Hashable, value: Any) -> None:
+      """Lưu bản sao của value; bỏ qua nếu một mình nó đã vượt max_bytes"""
+      size = self._sizeof(value)
+      if size > self.max_bytes or self.max_entries <= 0:
+         return
+      value = self._copy_value(value)
+      with self._lock:
+         if key in self._entries:
+            self._remove(key)
+         self._entries[key] = (value, size, self._clock() + self.ttl)
+         self._bytes += size
+         # Loại phần tử ít dùng gần đây nhất cho tới khi đủ giới hạn
+         while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+   def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+      value = self.get(key)
+      if value is None:
+         value = compute()
+         self.put(key, value)
+      return value
+
+   def pop(self, key: Hashable) -> None:
+      """Bỏ key khỏi cache (không có thì thôi)"""
+      with self._lock:
+         if key in self._entries:
+            self._remove(key)
+
+   def _remove(self, key: Hashable) -> None:
+      _, size, _ = self._entries.pop(key)
+      self._bytes -= size
+
+   def clear(self) -> None:
+      with self._lock:
+         self._entries.clear()
+         self._bytes = 0
+
+   def stats(self) -> Dict[str, Any]:
+      with self._lock:
+         lookups = self.hits + self.misses
+         return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+         }
@@ -0,0 +1,51 @@
+"""
+Benchmark văn bản gõ không dấu: extract_all_features trên ghi chú đủ dấu so
+với cùng ghi chú đã bỏ dấu ('đau ngực' -> 'dau nguc').
+
+Chữ không dấu được nhận ngay trong automaton từ khóa và các pattern số nên
+thời gian hai cột phải xấp xỉ nhau; cột cuối đếm số ghi chú cho cùng features
+(khác nhau khi có '<số> năm': 'nam' không được coi là đơn vị 'năm').
+
+Chạy từ thư mục model/:
+   python benchmarks/bench_accent_fold.py
+"""
+import argparse
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, BASE_DIR)
+
+from accent_fold import fold
+from bench_nlp_numeric import DENSE_SENTENCES, SPARSE_SENTENCES, make_note
+from nlp_processor import HeartDiseaseNLPExtractor
+
+
+def per_note_us(extractor, notes):
+   start = time.perf_counter()
+   results = [extractor.extract_all_features(note)[0] for note in notes]
+   return (time.perf_counter() - start) / len(notes) * 1e6, results
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--notes", type=int, default=2000)
+   parser.add_argument("--sentences", default="1,5,20", help="số câu mỗi ghi chú")
+   args = parser.parse_args()
+
+   extractor = HeartDiseaseNLPExtractor()
+   sentences = DENSE_SENTENCES + SPARSE_SENTENCES
+
+   print(f"{'sentences':>9} {'accented us':>12} {'unaccented us':>14} {'same features':>14}")
+   for n_sentences in [int(n) for n in args.sentences.split(",")]:
+      notes = [make_note(sentences[i % len(sentences):] + sentences, n_sentences) for i in range(args.notes)]
+      accented_us, expected = per_note_us(extractor, notes)
+      unaccented_us, results = per_note_us(extractor, [fold(note) for note in notes])
+      same = sum(a == b for a, b in zip(expected, results))
+      print(f"{n_sentences:>9} {accented_us:>12.1f} {unaccented_us:>14.1f} {same:>8}/{len(notes)}")
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,94 @@
+"""
+Benchmark extract_all_features trên văn bản cố tình gây chậm: dãy chữ số rất
+dài, từ khóa lặp lại, khoảng trắng rất dài, rất nhiều số / phân số / đơn vị.
+
+Mỗi loại văn bản được đo ở độ dài --chars (mặc định NLP_MAX_TEXT_CHARS, độ dài
+lớn nhất các route nhận) và một nửa độ dài đó. Thoát với mã 1 nếu một request
+chậm hơn --budget-ms, hoặc thời gian tăng hơn --max-growth lần khi độ dài gấp
+đôi (tuyến tính: ~2 lần, bậc hai: ~4 lần).
+
+Chạy từ thư mục model/:
+   python benchmarks/bench_adversarial.py --chars 20000 --budget-ms 100
+"""
+import argparse
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, BASE_DIR)
+
+from nlp_processor import MAX_TEXT_CHARS, HeartDiseaseNLPExtractor
+
+
+def repeat(unit, n):
+   return (unit * (n // len(unit) + 1))[:n]
+
+
+def padded(head, n, tail, fill=" "):
+   return head + fill * max(0, n - len(head) - len(tail)) + tail
+
+
+# tên -> hàm sinh văn bản dài n ký tự
+ADVERSARIAL_INPUTS = {
+   "digits": lambda n: "7" * n,
+   "digits+letter": lambda n: "1" * (n - 1) + "a",
+   "dotted digits": lambda n: repeat("1.", n),
+   "repeated cue": lambda n: repeat("huyết áp ", n),
+   "mixed cues": lambda n: repeat("bp hr age mạch nhịp tim cholesterol oldpeak mg/dl mmol/l ", n),
+   "cue+whitespace": lambda n: padded("huyết áp", n, "120"),
+   "number+whitespace": lambda n: padded("120", n, "mmhg"),
+   "cue+dots": lambda n: padded("oldpeak ", n, "1", fill="."),
+   "fractions": lambda n: repeat("1/", n),
+   "units": lambda n: repeat("120 mm ", n),
+   "candidate numbers": lambda n: padded("huyết áp cholesterol ", n, "",
+                                         fill=" ".join(str(i) for i in range(100, 400)) + " ")[:n],
+   "keyword prefixes": lambda n: repeat("đau đau ngự ", n),
+   "unaccented": lambda n: repeat("dau nguc khi leo cau thang ", n),
+}
+
+
+def best_time(extractor, text, repeat_count):
+   best = float("inf")
+   for _ in range(repeat_count):
+      start = time.perf_counter()
+      extractor.extract_all_features(text)
+      best = min(best, time.perf_counter() - start)
+   return best
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--chars", type=int, default=MAX_TEXT_CHARS, help="độ dài văn bản")
+   parser.add_argument("--budget-ms", type=float, default=100.0, help="thời gian tối đa mỗi request")
+   parser.add_argument("--max-growth", type=float, default=3.0,
+                       help="tỉ lệ thời gian tối đa khi độ dài gấp đôi")
+   parser.add_argument("--repeat", type=int, default=5, help="lấy lần nhanh nhất")
+   args = parser.parse_args()
+
+   extractor = HeartDiseaseNLPExtractor()
+   half = args.chars // 2
+   failures = []
+   print(f"{'input':>18} {f'{half} ms':>10} {f'{args.chars} ms':>11} {'us/char':>8} {'growth':>7}")
+   for name, make in ADVERSARIAL_INPUTS.items():
+      half_time = best_time(extractor, make(half), args.repeat)
+      full_time = best_time(extractor, make(args.chars), args.repeat)
+      growth = full_time / half_time
+      flags = []
+      if full_time * 1e3 > args.budget_ms:
+         flags.append("over budget")
+      if growth > args.max_growth:
+         flags.append("superlinear")
+      if flags:
+         failures.append(f"{name}: {', '.join(flags)}")
+      print(f"{name:>18} {half_time * 1e3:>10.1f} {full_time * 1e3:>11.1f} "
+            f"{full_time / args.chars * 1e6:>8.2f} {growth:>7.2f} {' '.join(flags)}")
+
+   if failures:
+      print("\n".join(failures), file=sys.stderr)
+      sys.exit(1)
+
+
+if __name__ == "__main__":
+   main()
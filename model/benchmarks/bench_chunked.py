@@ -0,0 +1,69 @@
+"""
+Benchmark trích xuất theo đoạn (extract_stream) trên ghi chú rất dài:
+bộ nhớ đỉnh (tracemalloc) và thời gian so với extract_all_features.
+
+Chạy từ thư mục model/:
+   python benchmarks/bench_chunked.py --sizes 100,1000,10000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, BASE_DIR)
+
+from bench_nlp_numeric import DENSE_SENTENCES, SPARSE_SENTENCES
+from nlp_processor import HeartDiseaseNLPExtractor
+
+
+def note_chunks(n_sentences, chunk_chars=4096):
+   """Sinh ghi chú theo từng đoạn, như khi đọc từ file"""
+   sentences = SPARSE_SENTENCES + DENSE_SENTENCES
+   chunk = []
+   size = 0
+   for i in range(n_sentences):
+      # Các chỉ số nằm ở cuối ghi chú để phải đọc hết văn bản
+      sentence = sentences[min(i * len(sentences) // n_sentences, len(sentences) - 1)]
+      chunk.append(sentence + " ")
+      size += len(sentence) + 1
+      if size >= chunk_chars:
+         yield "".join(chunk)
+         chunk, size = [], 0
+   if chunk:
+      yield "".join(chunk)
+
+
+def measure(fn):
+   tracemalloc.start()
+   start = time.perf_counter()
+   result = fn()
+   elapsed = time.perf_counter() - start
+   peak = tracemalloc.get_traced_memory()[1]
+   tracemalloc.stop()
+   return result, elapsed, peak
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--sizes", default="100,1000,10000", help="số câu trong ghi chú")
+   parser.add_argument("--chunk-size", type=int, default=16384)
+   args = parser.parse_args()
+
+   extractor = HeartDiseaseNLPExtractor()
+   print(f"{'sentences':>9} {'chars':>9} {'one-shot ms':>12} {'peak KB':>9} {'stream ms':>10} {'peak KB':>9}")
+   for n in [int(size) for size in args.sizes.split(",")]:
+      chars = sum(len(chunk) for chunk in note_chunks(n))
+      expected, full_time, full_peak = measure(
+         lambda: extractor.extract_all_features("".join(note_chunks(n))))
+      result, stream_time, stream_peak = measure(
+         lambda: extractor.extract_stream(note_chunks(n), chunk_size=args.chunk_size))
+      assert result == expected, "extract_stream trả về kết quả khác extract_all_features"
+      print(f"{n:>9} {chars:>9} {full_time * 1e3:>12.1f} {full_peak / 1024:>9.0f} "
+            f"{stream_time * 1e3:>10.1f} {stream_peak / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,133 @@
+"""
+Benchmark gộp request (prediction_batcher.py) so với gọi predict_proba cho
+từng request như /predict hiện tại.
+
+Mỗi mức --concurrency chạy chừng đó thread, mỗi thread gửi lần lượt các hàng
+(một bệnh nhân) lấy từ dữ liệu train, category đổi sang mã số như /predict
+gửi. Báo cáo thông lượng (request/giây), độ trễ p50 / p99 mỗi request và cỡ
+batch trung bình. Mặc định predict giống prediction_service (bản compile của
+bước tiền xử lý và forest); --sklearn dùng model.predict_proba trên DataFrame
+(đường /predict khi tắt bản compile). Kết quả hai đường được kiểm tra giống
+nhau từng bit.
+
+Chạy từ thư mục model/ (cần heart_disease_model.pkl, xem train_model.py):
+   python benchmarks/bench_coalescer.py --concurrency 1 4 16 64 --window-ms 2
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+from compiled_forest import FOREST_MAX_BATCH, compile_forest
+from compiled_preprocessor import DEFAULT_MODEL_PATH, compile_preprocessor
+from nlp_processor import HeartDiseaseNLPExtractor
+from prediction_batcher import PredictionBatcher
+from train_model import load_and_preprocess_data
+
+
+def training_matrix(columns):
+   """Dữ liệu train dạng mảng (n, 11), category đổi sang mã của extractor"""
+   with contextlib.redirect_stdout(io.StringIO()):
+      data = load_and_preprocess_data()[0]
+   frame = data[columns].replace(HeartDiseaseNLPExtractor().value_mapping).apply(pd.to_numeric)
+   return frame.to_numpy(dtype=np.float64)
+
+
+def make_predict(model, use_sklearn):
+   """predict_proba(X) như prediction_service"""
+   columns = list(model.named_steps['preprocessor'].feature_names_in_)
+   if use_sklearn:
+      return lambda X: model.predict_proba(pd.DataFrame(X, columns=columns))
+   preprocessor = compile_preprocessor(model.named_steps['preprocessor'])
+   forest = compile_forest(model.named_steps['classifier'])
+   classifier = model.named_steps['classifier']
+
+   def predict(X):
+      transformed = preprocessor.transform(X)
+      if len(transformed) <= FOREST_MAX_BATCH:
+         return forest.predict_proba(transformed)
+      return classifier.predict_proba(transformed)
+
+   return predict
+
+
+def run_load(call, rows, concurrency, n_requests):
+   """Chạy n_requests request trên concurrency thread; trả về (giây, độ trễ từng request)"""
+   counter = iter(range(n_requests))
+   counter_lock = threading.Lock()
+   latencies = np.empty(n_requests)
+
+   def worker():
+      while True:
+         with counter_lock:
+            i = next(counter, None)
+         if i is None:
+            return
+         start = time.perf_counter()
+         call(rows[i % len(rows)])
+         latencies[i] = time.perf_counter() - start
+
+   threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+   start = time.perf_counter()
+   for thread in threads:
+      thread.start()
+   for thread in threads:
+      thread.join()
+   return time.perf_counter() - start, latencies
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="file model đã train")
+   parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="số request đồng thời")
+   parser.add_argument("--requests", type=int, default=2000, help="số request mỗi lần đo")
+   parser.add_argument("--window-ms", type=float, default=2.0, help="thời gian gom batch")
+   parser.add_argument("--max-batch", type=int, default=32, help="số hàng tối đa mỗi batch")
+   parser.add_argument("--sklearn", action="store_true", help="predict bằng pipeline sklearn")
+   args = parser.parse_args()
+
+   model = joblib.load(args.model)["model"]
+   predict = make_predict(model, args.sklearn)
+   rows = training_matrix(list(model.named_steps['preprocessor'].feature_names_in_))
+   batcher = PredictionBatcher(predict, window=args.window_ms / 1000, max_batch=args.max_batch)
+
+   def direct(row):
+      return predict(row[None])[0]
+
+   # Cùng kết quả từng bit dù hàng chạy riêng hay trong batch
+   sample = rows[:256]
+   results = {}
+   run_load(lambda row: results.setdefault(row.tobytes(), batcher.submit(row)), sample, 32, len(sample))
+   expected = np.array([direct(row) for row in sample])
+   actual = np.array([results[row.tobytes()] for row in sample])
+   if not np.array_equal(expected.view(np.uint64), actual.view(np.uint64)):
+      print("batched probabilities differ from per-request ones", file=sys.stderr)
+      sys.exit(1)
+
+   print(f"{'threads':>7} {'path':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'batch':>6}")
+   for concurrency in args.concurrency:
+      for name, call in (("direct", direct), ("batched", batcher.submit)):
+         before = batcher.stats()
+         seconds, latencies = run_load(call, rows, concurrency, args.requests)
+         after = batcher.stats()
+         batches = after['batches'] - before['batches']
+         mean_batch = (after['requests'] - before['requests']) / batches if batches else 1.0
+         print(f"{concurrency:>7} {name:>8} {args.requests / seconds:>8.0f} "
+               f"{np.percentile(latencies, 50) * 1e3:>8.2f} {np.percentile(latencies, 99) * 1e3:>8.2f} "
+               f"{mean_batch:>6.1f}")
+   print("queue delay ms", batcher.stats()['queue_delay_ms'])
+
+
+if __name__ == "__main__":
+   main()
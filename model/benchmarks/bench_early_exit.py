@@ -0,0 +1,109 @@
+"""
+Forest dừng sớm (CompiledForest.predict_proba_early) trên tập test giữ lại lúc
+train (split_dataset của train_model.py), category dạng chuỗi như lúc train và
+dạng mã số như /predict gửi.
+
+Với từng dạng: số cây trung bình đã đi trên mỗi hàng (từng hàng một như
+/predict, và cả tập một batch), tỉ lệ hàng dừng sớm, và
+kiểm tra mọi hàng có cùng lớp dự đoán, cùng mức nguy cơ (các ngưỡng của
+routes/predict.py) với xác suất đầy đủ, hàng đi hết các cây giống
+predict_proba từng bit. Rồi đo thời gian theo cỡ batch so với predict_proba
+(lần nhanh nhất trong --repeat lần). Thoát với mã 1 nếu một kiểm tra không đạt.
+
+Chạy từ thư mục model/ (cần heart_disease_model.pkl, xem train_model.py):
+   python benchmarks/bench_early_exit.py --sizes 1 32 128
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+from compiled_forest import EARLY_EXIT_MIN_STEP, compile_forest
+from compiled_preprocessor import DEFAULT_MODEL_PATH
+from nlp_processor import HeartDiseaseNLPExtractor
+from train_model import load_and_preprocess_data, split_dataset
+
+# Ngưỡng mức nguy cơ của /predict (_prediction trong routes/predict.py), như distillation.py
+RISK_THRESHOLDS = (0.3, 0.5, 0.75)
+
+
+def test_split(columns):
+   """Tập test của train_model.py: dạng chuỗi và dạng mã của extractor"""
+   with contextlib.redirect_stdout(io.StringIO()):
+      X_test = split_dataset(load_and_preprocess_data()[0])[1][columns]
+   return {
+      "strings": X_test,
+      "codes": X_test.replace(HeartDiseaseNLPExtractor().value_mapping).apply(pd.to_numeric)
+   }
+
+
+def outcome(proba):
+   """(mức nguy cơ, lớp dự đoán) như routes/predict.py"""
+   return np.digitize(proba[:, 1], RISK_THRESHOLDS), np.argmax(proba, axis=1)
+
+
+def best_time(fn, repeat, calls):
+   best = float("inf")
+   for _ in range(repeat):
+      start = time.perf_counter()
+      for _ in range(calls):
+         fn()
+      best = min(best, (time.perf_counter() - start) / calls)
+   return best
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="file model đã train")
+   parser.add_argument("--sizes", type=int, nargs="+", default=[1, 32, 128], help="cỡ batch")
+   parser.add_argument("--min-step", type=int, default=EARLY_EXIT_MIN_STEP, help="số cây tối thiểu giữa hai lần kiểm tra")
+   parser.add_argument("--repeat", type=int, default=3, help="lấy lần nhanh nhất")
+   args = parser.parse_args()
+
+   model = joblib.load(args.model)["model"]
+   preprocessor = model.named_steps['preprocessor']
+   forest = compile_forest(model.named_steps['classifier'])
+   failed = False
+
+   for name, frame in test_split(list(preprocessor.feature_names_in_)).items():
+      X = preprocessor.transform(frame)
+      X = X.toarray() if hasattr(X, 'toarray') else X
+      full = forest.predict_proba(X)
+      early, used = forest.predict_proba_early(X, RISK_THRESHOLDS, args.min_step)
+      agree = np.all([a == b for a, b in zip(outcome(full), outcome(early))], axis=0)
+      complete = used == forest.n_trees
+      exact = np.array_equal(full[complete].view(np.uint64), early[complete].view(np.uint64))
+      # Như /predict: từng hàng một (cả batch thì các hàng chung lịch kiểm tra)
+      single = np.array([forest.predict_proba_early(X[i:i + 1], RISK_THRESHOLDS, args.min_step)[1][0]
+                         for i in range(len(X))])
+      print(f"{name}: {len(X)} rows, {single.mean():.1f} of {forest.n_trees} trees on average one row at a time "
+            f"({used.mean():.1f} as one batch), {np.mean(~complete):.1%} stopped early, "
+            f"{np.count_nonzero(~agree)} risk level mismatches, complete rows exact: {exact}")
+      failed |= not agree.all() or not exact
+
+      print(f"   {'batch':>7} {'full ms':>9} {'early ms':>9}")
+      rng = np.random.default_rng(0)
+      for size in args.sizes:
+         batch = X[rng.integers(0, len(X), size)]
+         calls = max(1, 200 // size)
+         full_time = best_time(lambda: forest.predict_proba(batch), args.repeat, calls)
+         early_time = best_time(lambda: forest.predict_proba_early(batch, RISK_THRESHOLDS, args.min_step), args.repeat, calls)
+         print(f"   {size:>7} {full_time * 1e3:>9.3f} {early_time * 1e3:>9.3f}")
+
+   if failed:
+      print("early exit check failed", file=sys.stderr)
+      sys.exit(1)
+
+
+if __name__ == "__main__":
+   main()
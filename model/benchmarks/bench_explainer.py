@@ -0,0 +1,153 @@
+"""
+Kiểm tra và đo thời gian phần giải thích từng bệnh nhân (tree_explainer.py).
+
+- Cộng đủ: với các hàng train (category dạng chuỗi như lúc train và dạng mã số
+  như /predict gửi), tổng các phần đóng góp cộng expected_value bằng
+  forest.predict_proba (lệch tối đa --tolerance).
+- Đúng giá trị Shapley: với --check-trees cây đầu và --check-rows hàng, so với
+  công thức Shapley tính trực tiếp trên mọi tập con của 11 feature.
+- Ngân sách thời gian: trung vị thời gian giải thích một hàng (như một request
+  /predict) không quá --budget-ms, và thời gian mỗi hàng khi giải thích theo
+  batch (như /predict_batch với "explain": true) cũng không quá --budget-ms ở
+  mọi cỡ trong --sizes; kèm bảng thời gian theo cỡ batch, so với
+  forest.predict_proba (bản compile) trên cùng các hàng.
+Thoát với mã 1 nếu một kiểm tra không đạt.
+
+Chạy từ thư mục model/ (cần heart_disease_model.pkl, xem train_model.py):
+   python benchmarks/bench_explainer.py --budget-ms 5
+"""
+import argparse
+import contextlib
+import copy
+import io
+import math
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+from compiled_forest import compile_forest
+from compiled_preprocessor import DEFAULT_MODEL_PATH, compile_preprocessor
+from nlp_processor import HeartDiseaseNLPExtractor
+from train_model import load_and_preprocess_data
+from tree_explainer import column_groups, compile_explainer
+
+
+def training_rows(model, columns):
+   """Các hàng train sau bước tiền xử lý: category dạng chuỗi và dạng mã của extractor"""
+   with contextlib.redirect_stdout(io.StringIO()):
+      data = load_and_preprocess_data()[0][columns]
+   coded = data.replace(HeartDiseaseNLPExtractor().value_mapping).apply(pd.to_numeric)
+   transformed = [model.named_steps['preprocessor'].transform(frame) for frame in (data, coded)]
+   return np.vstack([X.toarray() if hasattr(X, 'toarray') else X for X in transformed])
+
+
+def conditional_value(tree, x, known, column_group):
+   """E[xác suất lớp cuối | các feature gốc trong known], theo số mẫu train qua từng nhánh"""
+   def visit(node):
+      if tree.children_left[node] == -1:
+         value = tree.value[node, 0]
+         return value[-1] / value.sum()
+      left, right = tree.children_left[node], tree.children_right[node]
+      if column_group[tree.feature[node]] in known:
+         return visit(right if np.float32(x[tree.feature[node]]) > tree.threshold[node] else left)
+      cover = tree.weighted_n_node_samples
+      return (cover[left] * visit(left) + cover[right] * visit(right)) / cover[node]
+   return visit(0)
+
+
+def shapley_values(trees, x, column_group, n_groups):
+   """Giá trị Shapley theo định nghĩa: trung bình có trọng số trên mọi tập con feature"""
+   values = {}
+   for mask in range(1 << n_groups):
+      known = {g for g in range(n_groups) if mask >> g & 1}
+      values[mask] = np.mean([conditional_value(tree, x, known, column_group) for tree in trees])
+   result = np.zeros(n_groups)
+   for mask, value in values.items():
+      size = bin(mask).count("1")
+      for g in range(n_groups):
+         if not mask >> g & 1:
+            weight = math.factorial(size) * math.factorial(n_groups - size - 1) / math.factorial(n_groups)
+            result[g] += weight * (values[mask | 1 << g] - value)
+   return result
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="file model đã train")
+   parser.add_argument("--budget-ms", type=float, default=5.0, help="thời gian tối đa giải thích một hàng")
+   parser.add_argument("--tolerance", type=float, default=1e-5, help="sai lệch tối đa của xác suất / giá trị Shapley")
+   parser.add_argument("--check-trees", type=int, default=3, help="số cây so với công thức Shapley trực tiếp")
+   parser.add_argument("--check-rows", type=int, default=3, help="số hàng so với công thức Shapley trực tiếp")
+   parser.add_argument("--sizes", type=int, nargs="+", default=[1, 32, 256], help="cỡ batch")
+   parser.add_argument("--calls", type=int, default=200, help="số lần đo một hàng")
+   args = parser.parse_args()
+
+   model = joblib.load(args.model)["model"]
+   classifier = model.named_steps['classifier']
+   preprocessor = compile_preprocessor(model.named_steps['preprocessor'])
+   start = time.perf_counter()
+   explainer = compile_explainer(classifier, preprocessor)
+   build_time = time.perf_counter() - start
+   forest = compile_forest(classifier)
+   X = training_rows(model, list(preprocessor.feature_names_in))
+   print(f"{len(classifier.estimators_)} trees, {explainer.n_nodes} of {len(forest.feature)} nodes kept, "
+         f"built in {build_time * 1e3:.0f} ms")
+   failed = False
+
+   contributions = explainer.explain(X)
+   error = np.abs(contributions.sum(axis=1) + explainer.expected_value - classifier.predict_proba(X)[:, -1]).max()
+   print(f"additivity on {len(X)} rows: max error {error:.2e}")
+   failed |= error > args.tolerance
+
+   # Cùng cách dựng trên vài cây đầu, so với định nghĩa
+   subset = copy.copy(classifier)
+   subset.estimators_ = classifier.estimators_[:args.check_trees]
+   small = compile_explainer(subset, preprocessor)
+   _, column_group = column_groups(preprocessor)
+   rows = X[np.random.default_rng(0).choice(len(X), args.check_rows, replace=False)]
+   trees = [estimator.tree_ for estimator in subset.estimators_]
+   error = max(np.abs(shapley_values(trees, x, column_group, small.n_groups) - small.explain(x[None])[0]).max()
+               for x in rows)
+   print(f"exact Shapley values on {args.check_trees} trees x {args.check_rows} rows: max error {error:.2e}")
+   failed |= error > args.tolerance
+
+   rng = np.random.default_rng(1)
+   times = []
+   for i in rng.integers(0, len(X), args.calls):
+      start = time.perf_counter()
+      explainer.explain(X[i:i + 1])
+      times.append(time.perf_counter() - start)
+   median = float(np.median(times)) * 1e3
+   print(f"one row: median {median:.2f} ms, p99 {np.percentile(times, 99) * 1e3:.2f} ms "
+         f"(budget {args.budget_ms:.2f} ms)")
+   failed |= median > args.budget_ms
+
+   print(f"{'batch':>7} {'explain ms':>11} {'per row ms':>11} {'predict ms':>11}")
+   for size in args.sizes:
+      batch = X[rng.integers(0, len(X), size)]
+      explain_time = min(_timed(explainer.explain, batch) for _ in range(3))
+      predict_time = min(_timed(forest.predict_proba, batch) for _ in range(3))
+      print(f"{size:>7} {explain_time * 1e3:>11.2f} {explain_time / size * 1e3:>11.3f} {predict_time * 1e3:>11.2f}")
+      failed |= explain_time / size * 1e3 > args.budget_ms
+
+   if failed:
+      print("explainer check failed", file=sys.stderr)
+      sys.exit(1)
+
+
+def _timed(fn, X):
+   start = time.perf_counter()
+   fn(X)
+   return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+   main()
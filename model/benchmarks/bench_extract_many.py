@@ -0,0 +1,52 @@
+"""
+Benchmark extract_many: vòng lặp extract_all_features so với process pool.
+
+Chạy từ thư mục model/:
+   python benchmarks/bench_extract_many.py --texts 20000 --workers 1,2,4
+"""
+import argparse
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, BASE_DIR)
+
+from bench_nlp_numeric import DENSE_SENTENCES, SPARSE_SENTENCES, make_note
+from nlp_processor import HeartDiseaseNLPExtractor
+
+
+def generate_notes(n):
+   """Ghi chú dài ngắn khác nhau, sinh dần như khi đọc từ file"""
+   sentences = DENSE_SENTENCES + SPARSE_SENTENCES
+   for i in range(n):
+      yield make_note(sentences[i % len(sentences):] + sentences, i % 20 + 1)
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--texts", type=int, default=20000, help="số ghi chú")
+   parser.add_argument("--workers", default="1,2,4", help="các giá trị workers cần đo")
+   parser.add_argument("--chunksize", type=int, default=64)
+   args = parser.parse_args()
+
+   extractor = HeartDiseaseNLPExtractor()
+
+   start = time.perf_counter()
+   expected = [extractor.extract_all_features(text) for text in generate_notes(args.texts)]
+   loop_time = time.perf_counter() - start
+   print(f"{'workers':>8} {'texts/s':>10} {'speed-up':>9}")
+   print(f"{'loop':>8} {args.texts / loop_time:>10.0f} {1.0:>8.2f}x")
+
+   for workers in [int(n) for n in args.workers.split(",")]:
+      start = time.perf_counter()
+      results = list(extractor.extract_many(generate_notes(args.texts), workers=workers,
+                                            chunksize=args.chunksize))
+      elapsed = time.perf_counter() - start
+      assert results == expected, "extract_many trả về kết quả khác vòng lặp"
+      print(f"{workers:>8} {args.texts / elapsed:>10.0f} {loop_time / elapsed:>8.2f}x")
+
+
+if __name__ == "__main__":
+   main()
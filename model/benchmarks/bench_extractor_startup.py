@@ -0,0 +1,63 @@
+"""
+Benchmark khởi động worker: dựng HeartDiseaseNLPExtractor() từ đầu so với nạp
+từ artifact (extractor_artifact.load_extractor). Mỗi lần đo chạy trong một
+process Python mới để tính cả chi phí compile regex lần đầu.
+
+Chạy từ thư mục model/:
+   python benchmarks/bench_extractor_startup.py --runs 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(BASE_DIR, "..", "api")
+
+# In ra: thời gian khởi tạo extractor, thời gian request đầu tiên (giây)
+_WORKER = """
+import sys, time
+sys.path.insert(0, {api_dir!r})
+import nlp_processor
+from extractor_artifact import load_extractor
+start = time.perf_counter()
+extractor = {make}
+ready = time.perf_counter()
+extractor.extract_all_features("Bệnh nhân nam 58 tuổi, đau ngực khi gắng sức, huyết áp 150")
+print(ready - start, time.perf_counter() - ready)
+"""
+
+
+def measure(make, runs):
+   code = _WORKER.format(api_dir=API_DIR, make=make)
+   init, first = [], []
+   for _ in range(runs):
+      out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+      a, b = map(float, out.stdout.split()[-2:])
+      init.append(a)
+      first.append(b)
+   return min(init), min(first)
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--runs", type=int, default=5)
+   args = parser.parse_args()
+
+   with tempfile.TemporaryDirectory() as tmp:
+      path = os.path.join(tmp, "nlp_extractor.artifact")
+      sys.path.insert(0, API_DIR)
+      from extractor_artifact import build_artifact
+      build_artifact(path)
+      print(f"artifact: {os.path.getsize(path) / 1024:.1f} KB")
+
+      print(f"{'':>10} {'init ms':>9} {'first request ms':>17}")
+      for label, make in (("build", "nlp_processor.HeartDiseaseNLPExtractor()"),
+                          ("artifact", f"load_extractor({path!r})")):
+         init, first = measure(make, args.runs)
+         print(f"{label:>10} {init * 1000:>9.2f} {first * 1000:>17.2f}")
+
+
+if __name__ == "__main__":
+   main()
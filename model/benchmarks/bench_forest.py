@@ -0,0 +1,89 @@
+"""
+Benchmark RandomForest: model.predict_proba (cả pipeline sklearn, từ DataFrame),
+forest.predict_proba của sklearn và bản compile (compiled_forest.py) trên cùng
+đầu ra của bước tiền xử lý.
+
+Các hàng lấy ngẫu nhiên (có lặp) từ dữ liệu train, category đổi sang mã số như
+/predict gửi. Ở mỗi cỡ batch, kiểm tra bản compile cho xác suất giống sklearn
+từng bit rồi đo thời gian (lần nhanh nhất trong --repeat lần). Cột cuối là
+thời gian của cả đường /predict mới (compiled_preprocessor + compiled_forest).
+
+Chạy từ thư mục model/ (cần heart_disease_model.pkl, xem train_model.py):
+   python benchmarks/bench_forest.py --sizes 1 32 1024 100000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+from compiled_forest import compile_forest
+from compiled_preprocessor import DEFAULT_MODEL_PATH, compile_preprocessor
+from nlp_processor import HeartDiseaseNLPExtractor
+from train_model import load_and_preprocess_data
+
+
+def training_frame(columns):
+   """Dữ liệu train, category đổi sang mã của extractor"""
+   with contextlib.redirect_stdout(io.StringIO()):
+      data = load_and_preprocess_data()[0]
+   return data[columns].replace(HeartDiseaseNLPExtractor().value_mapping).apply(pd.to_numeric)
+
+
+def best_time(fn, repeat, calls):
+   best = float("inf")
+   for _ in range(repeat):
+      start = time.perf_counter()
+      for _ in range(calls):
+         fn()
+      best = min(best, (time.perf_counter() - start) / calls)
+   return best
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="file model đã train")
+   parser.add_argument("--sizes", type=int, nargs="+", default=[1, 32, 1024, 100000], help="cỡ batch")
+   parser.add_argument("--repeat", type=int, default=3, help="lấy lần nhanh nhất")
+   args = parser.parse_args()
+
+   model = joblib.load(args.model)["model"]
+   classifier = model.named_steps['classifier']
+   preprocessor = compile_preprocessor(model.named_steps['preprocessor'])
+   forest = compile_forest(classifier)
+   columns = list(preprocessor.feature_names_in)
+   data = training_frame(columns)
+   print(f"{forest.n_trees} trees, {len(forest.feature)} nodes")
+
+   rng = np.random.default_rng(0)
+   print(f"{'batch':>7} {'pipeline ms':>12} {'sklearn ms':>11} {'compiled ms':>12} {'speed-up':>9} {'/predict ms':>12}")
+   for size in args.sizes:
+      frame = data.iloc[rng.integers(0, len(data), size)].reset_index(drop=True)
+      X = frame.to_numpy(dtype=np.float64)
+      transformed = preprocessor.transform(X)
+
+      expected = model.predict_proba(frame)
+      if not np.array_equal(expected.view(np.uint64), forest.predict_proba(transformed).view(np.uint64)):
+         print(f"batch {size}: compiled probabilities differ from sklearn", file=sys.stderr)
+         sys.exit(1)
+
+      calls = max(1, 2000 // size)
+      pipeline_time = best_time(lambda: model.predict_proba(frame), args.repeat, max(1, calls // 20))
+      sklearn_time = best_time(lambda: classifier.predict_proba(transformed), args.repeat, max(1, calls // 20))
+      compiled_time = best_time(lambda: forest.predict_proba(transformed), args.repeat, calls)
+      end_to_end = best_time(lambda: forest.predict_proba(preprocessor.transform(X)), args.repeat, calls)
+      print(f"{size:>7} {pipeline_time * 1e3:>12.2f} {sklearn_time * 1e3:>11.2f} {compiled_time * 1e3:>12.2f} "
+            f"{sklearn_time / compiled_time:>8.1f}x {end_to_end * 1e3:>12.2f}")
+
+
+if __name__ == "__main__":
+   main()
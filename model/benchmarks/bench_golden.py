@@ -0,0 +1,208 @@
+"""
+Benchmark HeartDiseaseNLPExtractor trên bộ văn bản mẫu có nhãn (golden corpus).
+
+benchmarks/golden_corpus.jsonl gồm các ghi chú tiếng Việt và tiếng Anh, mỗi
+dòng một văn bản kèm 11 features mong đợi. Nhãn được gán tay theo mã hóa của
+extractor (value_mapping); feature không ghi trong văn bản lấy giá trị trong
+default_values, riêng MaxHR ước tính 220 - tuổi (giới hạn 60-180).
+
+Báo cáo:
+- độ chính xác của từng feature và tỉ lệ văn bản đúng cả 11 features;
+- độ trễ mỗi lần gọi (p50 / p90 / p99 trên các văn bản của bộ mẫu);
+- thông lượng (văn bản/giây) ở vài độ dài văn bản (ghép các câu của bộ mẫu);
+- bộ nhớ cấp phát lớn nhất (tracemalloc) khi trích xuất văn bản dài nhất.
+
+--save ghi kết quả ra file JSON làm mốc; --baseline so với một mốc đã lưu và
+thoát với mã 1 nếu độ chính xác giảm, hoặc chậm / tốn bộ nhớ hơn mốc quá
+--speed-tolerance / --memory-tolerance (tỉ lệ, vd 0.25 = 25%).
+
+Chạy từ thư mục model/:
+   python benchmarks/bench_golden.py --save benchmarks/golden_baseline.json
+   python benchmarks/bench_golden.py --baseline benchmarks/golden_baseline.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, BASE_DIR)
+
+from nlp_processor import HeartDiseaseNLPExtractor
+
+CORPUS_PATH = os.path.join(BASE_DIR, "golden_corpus.jsonl")
+
+FEATURES = [
+   'Age', 'Sex', 'ChestPainType', 'RestingBP', 'Cholesterol', 'FastingBS',
+   'RestingECG', 'MaxHR', 'ExerciseAngina', 'Oldpeak', 'ST_Slope'
+]
+
+
+def load_corpus(path):
+   with open(path, encoding="utf-8") as f:
+      return [json.loads(line) for line in f if line.strip()]
+
+
+def same_value(actual, expected):
+   if isinstance(expected, float):
+      return actual is not None and abs(float(actual) - expected) < 1e-6
+   return actual == expected
+
+
+def percentile(sorted_values, q):
+   index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+   return sorted_values[index]
+
+
+def measure_accuracy(extractor, corpus):
+   correct = dict.fromkeys(FEATURES, 0)
+   exact = 0
+   errors = []
+   for item in corpus:
+      features, _ = extractor.extract_all_features(item["text"])
+      wrong = [name for name in FEATURES if not same_value(features.get(name), item["expected"][name])]
+      for name in FEATURES:
+         if name not in wrong:
+            correct[name] += 1
+      if not wrong:
+         exact += 1
+      errors.extend((item["id"], name, features.get(name), item["expected"][name]) for name in wrong)
+   accuracy = {name: round(correct[name] / len(corpus), 4) for name in FEATURES}
+   return accuracy, round(exact / len(corpus), 4), errors
+
+
+def measure_latency(extractor, corpus, rounds):
+   """Mỗi văn bản được gọi rounds lần, lấy lần nhanh nhất (bớt nhiễu), rồi tính phân vị trên bộ mẫu"""
+   best = [float("inf")] * len(corpus)
+   for _ in range(rounds):
+      for i, item in enumerate(corpus):
+         start = time.perf_counter()
+         extractor.extract_all_features(item["text"])
+         best[i] = min(best[i], time.perf_counter() - start)
+   samples = sorted(best)
+   return {f"p{q}_us": round(percentile(samples, q) * 1e6, 1) for q in (50, 90, 99)}
+
+
+def make_text(corpus, n_chars):
+   """Ghép các văn bản của bộ mẫu tới khi dài ít nhất n_chars ký tự"""
+   parts, length, i = [], 0, 0
+   while length < n_chars:
+      text = corpus[i % len(corpus)]["text"]
+      parts.append(text)
+      length += len(text) + 1
+      i += 1
+   return " ".join(parts)
+
+
+def measure_throughput(extractor, corpus, lengths, repeat):
+   """Văn bản/giây ở mỗi độ dài, lấy lần nhanh nhất trong repeat lần"""
+   result = {}
+   for n_chars in lengths:
+      text = make_text(corpus, n_chars)
+      calls = max(1, 20000 // n_chars)
+      best = float("inf")
+      for _ in range(repeat):
+         start = time.perf_counter()
+         for _ in range(calls):
+            extractor.extract_all_features(text)
+         best = min(best, (time.perf_counter() - start) / calls)
+      result[str(n_chars)] = round(1 / best, 1)
+   return result
+
+
+def measure_peak_memory(extractor, corpus, n_chars):
+   text = make_text(corpus, n_chars)
+   tracemalloc.start()
+   try:
+      extractor.extract_all_features(text)
+      _, peak = tracemalloc.get_traced_memory()
+   finally:
+      tracemalloc.stop()
+   return round(peak / 1024, 1)
+
+
+def compare(result, baseline, speed_tolerance, memory_tolerance):
+   """Danh sách các chỉ số kém hơn mốc"""
+   regressions = []
+   for name, value in result["accuracy"].items():
+      before = baseline["accuracy"].get(name)
+      if before is not None and value < before:
+         regressions.append(f"accuracy {name}: {before} -> {value}")
+   if result["exact_match"] < baseline["exact_match"]:
+      regressions.append(f"exact match: {baseline['exact_match']} -> {result['exact_match']}")
+   for name, value in result["latency"].items():
+      before = baseline["latency"].get(name)
+      if before and value > before * (1 + speed_tolerance):
+         regressions.append(f"latency {name}: {before} -> {value}")
+   for length, value in result["throughput"].items():
+      before = baseline["throughput"].get(length)
+      if before and value < before / (1 + speed_tolerance):
+         regressions.append(f"throughput {length} chars: {before} -> {value} texts/s")
+   before = baseline.get("peak_memory_kb")
+   if before and result["peak_memory_kb"] > before * (1 + memory_tolerance):
+      regressions.append(f"peak memory: {before} -> {result['peak_memory_kb']} KB")
+   return regressions
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--corpus", default=CORPUS_PATH, help="file JSONL có nhãn")
+   parser.add_argument("--lengths", type=int, nargs="+", default=[200, 1000, 5000, 20000],
+                       help="độ dài văn bản (ký tự) khi đo thông lượng")
+   parser.add_argument("--rounds", type=int, default=20, help="số lượt gọi trên bộ mẫu khi đo độ trễ")
+   parser.add_argument("--repeat", type=int, default=3, help="lấy lần nhanh nhất khi đo thông lượng")
+   parser.add_argument("--save", help="ghi kết quả ra file JSON làm mốc")
+   parser.add_argument("--baseline", help="so với file mốc đã lưu")
+   parser.add_argument("--speed-tolerance", type=float, default=0.25,
+                       help="tỉ lệ chậm hơn mốc cho phép")
+   parser.add_argument("--memory-tolerance", type=float, default=0.25,
+                       help="tỉ lệ tốn bộ nhớ hơn mốc cho phép")
+   parser.add_argument("--show-errors", action="store_true", help="in các feature trích xuất sai")
+   args = parser.parse_args()
+
+   corpus = load_corpus(args.corpus)
+   extractor = HeartDiseaseNLPExtractor()
+   # Lượt khởi động: các lazy init không tính vào độ trễ
+   extractor.extract_all_features(corpus[0]["text"])
+
+   accuracy, exact_match, errors = measure_accuracy(extractor, corpus)
+   result = {
+      "corpus_size": len(corpus),
+      "accuracy": accuracy,
+      "exact_match": exact_match,
+      "latency": measure_latency(extractor, corpus, args.rounds),
+      "throughput": measure_throughput(extractor, corpus, args.lengths, args.repeat),
+      "peak_memory_kb": measure_peak_memory(extractor, corpus, max(args.lengths)),
+   }
+
+   print(f"{len(corpus)} texts, exact match {exact_match:.1%}")
+   for name in FEATURES:
+      print(f"{name:>15} {accuracy[name]:>7.1%}")
+   print("latency  " + "  ".join(f"{name[:-3]} {value:.0f}us" for name, value in result["latency"].items()))
+   print("throughput  " + "  ".join(f"{length} chars {value:.0f}/s" for length, value in result["throughput"].items()))
+   print(f"peak memory ({max(args.lengths)} chars) {result['peak_memory_kb']:.0f} KB")
+   if args.show_errors:
+      for item_id, name, actual, expected in errors:
+         print(f"  {item_id} {name}: got {actual}, expected {expected}")
+
+   if args.save:
+      with open(args.save, "w", encoding="utf-8") as f:
+         json.dump(result, f, indent=2)
+         f.write("\n")
+      print(f"saved baseline to {args.save}")
+
+   if args.baseline:
+      with open(args.baseline, encoding="utf-8") as f:
+         baseline = json.load(f)
+      regressions = compare(result, baseline, args.speed_tolerance, args.memory_tolerance)
+      if regressions:
+         print("\n".join(regressions), file=sys.stderr)
+         sys.exit(1)
+      print("no regressions against baseline")
+
+
+if __name__ == "__main__":
+   main()
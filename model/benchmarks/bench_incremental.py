@@ -0,0 +1,53 @@
+"""
+Benchmark gõ trực tiếp: chi phí mỗi phím gõ của IncrementalExtraction so với
+chạy lại extract_all_features trên toàn bộ ghi chú.
+
+Chạy từ thư mục model/:
+   python benchmarks/bench_incremental.py --sizes 10,100,500
+"""
+import argparse
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, BASE_DIR)
+
+from bench_nlp_numeric import DENSE_SENTENCES, make_note
+from incremental_extractor import IncrementalExtraction
+from nlp_processor import HeartDiseaseNLPExtractor
+
+TYPED = " Bệnh nhân than mệt, huyết áp 145, nhịp tim 102 bpm."
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--sizes", default="10,100,500", help="số câu trong ghi chú ban đầu")
+   args = parser.parse_args()
+
+   extractor = HeartDiseaseNLPExtractor()
+   print(f"{'sentences':>9} {'chars':>8} {'keystroke us':>13} {'full us':>9}")
+   for n in [int(size) for size in args.sizes.split(",")]:
+      note = make_note(DENSE_SENTENCES, n)
+      extraction = IncrementalExtraction(extractor)
+      extraction.update(note)
+
+      start = time.perf_counter()
+      for char in TYPED:
+         extraction.apply_edit(len(extraction.text), 0, char)
+      keystroke = (time.perf_counter() - start) / len(TYPED)
+
+      text = note
+      start = time.perf_counter()
+      for char in TYPED:
+         text += char
+         expected = extractor.extract_all_features(text)
+      full = (time.perf_counter() - start) / len(TYPED)
+
+      assert (extraction.features, extraction.missing_features) == expected
+      print(f"{n:>9} {len(text):>8} {keystroke * 1e6:>13.1f} {full * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+   main()
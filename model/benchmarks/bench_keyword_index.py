@@ -0,0 +1,72 @@
+"""
+Benchmark quét từ khóa theo kích thước từ điển.
+
+So sánh KeywordIndex.scan (một lượt trên automaton) với cách cũ kiểm tra
+`keyword in text` cho từng từ khóa, khi từ điển được thêm N từ khóa giả lập.
+
+Chạy từ thư mục model/:
+   python benchmarks/bench_keyword_index.py
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, BASE_DIR)
+
+from bench_nlp_numeric import DENSE_SENTENCES, make_note
+from keyword_index import KeywordIndex
+from nlp_processor import HeartDiseaseNLPExtractor
+
+SYLLABLES = [
+   "đau", "tức", "ngực", "khó", "thở", "mệt", "tim", "mạch", "máu", "nhói",
+   "chest", "pain", "heart", "rate", "short", "breath", "left", "arm", "sharp", "dull"
+]
+
+
+def synthetic_terms(n, seed=42):
+   rng = random.Random(seed)
+   terms = set()
+   while len(terms) < n:
+      terms.add(" ".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) + f" {len(terms)}")
+   return sorted(terms)
+
+
+def per_call_us(fn, min_time):
+   count = 0
+   start = time.perf_counter()
+   elapsed = 0.0
+   while elapsed < min_time:
+      fn()
+      count += 1
+      elapsed = time.perf_counter() - start
+   return elapsed / count * 1e6
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--extra-terms", default="0,100,500,2000", help="số từ khóa thêm vào từ điển")
+   parser.add_argument("--sentences", type=int, default=100, help="số câu trong ghi chú")
+   parser.add_argument("--min-time", type=float, default=0.5, help="thời gian chạy tối thiểu mỗi phép đo (giây)")
+   args = parser.parse_args()
+
+   extractor = HeartDiseaseNLPExtractor()
+   text = make_note(DENSE_SENTENCES, args.sentences).lower()
+
+   print(f"{'keywords':>9} {'scan us':>10} {'keyword in text us':>19}")
+   for extra in [int(n) for n in args.extra_terms.split(",")]:
+      groups = {category: terms['vi'] + terms['en'] for category, terms in extractor.medical_vocab.items()}
+      groups['synthetic'] = synthetic_terms(extra)
+      keywords = [keyword for terms in groups.values() for keyword in terms]
+      index = KeywordIndex(groups)
+
+      scan_us = per_call_us(lambda: index.scan(text), args.min_time)
+      loop_us = per_call_us(lambda: [keyword in text for keyword in keywords], args.min_time)
+      print(f"{len(keywords):>9} {scan_us:>10.1f} {loop_us:>19.1f}")
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,113 @@
+"""
+Benchmark NearDuplicateCache trên một luồng request phát lại: mỗi request là
+một ghi chú gốc được gửi lại nguyên văn hoặc sửa nhẹ (thêm dấu phẩy / khoảng
+trắng, sửa lỗi gõ, đổi một con số).
+
+In ra số lần chạy extractor tiết kiệm được, thời gian mỗi request so với gọi
+thẳng extract_all_features, và số kết quả khác với khi gọi thẳng.
+
+Ghi chú "symptoms" là mô tả triệu chứng kèm vài chỉ số (như đầu vào của
+/analyze); "dense" gồm toàn câu nhiều số nên hầu như mọi chỗ sửa đều nằm gần
+một số và không được dùng lại.
+
+Chạy từ thư mục model/:
+   python benchmarks/bench_near_duplicate.py --requests 20000 --notes-kind symptoms
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, BASE_DIR)
+
+from bench_nlp_numeric import DENSE_SENTENCES, SPARSE_SENTENCES, make_note
+from near_duplicate_cache import NearDuplicateCache
+from nlp_processor import HeartDiseaseNLPExtractor
+
+SYMPTOM_SENTENCES = [
+   "Dạo này tôi hay bị đau tức ngực, nhất là khi leo cầu thang hoặc đi bộ nhanh.",
+   "Cơn đau lan ra sau lưng và tay trái, kéo dài vài phút rồi hết khi nghỉ ngơi.",
+   "Tôi thấy khó thở, hồi hộp, đôi khi hoa mắt chóng mặt vào buổi sáng.",
+   "Gia đình có bố bị bệnh tim, tôi hút thuốc lá nhiều năm nay.",
+   "Ban đêm hay mệt mỏi, ngủ không ngon, người uể oải cả ngày.",
+   "I get a squeezing chest pain when I climb stairs and it goes away with rest.",
+   "Sometimes I feel short of breath and my heart is racing at night.",
+   "Bác sĩ nói điện tâm đồ có thay đổi st, dặn tôi đi khám lại.",
+]
+
+
+def perturb(note, rng):
+   """Sửa nhẹ một ghi chú như người dùng gửi lại"""
+   kind = rng.choice(["same", "comma", "space", "typo", "number"])
+   words = note.split(" ")
+   i = rng.randrange(len(words))
+   if kind == "comma":
+      words[i] += ","
+   elif kind == "space":
+      words[i] += " "
+   elif kind == "typo" and len(words[i]) > 3 and words[i].isalpha():
+      j = rng.randrange(len(words[i]) - 1)
+      word = words[i]
+      words[i] = word[:j] + word[j + 1] + word[j] + word[j + 2:]
+   elif kind == "number":
+      digits = [k for k, word in enumerate(words) if word[:1].isdigit()]
+      if digits:
+         k = rng.choice(digits)
+         words[k] = str(rng.randint(60, 300)) + words[k].lstrip("0123456789")
+   return " ".join(words)
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--notes", type=int, default=2000, help="số ghi chú gốc")
+   parser.add_argument("--requests", type=int, default=20000)
+   parser.add_argument("--max-entries", type=int, default=4096)
+   parser.add_argument("--notes-kind", choices=["symptoms", "dense"], default="symptoms")
+   parser.add_argument("--seed", type=int, default=7)
+   parser.add_argument("--repeat", type=int, default=3)
+   args = parser.parse_args()
+
+   rng = random.Random(args.seed)
+   notes = []
+   for _ in range(args.notes):
+      if args.notes_kind == "symptoms":
+         picked = rng.sample(SYMPTOM_SENTENCES, rng.randint(2, 4)) + rng.sample(DENSE_SENTENCES, 1)
+         rng.shuffle(picked)
+      else:
+         picked = rng.sample(DENSE_SENTENCES + SPARSE_SENTENCES, rng.randint(1, 4))
+      notes.append(make_note(picked, len(picked)).replace("58", str(rng.randint(30, 80))))
+   # Ghi chú gần đây được gửi lại nhiều hơn
+   stream = [perturb(notes[min(int(rng.expovariate(1 / 200)), len(notes) - 1)], rng)
+             for _ in range(args.requests)]
+
+   extractor = HeartDiseaseNLPExtractor()
+   expected = [extractor.extract_all_features(text) for text in stream]
+   # Máy ảo chia sẻ CPU dao động nhiều: lấy lần nhanh nhất, mỗi lần một cache mới
+   direct_time = cached_time = float("inf")
+   for _ in range(args.repeat):
+      start = time.perf_counter()
+      for text in stream:
+         extractor.extract_all_features(text)
+      direct_time = min(direct_time, time.perf_counter() - start)
+
+      cache = NearDuplicateCache(extractor, max_entries=args.max_entries)
+      start = time.perf_counter()
+      results = [cache.extract_all_features(text) for text in stream]
+      cached_time = min(cached_time, time.perf_counter() - start)
+
+   wrong = sum(a != b for a, b in zip(expected, results))
+   stats = cache.stats()
+   print(f"requests            {args.requests}")
+   print(f"extractor runs      {stats['misses']} (saved {stats['extractions_saved']}, "
+         f"exact {stats['exact_hits']}, near {stats['near_hits']}, rejected {stats['rejected']})")
+   print(f"evictions           {stats['evictions']}")
+   print(f"direct us/request   {direct_time / args.requests * 1e6:.1f}")
+   print(f"cached us/request   {cached_time / args.requests * 1e6:.1f}  ({direct_time / cached_time:.2f}x)")
+   print(f"different results   {wrong}")
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,113 @@
+"""
+Benchmark trích xuất features trên ghi chú dài (requests/giây).
+
+Chạy từ thư mục model/:
+   python benchmarks/bench_nlp_numeric.py
+   python benchmarks/bench_nlp_numeric.py --baseline HEAD~1
+
+--baseline nạp nlp_processor.py ở một commit git khác để so sánh tốc độ
+trước/sau và kiểm tra hai phiên bản trả về cùng kết quả.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import importlib.util
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(BASE_DIR, "..", "api")
+sys.path.insert(0, API_DIR)
+
+from nlp_processor import HeartDiseaseNLPExtractor
+
+# Ghi chú có đủ từ khóa: các chỉ số nằm ngay ở đầu văn bản
+DENSE_SENTENCES = [
+   "Bệnh nhân nam 58 tuổi, đau ngực lan sang tay trái khi leo cầu thang.",
+   "Huyết áp 150/95 mmHg, nhịp tim 110 bpm, cholesterol 260 mg/dl.",
+   "Tiền sử tiểu đường 10 năm, đường huyết 180, đang dùng thuốc.",
+   "Điện tâm đồ: st chênh, oldpeak 2.5, đoạn ST dốc xuống.",
+   "Patient reports chest pain radiating to jaw, bp 140, heart rate 95.",
+   "Lab results: glucose 110, lipid 220, st depression 1.5 mm st.",
+   "Ngày 12/03 tái khám, mạch 88, tình trạng ổn định, không khó thở.",
+]
+
+# Ghi chú nhiều số nhưng thiếu từ khóa: mọi pattern phải quét hết văn bản
+SPARSE_SENTENCES = [
+   "Ngày 12/03 tái khám lúc 08 giờ, phòng 204, đã uống 2 viên thuốc.",
+   "Bệnh nhân than đau ngực nhẹ, ngủ kém 3 đêm, ăn uống được 1/2 suất.",
+   "Xét nghiệm lần 2 ngày 15/03, kết quả 145 và 230, hẹn tái khám sau 7 ngày.",
+]
+
+NOTES = {
+   "dense": DENSE_SENTENCES,
+   "sparse": SPARSE_SENTENCES,
+}
+
+
+def make_note(sentences, n_sentences):
+   return " ".join(sentences[i % len(sentences)] for i in range(n_sentences))
+
+
+def load_baseline(rev):
+   """Nạp HeartDiseaseNLPExtractor từ model/api/nlp_processor.py tại commit rev"""
+   source = subprocess.check_output(
+      ["git", "show", f"{rev}:model/api/nlp_processor.py"],
+      cwd=BASE_DIR
+   )
+   handle, path = tempfile.mkstemp(suffix=".py")
+   with os.fdopen(handle, "wb") as f:
+      f.write(source)
+   spec = importlib.util.spec_from_file_location("nlp_processor_baseline", path)
+   module = importlib.util.module_from_spec(spec)
+   spec.loader.exec_module(module)
+   os.remove(path)
+   return module.HeartDiseaseNLPExtractor()
+
+
+def requests_per_second(extractor, text, min_time=1.0):
+   count = 0
+   start = time.perf_counter()
+   elapsed = 0.0
+   while elapsed < min_time:
+      extractor.extract_all_features(text)
+      count += 1
+      elapsed = time.perf_counter() - start
+   return count / elapsed
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--baseline", help="git revision để so sánh (vd HEAD~1)")
+   parser.add_argument("--sizes", default="1,10,100,500", help="số câu trong mỗi ghi chú")
+   parser.add_argument("--min-time", type=float, default=1.0, help="thời gian chạy tối thiểu mỗi phép đo (giây)")
+   args = parser.parse_args()
+
+   current = HeartDiseaseNLPExtractor()
+   baseline = load_baseline(args.baseline) if args.baseline else None
+
+   header = f"{'note':>7} {'sentences':>10} {'chars':>8} {'current req/s':>14}"
+   if baseline:
+      header += f" {'baseline req/s':>15} {'speed-up':>9}"
+   print(header)
+
+   for name, sentences in NOTES.items():
+      for size in [int(s) for s in args.sizes.split(",")]:
+         text = make_note(sentences, size)
+         line = f"{name:>7} {size:>10} {len(text):>8} "
+         rps = requests_per_second(current, text, args.min_time)
+         line += f"{rps:>14.1f}"
+
+         if baseline:
+            if baseline.extract_all_features(text) != current.extract_all_features(text):
+               print(f"Kết quả khác nhau với ghi chú {name} {size} câu", file=sys.stderr)
+               sys.exit(1)
+            base_rps = requests_per_second(baseline, text, args.min_time)
+            line += f" {base_rps:>15.1f} {rps / base_rps:>8.2f}x"
+
+         print(line)
+
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,88 @@
+"""
+Benchmark bước tiền xử lý của model: pipeline sklearn (DataFrame ->
+ColumnTransformer) so với bản compile numpy (compiled_preprocessor.py).
+
+Các hàng lấy từ dữ liệu train, đổi sang mã số như /predict gửi (Sex = 1...).
+Ở mỗi cỡ batch, kiểm tra hai cách cho kết quả giống nhau từng bit rồi đo thời
+gian (lần nhanh nhất trong --repeat lần), kể cả dựng DataFrame / mảng từ các
+dict features như route làm.
+
+Chạy từ thư mục model/ (cần heart_disease_model.pkl, xem train_model.py):
+   python benchmarks/bench_preprocessor.py --sizes 1 32 1024
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+from compiled_preprocessor import DEFAULT_MODEL_PATH, compile_preprocessor
+from nlp_processor import HeartDiseaseNLPExtractor
+from train_model import load_and_preprocess_data
+
+
+def training_rows(columns):
+   """Các hàng dữ liệu train dạng dict features, category đổi sang mã của extractor"""
+   with contextlib.redirect_stdout(io.StringIO()):
+      data = load_and_preprocess_data()[0]
+   frame = data[columns].replace(HeartDiseaseNLPExtractor().value_mapping).apply(pd.to_numeric)
+   return frame.to_dict("records")
+
+
+def best_time(fn, repeat, calls):
+   best = float("inf")
+   for _ in range(repeat):
+      start = time.perf_counter()
+      for _ in range(calls):
+         fn()
+      best = min(best, (time.perf_counter() - start) / calls)
+   return best
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="file model đã train")
+   parser.add_argument("--sizes", type=int, nargs="+", default=[1, 32, 1024], help="cỡ batch")
+   parser.add_argument("--repeat", type=int, default=5, help="lấy lần nhanh nhất")
+   args = parser.parse_args()
+
+   preprocessor = joblib.load(args.model)["model"].named_steps['preprocessor']
+   compiled = compile_preprocessor(preprocessor)
+   columns = list(compiled.feature_names_in)
+   rows = training_rows(columns)
+
+   print(f"{'batch':>6} {'sklearn us':>12} {'compiled us':>12} {'speed-up':>9}")
+   for size in args.sizes:
+      batch = [rows[i % len(rows)] for i in range(size)]
+      out = np.empty((size, compiled.n_features_out))
+
+      def run_sklearn():
+         return preprocessor.transform(pd.DataFrame(batch)[columns])
+
+      def run_compiled():
+         return compiled.transform(np.array([[row[c] for c in columns] for row in batch], dtype=np.float64), out)
+
+      expected = run_sklearn()
+      expected = expected.toarray() if hasattr(expected, "toarray") else expected
+      if not np.array_equal(expected.view(np.uint64), run_compiled().view(np.uint64)):
+         print(f"batch {size}: compiled output differs from sklearn", file=sys.stderr)
+         sys.exit(1)
+
+      calls = max(1, 2000 // size)
+      sklearn_time = best_time(run_sklearn, args.repeat, max(1, calls // 20))
+      compiled_time = best_time(run_compiled, args.repeat, calls)
+      print(f"{size:>6} {sklearn_time * 1e6:>12.1f} {compiled_time * 1e6:>12.1f} "
+            f"{sklearn_time / compiled_time:>8.0f}x")
+
+
+if __name__ == "__main__":
+   main()
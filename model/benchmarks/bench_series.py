@@ -0,0 +1,57 @@
+"""
+Benchmark trích xuất cả một cột văn bản: Series.apply(extract_all_features)
+so với extract_frame, trên hai cột: ghi chú lặp lại (--distinct ghi chú khác
+nhau) và ghi chú đều khác nhau (thêm mã hàng vào cuối mỗi ghi chú).
+
+Chạy từ thư mục model/:
+   python benchmarks/bench_series.py --rows 20000 --distinct 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+
+from bench_nlp_numeric import DENSE_SENTENCES, SPARSE_SENTENCES, make_note
+from nlp_processor import FEATURE_ORDER, HeartDiseaseNLPExtractor
+
+
+def main():
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--rows", type=int, default=20000)
+   parser.add_argument("--distinct", type=int, default=1000, help="số ghi chú khác nhau của cột lặp lại")
+   args = parser.parse_args()
+
+   extractor = HeartDiseaseNLPExtractor()
+   sentences = DENSE_SENTENCES + SPARSE_SENTENCES
+   distinct = [make_note(sentences[i % len(sentences):] + sentences, i % 20 + 1) + f" Mã {i}."
+               for i in range(min(args.distinct, args.rows))]
+   columns = {
+      f"{len(distinct)} distinct": pd.Series([distinct[i % len(distinct)] for i in range(args.rows)]),
+      "all distinct": pd.Series([make_note(sentences[i % len(sentences):] + sentences, i % 20 + 1) + f" Mã {i}."
+                                 for i in range(args.rows)])
+   }
+
+   print(f"{'':>14} {'':>14} {'rows/s':>10}")
+   for name, notes in columns.items():
+      start = time.perf_counter()
+      expected = pd.DataFrame(
+         notes.apply(lambda text: extractor.extract_all_features(text)[0]).tolist(), index=notes.index
+      )[FEATURE_ORDER]
+      apply_time = time.perf_counter() - start
+
+      start = time.perf_counter()
+      frame = extractor.extract_frame(notes)
+      frame_time = time.perf_counter() - start
+
+      assert frame.equals(expected.astype(frame.dtypes.to_dict())), "extract_frame khác extract_all_features"
+      print(f"{name:>14} {'apply':>14} {args.rows / apply_time:>10.0f}")
+      print(f"{'':>14} {'extract_frame':>14} {args.rows / frame_time:>10.0f}  ({apply_time / frame_time:.2f}x)")
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,317 @@
+"""
+Thu gọn RandomForest đã train: đổi số cây và độ sâu lấy thời gian dự đoán.
+
+GridSearch có thể chọn 200 cây không giới hạn độ sâu: file model lớn, mỗi lần
+dự đoán phải đi qua mọi cây. Lệnh này thử các model nhỏ hơn:
+- chọn cây tham lam: thêm lần lượt cây làm trung bình của các cây đã chọn gần
+  xác suất của cả forest nhất (sai số bình phương trên tập train), nên tập test
+  không tham gia việc chọn;
+- giới hạn độ sâu (tùy chọn): node ở độ sâu max_depth thành lá, giữ phân bố lớp
+  của nó; cây được dựng lại nên file model nhỏ đi thật.
+Với mỗi điểm (số cây, độ sâu) tính ROC AUC, F1 trên tập test (split_dataset của
+train_model.py), kích thước forest (pickle), số node và thời gian dự đoán một
+hàng như /predict (compiled_forest, trung vị). Lưu bảng và biểu đồ frontier
+(điểm không bị điểm nào khác vừa nhanh / nhỏ hơn vừa có AUC cao hơn) vào --output-dir,
+rồi ghi model đã thu gọn tại điểm chọn bằng --choose hoặc --slo-ms (thông tin
+giải thích và cascade được tính lại cho model mới).
+
+Chạy từ thư mục model/:
+   python compaction.py --slo-ms 0.1
+   python compaction.py --choose 50 10 --output heart_disease_model_compact.pkl
+Đổi tên file kết quả thành heart_disease_model.pkl để server dùng (các bản
+compile tự dựng lại theo hash của file model).
+"""
+import argparse
+import copy
+import csv
+import os
+import pickle
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _node_depths(tree) -> np.ndarray:
+   """Độ sâu của từng node (gốc: 0); node cha luôn đứng trước node con"""
+   depth = np.zeros(tree.node_count, dtype=np.intp)
+   for node in range(tree.node_count):
+      if tree.children_left[node] != -1:
+         depth[tree.children_left[node]] = depth[tree.children_right[node]] = depth[node] + 1
+   return depth
+
+
+def cap_depth(estimator, max_depth: Optional[int]):
+   """Bản sao của DecisionTreeClassifier đã fit với các node sâu hơn max_depth bị cắt"""
+   from sklearn.tree._tree import Tree
+
+   tree = estimator.tree_
+   if max_depth is None or tree.max_depth <= max_depth:
+      return estimator
+   state = tree.__getstate__()
+   depth = _node_depths(tree)
+   keep = depth <= max_depth
+   index = np.cumsum(keep) - 1
+   nodes = state['nodes'][keep].copy()
+   internal = nodes['left_child'] != -1
+   # Node trong ở độ sâu max_depth thành lá (quy ước lá của sklearn)
+   cut = internal & (depth[keep] == max_depth)
+   nodes['left_child'][cut] = nodes['right_child'][cut] = -1
+   nodes['feature'][cut] = -2
+   nodes['threshold'][cut] = -2.0
+   internal &= ~cut
+   nodes['left_child'][internal] = index[nodes['left_child'][internal]]
+   nodes['right_child'][internal] = index[nodes['right_child'][internal]]
+
+   capped = Tree(tree.n_features, np.asarray(tree.n_classes, dtype=np.intp), tree.n_outputs)
+   capped.__setstate__({'max_depth': max_depth, 'node_count': len(nodes), 'nodes': nodes,
+                        'values': state['values'][keep]})
+   estimator = copy.copy(estimator)
+   estimator.tree_ = capped
+   estimator.max_depth = max_depth
+   return estimator
+
+
+def greedy_tree_order(proba: np.ndarray, target: np.ndarray, n_trees: int) -> List[int]:
+   """
+   n_trees cây chọn tham lam: mỗi bước thêm cây làm trung bình các cột đã chọn
+   của proba (n hàng, số cây) gần target nhất; k cây đầu là tập k cây
+   """
+   chosen: List[int] = []
+   total = np.zeros(proba.shape[0])
+   available = np.ones(proba.shape[1], dtype=bool)
+   for k in range(1, n_trees + 1):
+      error = (((total[:, None] + proba) / k - target[:, None]) ** 2).mean(axis=0)
+      error[~available] = np.inf
+      best = int(np.argmin(error))
+      chosen.append(best)
+      total += proba[:, best]
+      available[best] = False
+   return chosen
+
+
+def compact_forest(forest, trees: Sequence[int], max_depth: Optional[int] = None):
+   """Bản sao của forest chỉ gồm các cây trees (theo thứ tự đó), độ sâu tối đa max_depth"""
+   compact = copy.copy(forest)
+   compact.estimators_ = [cap_depth(forest.estimators_[i], max_depth) for i in trees]
+   compact.n_estimators = len(trees)
+   if max_depth is not None and (forest.max_depth is None or forest.max_depth > max_depth):
+      compact.max_depth = max_depth
+   return compact
+
+
+def compact_pipeline(model, X_fit, n_trees: int, max_depth: Optional[int] = None):
+   """
+   Bản sao của pipeline với forest thu gọn như evaluate_grid: n_trees cây chọn
+   tham lam trên X_fit (DataFrame các feature gốc), độ sâu tối đa max_depth
+   """
+   preprocessor = model.named_steps['preprocessor']
+   forest = model.named_steps['classifier']
+   X = preprocessor.transform(X_fit)
+   X = X.toarray() if hasattr(X, 'toarray') else np.asarray(X)
+   capped = [cap_depth(estimator, max_depth) for estimator in forest.estimators_]
+   proba = np.column_stack([estimator.predict_proba(X)[:, -1] for estimator in capped])
+   order = greedy_tree_order(proba, forest.predict_proba(X)[:, -1], min(n_trees, len(capped)))
+   compact = copy.deepcopy(model)
+   compact.steps[-1] = ('classifier', compact_forest(forest, order, max_depth))
+   return compact
+
+
+def single_row_latency(classifier, X: np.ndarray, calls: int, repeat: int = 3) -> float:
+   """
+   Thời gian (giây) dự đoán một hàng bằng bản compile như /predict: trung vị
+   của calls lần, lấy lần nhỏ nhất trong repeat lượt
+   """
+   from compiled_forest import compile_forest
+
+   compiled = compile_forest(classifier)
+   rows = np.random.default_rng(0).integers(0, len(X), calls)
+   best = float("inf")
+   for _ in range(repeat):
+      times = []
+      for i in rows:
+         start = time.perf_counter()
+         compiled.predict_proba(X[i:i + 1])
+         times.append(time.perf_counter() - start)
+      best = min(best, float(np.median(times)))
+   return best
+
+
+def _pareto(points: List[Dict[str, Any]], cost: str) -> List[bool]:
+   """Điểm không bị điểm nào khác vừa có cost nhỏ hơn (hoặc bằng) vừa có AUC cao hơn (hoặc bằng)"""
+   return [
+      not any(other[cost] <= point[cost] and other['auc'] >= point['auc']
+              and (other[cost] < point[cost] or other['auc'] > point['auc']) for other in points)
+      for point in points
+   ]
+
+
+def evaluate_grid(model, X_train, X_test, y_test, tree_counts: Sequence[int],
+                  depths: Sequence[Optional[int]], calls: int = 300) -> List[Dict[str, Any]]:
+   """Các điểm (số cây, độ sâu) cùng AUC, F1, kích thước và thời gian; 'trees': các cây đã chọn"""
+   from sklearn.metrics import f1_score, roc_auc_score
+
+   preprocessor = model.named_steps['preprocessor']
+   forest = model.named_steps['classifier']
+   dense = lambda X: X.toarray() if hasattr(X, 'toarray') else np.asarray(X)
+   X_fit, X_eval = dense(preprocessor.transform(X_train)), dense(preprocessor.transform(X_test))
+   target = forest.predict_proba(X_fit)[:, -1]
+   tree_counts = sorted({min(n, len(forest.estimators_)) for n in tree_counts})
+
+   points = []
+   for max_depth in depths:
+      capped = [cap_depth(estimator, max_depth) for estimator in forest.estimators_]
+      proba = np.column_stack([estimator.predict_proba(X_fit)[:, -1] for estimator in capped])
+      order = greedy_tree_order(proba, target, tree_counts[-1])
+      for n_trees in tree_counts:
+         compact = compact_forest(forest, order[:n_trees], max_depth)
+         p_test = compact.predict_proba(X_eval)[:, -1]
+         points.append({
+            'n_trees': n_trees,
+            'max_depth': max_depth,
+            'auc': float(roc_auc_score(y_test, p_test)),
+            'f1': float(f1_score(y_test, compact.classes_[np.argmax(compact.predict_proba(X_eval), axis=1)])),
+            'size_kb': len(pickle.dumps(compact, protocol=pickle.HIGHEST_PROTOCOL)) / 1024,
+            'nodes': int(sum(estimator.tree_.node_count for estimator in compact.estimators_)),
+            'latency_ms': single_row_latency(compact, X_eval, calls) * 1e3,
+            'trees': order[:n_trees]
+         })
+
+   for point, by_latency, by_size in zip(points, _pareto(points, 'latency_ms'), _pareto(points, 'size_kb')):
+      point['frontier'] = by_latency
+      point['size_frontier'] = by_size
+   return points
+
+
+def save_frontier(points: List[Dict[str, Any]], output_dir: str) -> None:
+   """frontier.csv và frontier.png (AUC, F1 theo kích thước và theo thời gian một hàng)"""
+   import matplotlib
+   matplotlib.use("Agg")
+   import matplotlib.pyplot as plt
+
+   os.makedirs(output_dir, exist_ok=True)
+   columns = ['n_trees', 'max_depth', 'auc', 'f1', 'size_kb', 'nodes', 'latency_ms', 'frontier', 'size_frontier']
+   with open(os.path.join(output_dir, "frontier.csv"), "w", newline="") as f:
+      writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+      writer.writeheader()
+      writer.writerows(points)
+
+   fig, axes = plt.subplots(1, 2, figsize=(13, 5), sharey=True)
+   depths = sorted({point['max_depth'] for point in points}, key=lambda d: (d is None, d or 0))
+   colors = plt.cm.viridis(np.linspace(0, 0.9, len(depths)))
+   for ax, x, flag, label in ((axes[0], 'size_kb', 'size_frontier', 'Kích thước forest (KB)'),
+                              (axes[1], 'latency_ms', 'frontier', 'Thời gian một hàng (ms)')):
+      frontier = sorted((point for point in points if point[flag]), key=lambda point: point[x])
+      for max_depth, color in zip(depths, colors):
+         group = [point for point in points if point['max_depth'] == max_depth]
+         name = f"depth {max_depth if max_depth is not None else 'gốc'}"
+         ax.scatter([p[x] for p in group], [p['auc'] for p in group], color=color, marker='o', label=f"AUC, {name}")
+         ax.scatter([p[x] for p in group], [p['f1'] for p in group], color=color, marker='x', label=f"F1, {name}")
+      ax.plot([p[x] for p in frontier], [p['auc'] for p in frontier], 'k--', lw=1, label='Frontier (AUC)')
+      ax.set_xscale('log')
+      ax.set_xlabel(label)
+      ax.grid(alpha=0.3)
+   axes[0].set_ylabel('Điểm trên tập test')
+   axes[1].legend(loc='lower right', fontsize=7, ncol=2)
+   fig.suptitle('Thu gọn Random Forest: độ chính xác theo kích thước và thời gian')
+   fig.tight_layout()
+   fig.savefig(os.path.join(output_dir, "frontier.png"), dpi=150)
+   plt.close(fig)
+
+
+def choose_point(points: List[Dict[str, Any]], choose=None, slo_ms: Optional[float] = None) -> Optional[Dict[str, Any]]:
+   """Điểm (n_trees, max_depth) trong choose, hoặc điểm AUC cao nhất trong SLO (ít node nhất nếu bằng)"""
+   if choose is not None:
+      n_trees, max_depth = choose
+      matches = [p for p in points if p['n_trees'] == n_trees and p['max_depth'] == max_depth]
+      if not matches:
+         raise ValueError(f"no point with {n_trees} trees and max_depth {max_depth} in the grid")
+      return matches[0]
+   if slo_ms is None:
+      return None
+   within = [p for p in points if p['latency_ms'] <= slo_ms]
+   if not within:
+      raise ValueError(f"no point within {slo_ms} ms")
+   return max(within, key=lambda p: (p['auc'], -p['nodes']))
+
+
+def _depth(value: str) -> Optional[int]:
+   return None if value.lower() == "none" else int(value)
+
+
+if __name__ == "__main__":
+   import joblib
+
+   sys.path.insert(0, os.path.join(BASE_DIR, "api"))
+   from sklearn.base import clone
+
+   from distillation import build_cascade, print_report
+   from explanation_metadata import build_explanation
+   from train_model import load_and_preprocess_data, split_dataset
+
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("--model", default=os.path.join(BASE_DIR, "heart_disease_model.pkl"), help="file model đã train")
+   parser.add_argument("--trees", type=int, nargs="+", default=[5, 10, 20, 50, 100, 200], help="các số cây thử")
+   parser.add_argument("--depths", type=_depth, nargs="+", default=[None, 12, 10, 8, 6],
+                       help="các độ sâu tối đa thử (none: giữ nguyên)")
+   parser.add_argument("--calls", type=int, default=300, help="số lần đo thời gian một hàng mỗi điểm")
+   parser.add_argument("--output-dir", default=os.path.join(BASE_DIR, "compaction"), help="thư mục lưu frontier.csv và frontier.png")
+   parser.add_argument("--choose", nargs=2, metavar=("TREES", "DEPTH"), help="điểm ghi ra (DEPTH: none để giữ nguyên)")
+   parser.add_argument("--slo-ms", type=float, help="chọn điểm AUC cao nhất có thời gian một hàng không quá giá trị này")
+   parser.add_argument("--output", default=os.path.join(BASE_DIR, "heart_disease_model_compact.pkl"),
+                       help="file model thu gọn")
+   args = parser.parse_args()
+
+   model_data = joblib.load(args.model)
+   model = model_data['model']
+   df = load_and_preprocess_data()[0]
+   X_train, X_test, y_train, y_test = split_dataset(df)
+
+   points = evaluate_grid(model, X_train, X_test, y_test, args.trees, args.depths, args.calls)
+   save_frontier(points, args.output_dir)
+   print(f"\n{'trees':>6} {'depth':>6} {'AUC':>7} {'F1':>7} {'KB':>9} {'nodes':>8} {'ms/row':>8}")
+   for point in points:
+      print(f"{point['n_trees']:>6} {str(point['max_depth']):>6} {point['auc']:>7.4f} {point['f1']:>7.4f} "
+            f"{point['size_kb']:>9.0f} {point['nodes']:>8} {point['latency_ms']:>8.3f}"
+            f"{'  *' if point['frontier'] else ''}")
+   print(f"(* frontier theo thời gian) Saved {os.path.join(args.output_dir, 'frontier.csv')} and frontier.png")
+
+   choose = (int(args.choose[0]), _depth(args.choose[1])) if args.choose else None
+   try:
+      point = choose_point(points, choose, args.slo_ms)
+   except ValueError as e:
+      print("Cannot choose a compacted model:", e)
+      sys.exit(1)
+   if point is None:
+      sys.exit(0)
+
+   forest = model.named_steps['classifier']
+   full = next((p for p in points if p['n_trees'] == len(forest.estimators_) and p['max_depth'] is None), None)
+   compact_model = copy.deepcopy(model)
+   compact_model.steps[-1] = ('classifier', compact_forest(forest, point['trees'], point['max_depth']))
+
+   compact_data = dict(model_data)
+   compact_data['model'] = compact_model
+   compact_data['compaction'] = {
+      'n_trees': point['n_trees'],
+      'max_depth': point['max_depth'],
+      'auc': point['auc'],
+      'f1': point['f1'],
+      'latency_ms': point['latency_ms'],
+      'full': None if full is None else {key: full[key] for key in ('auc', 'f1', 'latency_ms')}
+   }
+   print("\nĐang tính lại thông tin giải thích cho model thu gọn...")
+   compact_data['explanation'] = build_explanation(compact_model, X_test, y_test)
+   if 'cascade' in model_data:
+      # Mỗi fold hiệu chỉnh: train lại pipeline đầy đủ rồi thu gọn như trên
+      refit = lambda X, y: compact_pipeline(clone(model).fit(X, y), X, point['n_trees'], point['max_depth'])
+      compact_data['cascade'] = build_cascade(compact_model, X_train, y_train, X_test, refit=refit)
+      print_report(compact_data['cascade'])
+   joblib.dump(compact_data, args.output)
+   print(f"Wrote {args.output}: {point['n_trees']} trees, max_depth {point['max_depth']}, "
+         f"AUC {point['auc']:.4f}, F1 {point['f1']:.4f}, {point['latency_ms']:.3f} ms/row"
+         + ("" if full is None else f" (full forest: AUC {full['auc']:.4f}, F1 {full['f1']:.4f}, "
+                                    f"{full['latency_ms']:.3f} ms/row)"))
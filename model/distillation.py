@@ -0,0 +1,175 @@
+"""
+Model chưng cất cho cascade lúc dự đoán, tính lúc train và lưu trong
+heart_disease_model.pkl (khóa 'cascade') cạnh forest:
+- coef, intercept: hồi quy logistic trên đầu ra của bước tiền xử lý, fit theo
+  xác suất có bệnh của forest (nhãn mềm: mỗi hàng hai lần, trọng số p và 1 - p);
+- low, high: dải bất định; hàng có xác suất chưng cất trong [low, high] mới cần
+  forest. Dải hẹp nhất sao cho các hàng ngoài dải có cùng lớp dự đoán và cùng
+  mức nguy cơ (RISK_THRESHOLDS) với forest ở ít nhất target_agreement số hàng,
+  tính trên xác suất ngoài fold của tập train: mỗi fold, pipeline (cùng tham số)
+  và model chưng cất được train lại trên các fold còn lại rồi chấm fold đó;
+- report: tỉ lệ khớp với forest và tỉ lệ hàng đi đường nhanh trên tập test,
+  không tham gia việc chọn dải.
+Server đọc bằng api/cascade.py (bật bằng PREDICT_CASCADE=1).
+
+Thêm cascade vào file model đã train (không chạy lại GridSearch), chạy từ thư
+mục model/:
+   python distillation.py [model.pkl] [--target-agreement 0.99]
+"""
+from typing import Any, Dict
+
+import numpy as np
+
+# Tăng khi cấu trúc thay đổi (cùng giá trị với api/cascade.py)
+CASCADE_VERSION = 1
+# Ngưỡng mức nguy cơ của /predict (routes/predict.py): Thấp / cần theo dõi / Trung bình / Cao
+RISK_THRESHOLDS = (0.3, 0.5, 0.75)
+
+
+def _dense(X):
+   return X.toarray() if hasattr(X, 'toarray') else np.asarray(X, dtype=np.float64)
+
+
+def _agreement(p_fast, p_full):
+   """Hàng mà hai xác suất có bệnh cho cùng lớp (như argmax) và cùng mức nguy cơ"""
+   return ((p_fast > 0.5) == (p_full > 0.5)) & (
+      np.digitize(p_fast, RISK_THRESHOLDS) == np.digitize(p_full, RISK_THRESHOLDS))
+
+
+def uncertainty_band(p_fast, agree, target_agreement: float):
+   """
+   Dải [low, high] hẹp nhất (nhiều hàng ngoài dải nhất) mà tỉ lệ agree trên các
+   hàng ngoài dải đạt target_agreement; (0.0, 1.0) nếu không có dải nào đạt
+   """
+   order = np.argsort(p_fast, kind='stable')
+   p, agree = p_fast[order], agree[order]
+   n = len(p)
+   # Ranh giới chỉ nằm giữa hai giá trị khác nhau; hàng [0, i) dưới dải, [j, n) trên dải
+   cuts = np.r_[0, np.flatnonzero(np.diff(p) > 0) + 1, n]
+   agreed_before = np.r_[0, np.cumsum(agree)][cuts]
+   fast = cuts[:, None] + (n - cuts[None, :])
+   agreed = agreed_before[:, None] + (agreed_before[-1] - agreed_before[None, :])
+   valid = (cuts[:, None] <= cuts[None, :]) & (agreed >= target_agreement * fast)
+   # Nhiều hàng ngoài dải nhất, rồi khớp nhiều nhất
+   score = np.where(valid, fast * (n + 1) + agreed, -1)
+   i, j = np.unravel_index(np.argmax(score), score.shape)
+   if score[i, j] <= 0:
+      return 0.0, 1.0
+   i, j = cuts[i], cuts[j]
+   low = 0.0 if i == 0 else float((p[i - 1] + p[i]) / 2)
+   high = 1.0 if j == n else float((p[j - 1] + p[j]) / 2)
+   return low, high
+
+
+def _fit_student(model, X_fit, C: float):
+   """Hồi quy logistic fit theo xác suất của forest trên X_fit (đầu ra của bước tiền xử lý)"""
+   from sklearn.linear_model import LogisticRegression
+
+   X = _dense(model.named_steps['preprocessor'].transform(X_fit))
+   p = model.named_steps['classifier'].predict_proba(X)[:, -1]
+   student = LogisticRegression(C=C, max_iter=1000)
+   student.fit(np.vstack([X, X]), np.r_[np.ones(len(X)), np.zeros(len(X))], sample_weight=np.r_[p, 1.0 - p])
+   return student
+
+
+def _scores(model, student, X_rows):
+   """(xác suất chưng cất, xác suất forest) của các hàng"""
+   X = _dense(model.named_steps['preprocessor'].transform(X_rows))
+   return student.predict_proba(X)[:, -1], model.named_steps['classifier'].predict_proba(X)[:, -1]
+
+
+def out_of_fold_scores(model, X_fit, y_fit, folds: int = 5, C: float = 1.0, refit=None):
+   """
+   (xác suất chưng cất, xác suất forest) ngoài fold trên tập train: pipeline và
+   model chưng cất train lại trên các fold còn lại, như chúng sẽ chấm các hàng
+   chưa thấy
+
+   Args:
+      refit: refit(X, y) -> pipeline đã train trên X, y; mặc định clone(model) cùng tham số
+   """
+   from sklearn.base import clone
+   from sklearn.model_selection import StratifiedKFold
+
+   refit = refit or (lambda X, y: clone(model).fit(X, y))
+   p_fast = np.empty(len(X_fit))
+   p_full = np.empty(len(X_fit))
+   for fit_rows, held_rows in StratifiedKFold(folds, shuffle=True, random_state=42).split(X_fit, y_fit):
+      fold_model = refit(X_fit.iloc[fit_rows], y_fit.iloc[fit_rows])
+      student = _fit_student(fold_model, X_fit.iloc[fit_rows], C)
+      p_fast[held_rows], p_full[held_rows] = _scores(fold_model, student, X_fit.iloc[held_rows])
+   return p_fast, p_full
+
+
+def build_cascade(model, X_fit, y_fit, X_report, target_agreement: float = 0.99, C: float = 1.0,
+                  folds: int = 5, refit=None) -> Dict[str, Any]:
+   """
+   Model chưng cất và dải bất định của pipeline đã train
+
+   Args:
+      model: pipeline có các bước 'preprocessor' và 'classifier'
+      X_fit, y_fit: DataFrame các feature gốc và nhãn của tập train: fit model
+         chưng cất và chọn dải (xác suất ngoài fold, train lại pipeline folds lần)
+      X_report: DataFrame các feature gốc để báo cáo (tập test, không dùng để chọn dải)
+      target_agreement: tỉ lệ khớp tối thiểu với forest trên các hàng đi đường nhanh
+      C: nghịch đảo độ mạnh regularization của hồi quy logistic
+      refit: cách train lại pipeline cho từng fold (xem out_of_fold_scores)
+   """
+   student = _fit_student(model, X_fit, C)
+
+   p_fast, p_full = out_of_fold_scores(model, X_fit, y_fit, folds, C, refit)
+   low, high = uncertainty_band(p_fast, _agreement(p_fast, p_full), target_agreement)
+
+   p_fast, p_full = _scores(model, student, X_report)
+   agree = _agreement(p_fast, p_full)
+   served = (p_fast < low) | (p_fast > high)
+
+   return {
+      'version': CASCADE_VERSION,
+      'coef': student.coef_[0].astype(np.float64),
+      'intercept': float(student.intercept_[0]),
+      'low': low,
+      'high': high,
+      'report': {
+         'target_agreement': target_agreement,
+         'calibration_rows': int(len(X_fit)),
+         'report_rows': int(len(X_report)),
+         # Model chưng cất một mình (không có forest)
+         'agreement': float(agree.mean()),
+         'class_agreement': float(((p_fast > 0.5) == (p_full > 0.5)).mean()),
+         # Phần đi đường nhanh và độ khớp của nó (phần còn lại do forest chấm)
+         'fast_fraction': float(served.mean()),
+         'fast_agreement': float(agree[served].mean()) if served.any() else 1.0
+      }
+   }
+
+
+def print_report(cascade: Dict[str, Any]) -> None:
+   report = cascade['report']
+   print(f"Uncertainty band: [{cascade['low']:.4f}, {cascade['high']:.4f}] "
+         f"(target agreement {report['target_agreement']:.2%} on {report['calibration_rows']} out-of-fold train rows)")
+   print(f"On {report['report_rows']} held-out test rows:")
+   print(f"Distilled model alone: agreement {report['agreement']:.2%} (class {report['class_agreement']:.2%})")
+   print(f"Fast path: {report['fast_fraction']:.2%} of rows, agreement {report['fast_agreement']:.2%}")
+
+
+if __name__ == "__main__":
+   import argparse
+   import os
+
+   import joblib
+
+   from train_model import load_and_preprocess_data, split_dataset
+
+   parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+   parser.add_argument("model_path", nargs="?",
+                       default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "heart_disease_model.pkl"))
+   parser.add_argument("--target-agreement", type=float, default=0.99)
+   args = parser.parse_args()
+
+   model_data = joblib.load(args.model_path)
+   df = load_and_preprocess_data()[0]
+   X_train, X_test, y_train, _ = split_dataset(df)
+   model_data['cascade'] = build_cascade(model_data['model'], X_train, y_train, X_test, args.target_agreement)
+   print_report(model_data['cascade'])
+   joblib.dump(model_data, args.model_path)
+   print(f"Cascade saved to {args.model_path}")
@@ -0,0 +1,114 @@
+"""
+Thông tin giải thích model, tính một lần lúc train và lưu trong
+heart_disease_model.pkl (khóa 'explanation') thay vì tính lại mỗi request:
+- feature_names: tên các cột sau bước tiền xử lý ('Age', 'ChestPainType_ATA'...);
+- feature_groups: feature gốc -> các cột sau tiền xử lý của nó, lấy từ cấu trúc
+  ColumnTransformer (tách tên theo '_' sai với 'ST_Slope_Up');
+- importances: feature_importances_ của từng cột kèm feature gốc, giảm dần;
+- grouped_importances: tổng importance theo feature gốc, giảm dần;
+- permutation_importances: ROC AUC trên tập test giảm bao nhiêu khi xáo trộn
+  từng feature gốc (mean / std qua n_repeats lần, chạy song song);
+- top_features: các cột quan trọng nhất ở dạng api.py trả về.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+# Tăng khi cấu trúc metadata thay đổi (model cũ được tính lại lúc nạp)
+EXPLANATION_VERSION = 1
+TOP_FEATURES = 5
+
+
+def feature_groups(preprocessor) -> Tuple[List[str], Dict[str, List[str]]]:
+   """
+   Tên các cột đầu ra của ColumnTransformer đã fit (theo thứ tự) và nhóm của
+   chúng theo feature gốc; cột không qua OneHotEncoder giữ tên gốc
+   """
+   from sklearn.preprocessing import OneHotEncoder
+
+   names, groups = [], {}
+   for name, transformer, columns in preprocessor.transformers_:
+      output = preprocessor.output_indices_.get(name)
+      if transformer == 'drop' or output is None or output.stop == output.start:
+         continue
+      columns = [preprocessor.feature_names_in_[c] if not isinstance(c, str) else c for c in columns]
+      steps = [step for _, step in transformer.steps] if hasattr(transformer, 'steps') else [transformer]
+      encoder = steps[-1] if isinstance(steps[-1], OneHotEncoder) else None
+      if encoder is None:
+         for column in columns:
+            names.append(column)
+            groups.setdefault(column, []).append(column)
+         continue
+      encoded = list(encoder.get_feature_names_out(columns))
+      start = 0
+      for column, categories in zip(columns, encoder.categories_):
+         group = encoded[start:start + len(categories)]
+         names.extend(group)
+         groups.setdefault(column, []).extend(group)
+         start += len(categories)
+   return names, groups
+
+
+def build_explanation(model, X=None, y=None, n_repeats: int = 10, n_jobs: Optional[int] = -1,
+                      random_state: int = 42) -> Dict[str, Any]:
+   """
+   Metadata giải thích của pipeline đã train
+
+   Args:
+      model: pipeline có các bước 'preprocessor' và 'classifier'
+      X, y: tập đánh giá (DataFrame các feature gốc) cho permutation importance;
+         None thì bỏ qua phần này
+      n_jobs: số process tính permutation importance (-1: mọi CPU)
+   """
+   names, groups = feature_groups(model.named_steps['preprocessor'])
+   base_feature = {column: feature for feature, columns in groups.items() for column in columns}
+   explanation = {
+      'version': EXPLANATION_VERSION,
+      'feature_names': names,
+      'feature_groups': groups,
+      'importances': [],
+      'grouped_importances': {},
+      'permutation_importances': None,
+      'top_features': []
+   }
+
+   importances = getattr(model.named_steps['classifier'], 'feature_importances_', None)
+   if importances is not None:
+      ranked = sorted(zip(names, map(float, importances)), key=lambda item: item[1], reverse=True)
+      explanation['importances'] = [
+         {'name': column, 'feature': base_feature[column], 'importance': importance}
+         for column, importance in ranked
+      ]
+      grouped = {feature: sum(importance for column, importance in ranked if base_feature[column] == feature)
+                 for feature in groups}
+      explanation['grouped_importances'] = dict(sorted(grouped.items(), key=lambda item: item[1], reverse=True))
+      explanation['top_features'] = [_readable(column, base_feature[column], importance)
+                                     for column, importance in ranked[:TOP_FEATURES]]
+
+   if X is not None and y is not None:
+      from sklearn.inspection import permutation_importance
+      result = permutation_importance(model, X, y, scoring='roc_auc', n_repeats=n_repeats,
+                                      n_jobs=n_jobs, random_state=random_state)
+      ranked = sorted(zip(X.columns, result.importances_mean, result.importances_std),
+                      key=lambda item: item[1], reverse=True)
+      explanation['permutation_importances'] = {
+         column: {'mean': float(mean), 'std': float(std)} for column, mean, std in ranked
+      }
+
+   return explanation
+
+
+def _readable(column: str, feature: str, importance: float) -> Dict[str, Any]:
+   """Một phần tử của top_features: cột one-hot được ghi về feature gốc kèm tên cột"""
+   if column == feature:
+      return {'feature': feature, 'importance': round(importance, 4)}
+   return {'feature': feature, 'importance': round(importance, 4), 'detail': column}
+
+
+def load_explanation(model_data: Dict[str, Any]) -> Dict[str, Any]:
+   """
+   Metadata lưu lúc train; file model cũ chưa có (hoặc khác phiên bản) thì tính
+   một lần lúc nạp, không có permutation importance (cần tập test)
+   """
+   explanation = model_data.get('explanation')
+   if explanation is None or explanation.get('version') != EXPLANATION_VERSION:
+      explanation = build_explanation(model_data['model'])
+   return explanation
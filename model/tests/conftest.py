@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Các module của server import nhau theo tên (chạy từ model/api), script train từ model/
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "api"))
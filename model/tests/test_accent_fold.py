@@ -0,0 +1,39 @@
+import pytest
+
+from accent_fold import contains
+from nlp_processor import HeartDiseaseNLPExtractor
+
+
+@pytest.fixture(scope="module")
+def extractor():
+   return HeartDiseaseNLPExtractor()
+
+
+@pytest.mark.parametrize("text, word, expected", [
+   ("dau nguc", "đau ngực", True),
+   ("đau nguc", "đau ngực", True),
+   ("nặng", "nặng", True),
+   ("nang", "nặng", False),
+   ("năng", "nặng", False),
+   ("du doi", "dữ dội", False),
+   ("nam", "năm", False),
+   ("năm", "nam", False),
+])
+def test_contains(text, word, expected):
+   assert contains(text, word) == expected
+
+
+@pytest.mark.parametrize("text", ["chuc nang than binh thuong", "chức năng thận bình thường"])
+def test_function_is_not_severity(extractor, text):
+   features, _ = extractor.extract_all_features(text)
+   assert features['Oldpeak'] == 0.0 and 'Oldpeak' not in extractor.found_features(text)
+
+
+def test_severity_with_accents(extractor):
+   assert extractor.extract_all_features("đau ngực nặng")[0]['Oldpeak'] == 2.0
+
+
+def test_nam_and_nam_are_not_confused(extractor):
+   # 'năm' (số năm) không phải 'nam' (giới tính), 'nam' không phải đơn vị tuổi
+   assert 'Sex' not in extractor.found_features("hút thuốc 20 năm")
+   assert 'Age' not in extractor.found_features("bệnh nhân 45 nam")
@@ -0,0 +1,63 @@
+import pytest
+
+from app import app
+from nlp_processor import MAX_TEXT_CHARS
+from routes import analyze_stream
+from services.stream_service import analyze_sessions
+
+
+@pytest.fixture
+def client():
+   return app.test_client()
+
+
+@pytest.fixture
+def session_id(client):
+   return client.post("/analyze/stream", json={"symptoms": "đau ngực"}).get_json()["session_id"]
+
+
+@pytest.mark.parametrize("body", [
+   [1, 2],
+   "đau ngực",
+   {"edit": "đau ngực"},
+   {"edit": 3},
+   {"edit": [0, 0, "x"]},
+   {"edit": {"offset": "đầu"}},
+   {"edit": {"offset": 0, "insert": 5}},
+   {"edit": {"offset": 100}},
+   {"symptoms": ["đau ngực"]}
+])
+def test_malformed_update_is_rejected(client, session_id, body):
+   response = client.post(f"/analyze/stream/{session_id}", json=body)
+   assert response.status_code == 400
+   assert "error" in response.get_json()
+
+
+@pytest.mark.parametrize("body", [[1, 2], {"edit": "đau ngực"}])
+def test_malformed_create_is_rejected(client, body):
+   assert client.post("/analyze/stream", json=body).status_code == 400
+
+
+def test_edit_keeps_session_usable(client, session_id):
+   assert client.post(f"/analyze/stream/{session_id}", json={"edit": "x"}).status_code == 400
+   response = client.post(f"/analyze/stream/{session_id}", json={"edit": {"offset": 8, "insert": ", khó thở"}})
+   assert response.status_code == 200
+   assert response.get_json()["text_length"] == len("đau ngực, khó thở")
+
+
+@pytest.mark.parametrize("body, status", [([1, 2], 400), ({"symptoms": "x" * (MAX_TEXT_CHARS + 1)}, 413)])
+def test_rejected_create_leaves_no_session(client, body, status):
+   before = analyze_sessions.stats()["entries"]
+   assert client.post("/analyze/stream", json=body).status_code == status
+   assert analyze_sessions.stats()["entries"] == before
+
+
+def test_events_close_when_session_is_gone(client, session_id, monkeypatch):
+   monkeypatch.setattr(analyze_stream, "HEARTBEAT_SECONDS", 0.01)
+   response = client.get(f"/analyze/stream/{session_id}/events", buffered=False)
+   chunks = response.response
+   assert next(chunks).startswith(b"event: snapshot")
+   analyze_sessions.pop(session_id)
+   # Nhịp tiếp theo thấy phiên đã mất và đóng kết nối
+   assert b"".join(chunks) in (b"", b": heartbeat\n\n")
+   response.close()
@@ -0,0 +1,35 @@
+import pytest
+
+from extraction_profiler import DEFAULT, MATCH, NO_MATCH
+from nlp_processor import HeartDiseaseNLPExtractor
+
+
+@pytest.fixture
+def outcomes():
+   extractor = HeartDiseaseNLPExtractor()
+   extractor.enable_profiling()
+
+   def run(text):
+      extractor.profiler.reset()
+      extractor.extract_all_features(text)
+      snapshot = extractor.profiling_snapshot()['extractors']
+      return {name: next(o for o, n in stats['outcomes'].items() if n)
+              for name, stats in snapshot.items() if any(stats['outcomes'].values())}
+
+   yield run
+   extractor.disable_profiling()
+
+
+def test_fallback_values_are_not_matches(outcomes):
+   # ChestPainType 3, ST_Slope 1, ExerciseAngina 0, MaxHR theo tuổi, Oldpeak 0.0 đều là giá trị dự phòng
+   assert set(outcomes("hello").values()) == {NO_MATCH}
+
+
+def test_outcomes_follow_evidence(outcomes):
+   result = outcomes("nam 58 tuổi, đau ngực khi gắng sức, nhịp tim 150, st dốc lên, oldpeak 0")
+   assert result['_extract_age'] == MATCH and result['_extract_gender'] == MATCH
+   assert result['_extract_chest_pain_type'] == MATCH and result['_extract_exercise_angina'] == MATCH
+   assert result['_extract_max_hr'] == MATCH
+   # Ghi rõ nhưng giá trị 0 (Up) / 0.0 bị thay bằng default_values
+   assert result['_extract_st_slope'] == DEFAULT and result['_extract_oldpeak'] == DEFAULT
+   assert result['_extract_cholesterol'] == NO_MATCH
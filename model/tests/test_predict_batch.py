@@ -0,0 +1,52 @@
+import pytest
+
+import extensions
+from app import app
+
+# Cần heart_disease_model.pkl (xem train_model.py)
+pytestmark = pytest.mark.skipif(extensions.model is None, reason="model not trained")
+
+PATIENT = {"features": {"Age": 58, "Sex": 1, "ChestPainType": 3, "RestingBP": 150, "Cholesterol": 270,
+                        "FastingBS": 0, "RestingECG": 0, "MaxHR": 120, "ExerciseAngina": 1,
+                        "Oldpeak": 2.0, "ST_Slope": 1}}
+
+
+@pytest.fixture
+def client():
+   return app.test_client()
+
+
+def _batch(client, body):
+   response = client.post("/predict_batch", json=body)
+   assert response.status_code == 200
+   return response.get_json()["results"]
+
+
+def test_explanation_is_opt_in(client):
+   body = {"patients": [PATIENT], "full_forest": True}
+   assert "important_factors" not in _batch(client, body)[0]
+   if extensions.explainer is not None:
+      assert "important_factors" in _batch(client, {**body, "explain": True})[0]
+   # Kết quả đã giải thích trong cache không trả phần giải thích khi không bật
+   assert "important_factors" not in _batch(client, body)[0]
+
+
+@pytest.mark.parametrize("feature, value", [
+   ('Sex', 7), ('Age', -5), ('ChestPainType', 1.5), ('Oldpeak', float('nan')), ('Cholesterol', float('inf')),
+   ('FastingBS', True), ('MaxHR', "150")
+])
+def test_invalid_structured_value_is_rejected(client, feature, value):
+   patient = {"features": {**PATIENT["features"], feature: value}}
+   results = _batch(client, {"patients": [patient, PATIENT]})
+   assert f"'{feature}'" in results[0]["error"]
+   assert "prediction" in results[1]
+
+
+def test_dataset_values_are_accepted(client):
+   # Cholesterol 0 và Oldpeak âm có trong dataset train
+   patient = {"features": {**PATIENT["features"], "Cholesterol": 0, "Oldpeak": -1.5, "ChestPainType": 0}}
+   assert "prediction" in _batch(client, [patient])[0]
+
+
+def test_non_finite_text_parameter_is_rejected(client):
+   assert "error" in _batch(client, [{"symptoms": "đau ngực", "age": float('nan')}])[0]
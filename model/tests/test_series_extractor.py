@@ -0,0 +1,69 @@
+import json
+import os
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nlp_processor import FEATURE_ORDER, HeartDiseaseNLPExtractor
+
+GOLDEN_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks", "golden_corpus.jsonl")
+
+# Mỗi cách tìm của các extractor (cue, đơn vị, số đứng riêng, từ khóa, cửa sổ gắng sức)
+# và các trường hợp khó: số Unicode, dãy có dấu '.', gõ không dấu, giá trị ngoài khoảng
+FRAGMENTS = [
+   "nam 58 tuổi", "nữ", "bệnh nhân 45 years old", "tuổi 67", "age: 39", "hút thuốc 20 năm", "1.2.63 tuổi",
+   "đau ngực", "tức ngực lan sang tay trái", "đau ngực khi nghỉ ngơi", "chest pain, sharp", "dau nguc",
+   "huyết áp 150/95", "bp 250", "blood pressure 70", "140/90 huyết áp", "huyet ap 135", "số đo 145 huyết áp",
+   "cholesterol 260 mg/dl", "mỡ máu 90", "lipid: 410", "240 mg/dl cholesterol", "kết quả 230 mỡ", "cholesterol cao",
+   "đường huyết 180", "glucose 100", "130 mg/dl đường", "tiểu đường", "diabetic",
+   "ecg bình thường", "st chênh", "dày thất trái", "lvh", "normal ecg",
+   "nhịp tim 110", "hr 40", "95 bpm", "mạch 230", "heart rate 72",
+   "đau ngực khi gắng sức", "leo cầu thang thấy tức ngực", "exercise", "climbing stairs with chest pain",
+   "oldpeak 1.5", "st depression 7.2", "2 mm st", "oldpeak 1.2.3", "0.5 mm depression", "đau dữ dội",
+   "dốc lên", "st dốc xuống", "downsloping", "flat",
+   "١٢٠ tuổi", "huyết áp ١٤٠", "ngày 12/03 phòng 204", "   ", "",
+]
+
+
+def _corpus():
+   with open(GOLDEN_CORPUS, encoding="utf-8") as f:
+      texts = [json.loads(line)["text"] for line in f if line.strip()]
+   rng = random.Random(0)
+   for _ in range(400):
+      parts = rng.sample(FRAGMENTS, rng.randint(1, 6))
+      texts.append(rng.choice([", ", ". ", " ", "; "]).join(parts))
+   return texts + [text.upper() for text in texts[:50]]
+
+
+@pytest.fixture(scope="module")
+def extractor():
+   return HeartDiseaseNLPExtractor()
+
+
+def _expected(extractor, texts):
+   rows = [extractor.extract_all_features(text if isinstance(text, str) else '')[0] for text in texts]
+   return pd.DataFrame(rows, index=texts.index)[FEATURE_ORDER]
+
+
+def test_matches_scalar_extractor(extractor):
+   texts = pd.Series(_corpus())
+   frame = extractor.extract_frame(texts)
+   expected = _expected(extractor, texts)
+   assert list(frame.columns) == FEATURE_ORDER
+   assert (frame.dtypes.drop('Oldpeak') == np.int64).all() and frame['Oldpeak'].dtype == np.float64
+   pd.testing.assert_frame_equal(frame, expected.astype(frame.dtypes.to_dict()))
+
+
+def test_keeps_index_and_treats_missing_as_empty(extractor):
+   texts = pd.Series(["nam 58 tuổi, huyết áp 150", None, np.nan, "nam 58 tuổi, huyết áp 150", "NAM 58 TUỔI"],
+                     index=[7, 7, 3, "a", 0])
+   frame = extractor.extract_frame(texts)
+   assert list(frame.index) == list(texts.index)
+   pd.testing.assert_frame_equal(frame, _expected(extractor, texts).astype(frame.dtypes.to_dict()))
+
+
+def test_empty_series(extractor):
+   frame = extractor.extract_frame(pd.Series([], dtype=object))
+   assert frame.empty and list(frame.columns) == FEATURE_ORDER
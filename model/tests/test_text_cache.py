@@ -0,0 +1,38 @@
+from utils.text_cache import TextCache
+
+
+class FakeClock:
+   def __init__(self):
+      self.now = 0.0
+
+   def __call__(self):
+      return self.now
+
+
+def test_fixed_ttl_expires_despite_use():
+   clock = FakeClock()
+   cache = TextCache(ttl=10, clock=clock)
+   cache.put("a", 1)
+   clock.now = 8
+   assert cache.get("a") == 1
+   clock.now = 12
+   assert cache.get("a") is None
+
+
+def test_sliding_ttl_is_refreshed_on_get():
+   clock = FakeClock()
+   cache = TextCache(ttl=10, clock=clock, sliding=True)
+   cache.put("a", 1)
+   for now in (8, 16, 24):
+      clock.now = now
+      assert cache.get("a") == 1
+   clock.now = 35
+   assert cache.get("a") is None
+
+
+def test_pop():
+   cache = TextCache()
+   cache.put("a", 1)
+   cache.pop("a")
+   cache.pop("missing")
+   assert cache.get("a") is None and cache.stats()["entries"] == 0
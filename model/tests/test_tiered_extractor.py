@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tiered_extractor
+from nlp_processor import HeartDiseaseNLPExtractor
+from tiered_extractor import SOURCE_DEFAULT, SOURCE_RULES, SOURCE_TIER2, TieredExtractor
+
+
+@pytest.fixture(scope="module")
+def extractor():
+   return HeartDiseaseNLPExtractor()
+
+
+@pytest.fixture
+def tiered(extractor):
+   tiered = TieredExtractor(extractor, backend="tiered_extractor:LabeledValueBackend", budget=30)
+   yield tiered
+   tiered.shutdown()
+
+
+def test_explicit_default_value_is_not_overwritten(tiered):
+   features, _, sources = tiered.extract_all_features("Nam 58 tuổi, huyết áp 120, trestbps 150, chol 250")
+   assert features['RestingBP'] == 120 and sources['RestingBP'] == SOURCE_RULES
+   assert sources['Sex'] == SOURCE_RULES
+   assert features['Cholesterol'] == 250 and sources['Cholesterol'] == SOURCE_TIER2
+
+
+def test_estimated_value_goes_to_tier2(tiered):
+   # MaxHR không ghi rõ thì tầng 1 ước tính theo tuổi (khác default_values)
+   features, _, sources = tiered.extract_all_features("58 tuổi, thalach 140")
+   assert features['MaxHR'] == 140 and sources['MaxHR'] == SOURCE_TIER2
+
+
+def test_sources_without_backend(extractor):
+   features, _, sources = TieredExtractor(extractor).extract_all_features("huyết áp 120, đau ngực")
+   assert sources['RestingBP'] == SOURCE_RULES and sources['ChestPainType'] == SOURCE_RULES
+   assert sources['Cholesterol'] == SOURCE_DEFAULT and sources['MaxHR'] == SOURCE_DEFAULT
+
+
+def test_failing_backend_is_disabled_once_under_concurrency(extractor):
+   tiered = TieredExtractor(extractor, backend="tiered_extractor:MissingBackend", budget=30)
+   try:
+      with ThreadPoolExecutor(8) as threads:
+         results = list(threads.map(lambda _: tiered.extract_all_features("chol 250"), range(32)))
+      assert all(sources['Cholesterol'] == SOURCE_DEFAULT for _, _, sources in results)
+      stats = tiered.stats()
+      assert stats['disabled'] and not stats['started']
+      assert tiered._pool_failures == tiered_extractor._MAX_POOL_FAILURES
+      calls = stats['calls']
+      tiered.extract_all_features("chol 250")
+      assert tiered.stats()['calls'] == calls
+   finally:
+      tiered.shutdown()
+
+
+def test_tier2_values_are_clamped_and_codes_checked(tiered):
+   features, _, sources = tiered.extract_all_features("nam 50 tuổi chol: 99999 exang 7 thalach 400")
+   assert features['Cholesterol'] == 400 and sources['Cholesterol'] == SOURCE_TIER2
+   assert features['MaxHR'] == 200 and sources['MaxHR'] == SOURCE_TIER2
+   assert features['ExerciseAngina'] == 0 and sources['ExerciseAngina'] == SOURCE_DEFAULT
+
+
+def test_tier2_non_finite_value_is_ignored(tiered):
+   features, _, sources = tiered.extract_all_features("nam 50 tuổi chol: " + "9" * 400 + " exang 1")
+   assert features['Cholesterol'] == 200 and sources['Cholesterol'] == SOURCE_DEFAULT
+   assert features['ExerciseAngina'] == 1 and sources['ExerciseAngina'] == SOURCE_TIER2
+
+
+@pytest.mark.parametrize("feature, value, expected", [
+   ('Age', 5, 20), ('MaxHR', 250.4, 200), ('Oldpeak', -1, 0.0), ('Sex', 0.0, 0), ('ST_Slope', 3, None),
+   ('ChestPainType', 1.5, None), ('FastingBS', 1, 1), ('RestingBP', float('nan'), None),
+   ('Cholesterol', 'abc', None), ('Unknown', 1, None)
+])
+def test_checked_value(feature, value, expected):
+   assert tiered_extractor._checked_value(feature, value) == expected
@@ -3,6 +3,8 @@ import pandas as pd
 import numpy as np
 import warnings
 from evaluation_plots import generate_evaluation_plots
+from explanation_metadata import build_explanation
+from distillation import build_cascade, print_report
 
 warnings.filterwarnings('ignore')
 
@@ -56,6 +58,12 @@ def load_and_preprocess_data(csv_path = None):
 
    return df, numerical_cols, categorical_cols, binary_cols
 
+def split_dataset(df):
+   """Chia train / test (cố định, dùng chung cho train và các bước tính sau như distillation.py)"""
+   X = df.drop('HeartDisease', axis=1)
+   y = df['HeartDisease']
+   return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
 # -------------------------------
 # Train model RandomForest
 # -------------------------------
@@ -63,12 +71,7 @@ def train_random_forest_model(csv_path = None):
    print("Đang tải và tiền xử lý dữ liệu...")
    df, numerical_features, categorical_features, binary_features = load_and_preprocess_data(csv_path)
 
-   X = df.drop('HeartDisease', axis=1)
-   y = df['HeartDisease']
-
-   X_train, X_test, y_train, y_test = train_test_split(
-      X, y, test_size=0.2, random_state=42, stratify=y
-   )
+   X_train, X_test, y_train, y_test = split_dataset(df)
 
    numerical_transformer = Pipeline([
       ('imputer', SimpleImputer(strategy='median')),
@@ -131,17 +134,24 @@ def train_random_forest_model(csv_path = None):
    print(classification_report(y_test, y_pred))
 
    # ===============================
-   # LẤY FEATURE NAMES
+   # FEATURE NAMES + THÔNG TIN GIẢI THÍCH
+   # (tính một lần ở đây, server chỉ tra cứu)
    # ===============================
-   preprocessor_fitted = best_model.named_steps['preprocessor']
+   print("Đang tính permutation importance...")
+   explanation = build_explanation(best_model, X_test, y_test)
+   feature_names = explanation['feature_names']
+
+   print("\nPermutation importance (ROC AUC giảm khi xáo trộn):")
+   for feature, value in explanation['permutation_importances'].items():
+      print(f"   {feature:<15} {value['mean']:.4f} ± {value['std']:.4f}")
 
-   feature_names = []
-   for name, transformer, cols in preprocessor_fitted.transformers_:
-      if name in ['num', 'bin']:
-         feature_names.extend(cols)
-      elif name == 'cat':
-         cat_features = transformer.named_steps['onehot'].get_feature_names_out(cols)
-         feature_names.extend(cat_features)
+   # ===============================
+   # CASCADE: MODEL CHƯNG CẤT CHẤM TRƯỚC,
+   # FOREST CHỈ CHẤM KHI KHÔNG CHẮC
+   # ===============================
+   print("\nĐang chưng cất model cho cascade...")
+   cascade = build_cascade(best_model, X_train, y_train, X_test)
+   print_report(cascade)
 
    # ===============================
    # VẼ BIỂU ĐỒ
@@ -163,7 +173,9 @@ def train_random_forest_model(csv_path = None):
       'feature_names': feature_names,
       'numerical_features': numerical_features,
       'categorical_features': categorical_features,
-      'binary_features': binary_features
+      'binary_features': binary_features,
+      'explanation': explanation,
+      'cascade': cascade
    }
 
    joblib.dump(model_data, 'heart_disease_model.pkl')